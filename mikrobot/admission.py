@@ -0,0 +1,97 @@
+"""
+Kontrola przyjmowania żądań: limity współbieżności z ograniczoną kolejką.
+
+Każda pula ma limit jednocześnie obsługiwanych żądań i kolejkę oczekujących
+o ograniczonej długości. Żądanie, które nie zmieści się w kolejce albo nie
+doczeka się miejsca w wyznaczonym czasie, jest od razu odrzucane (w app.py –
+odpowiedź 503 z nagłówkiem Retry-After), zamiast zajmować wątek serwera.
+
+Pule działają w obrębie jednego procesu (wątki serwera, np. gunicorn
+--threads); limity dobiera się tak, by żądania panelu – obsługiwane
+i oczekujące – nie mogły zająć wszystkich wątków procesu.
+"""
+
+import threading
+import time
+
+
+class AdmissionPool:
+    """Semafor z ograniczoną kolejką i licznikami dla /metrics."""
+
+    def __init__(self, name: str, limit: int, queue_size: int, wait_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> bool:
+        """Zajmuje miejsce w puli; zwraca False, jeśli żądanie należy odrzucić."""
+        with self._cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue_size:
+                self.shed += 1
+                return False
+            self.waiting += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self.active < self.limit, self.wait_timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self.shed += 1
+                return False
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+class Admission:
+    """Zestaw pul: pula klasy ruchu (publiczny, panel) i opcjonalne pule pojedynczych ścieżek."""
+
+    def __init__(self, pools: dict, route_limits: dict):
+        self.pools = {name: AdmissionPool(name, *spec) for name, spec in pools.items()}
+        self.routes = {name: AdmissionPool(name, *spec) for name, spec in route_limits.items()}
+        self.last_admitted = time.monotonic()
+
+    def acquire(self, pool: str, route=None):
+        """Zajmuje miejsce w puli ścieżki (jeśli ma własny limit) i w puli klasy ruchu.
+
+        Zwraca listę zajętych pul do zwolnienia albo None, jeśli żądanie odrzucono.
+        """
+        wanted = [self.routes[route]] if route in self.routes else []
+        wanted.append(self.pools[pool])
+        taken = []
+        for item in wanted:
+            if not item.acquire():
+                self.release(taken)
+                return None
+            taken.append(item)
+        self.last_admitted = time.monotonic()
+        return taken
+
+    @staticmethod
+    def release(taken):
+        for item in reversed(taken):
+            item.release()
+
+    def idle(self, seconds: float) -> bool:
+        """True, jeśli proces nie obsługuje żądań i od ostatniego minęło `seconds` sekund."""
+        return (
+            all(pool.active == 0 for pool in self.pools.values())
+            and time.monotonic() - self.last_admitted >= seconds
+        )
+
+    def all_pools(self):
+        return list(self.pools.values()) + list(self.routes.values())
@@ -11,43 +11,808 @@ responsywny dzięki frameworkowi Bootstrap, którego siatka flexbox pozwala
 na dostosowanie treści do różnych rozmiarów ekranu【279740201487843†L165-L199】.
 """
 
+import base64
+import hashlib
+import json
 import sqlite3
 import os
-from datetime import datetime
+import re
+import secrets
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from email.utils import format_datetime
+from functools import wraps
 from pathlib import Path
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, session
+from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, session, jsonify, stream_template, g, abort, has_request_context, make_response
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 
+# Moduły serwisu importowane są od razu, także dla wyłączonych funkcji (poczta,
+# konserwacja, profilowanie, dzierżawcy): każdy potrzebny jest przy tworzeniu
+# aplikacji, a razem to ok. 13 ms przy ok. 105 ms samego Flaska (zob. startup.py)
+from admission import Admission
+from cache import LRUCache
+from images import image_placeholder, make_thumbnail, probe_image, too_large
+from init_db import GALLERY_OWNERS, UNIX_NOW_SQL, migrate_db
+from mailqueue import RATE_WINDOW, MailWorker, enqueue, queue_counts, smtp_settings_from_env
+from maintenance import MaintenanceScheduler, last_runs
+from critical_css import PUBLIC_ENDPOINTS, assets_version, load_critical_css
+from markup import render_markup
+from profiler import (
+    RequestProfile, RouteSampler, flame_rows, format_collapsed, list_profiles, load_profile, profile_header,
+    profile_name, save_profile,
+)
+from publish import CURRENT, PUBLISH_DIR, PublishedSnapshotStore, connect_published, publish
+from tenants import Tenant, TenantRegistry
+
 
 BASE_DIR = Path(__file__).resolve().parent
 DATABASE = BASE_DIR / "mikrobot.db"
+# Profile pojedynczych żądań zapisane na życzenie administratora (zob. profiler.py)
+PROFILE_DIR = BASE_DIR / "profiles"
+# Odstęp stałego próbkowania trwających żądań w sekundach (0 wyłącza)
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("MIKROBOT_PROFILE_INTERVAL", "0.1"))
 
-# Directory for uploaded news images (inside the static folder)
-UPLOAD_FOLDER = BASE_DIR / "static" / "uploads"
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 
+# Liczba zdjęć na jednej stronie galerii (kolejne strony doładowywane są jako JSON)
+GALLERY_PAGE_SIZE = 24
+
+# Publiczne API tylko do odczytu (/api/v1/<zasób>): kolumny sortowania stron
+# (klucz kursora), kierunek sortowania oraz pola, które można wybrać przez ?fields=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_RESOURCES = {
+    "news": {
+        "order": ("date_posted", "id"),
+        "descending": True,
+        "fields": ("id", "title", "content", "content_html", "excerpt", "word_count", "date_posted",
+                   "cover_image", "image_count", "images"),
+    },
+    "achievements": {
+        "order": ("date", "id"),
+        "descending": True,
+        "fields": ("id", "title", "description", "content_html", "excerpt", "word_count", "date",
+                   "cover_image", "image_count", "images"),
+    },
+    "publications": {
+        "order": ("date", "id"),
+        "descending": True,
+        "fields": ("id", "title", "description", "content_html", "excerpt", "word_count", "date",
+                   "cover_image", "image_count", "images"),
+    },
+    "members": {
+        "order": ("id",),
+        "descending": False,
+        "fields": ("id", "name", "role", "description", "category", "photo"),
+    },
+}
+# Pola API, których nazwa różni się od kolumny w bazie
+API_COLUMNS = {"images": "image_list"}
+
+# Strumieniowanie długich list: pierwszy fragment (nagłówek i nawigacja) wysyłany
+# jest po zebraniu STREAM_FIRST_CHUNK bajtów, kolejne w paczkach STREAM_CHUNK bajtów
+STREAM_FIRST_CHUNK = 1024
+STREAM_CHUNK = 16 * 1024
+
+# Numer dnia 1970-01-01 w kalendarzu Pythona – początek numeracji kolumn day
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Nazwy miesięcy w archiwum aktualności (indeks = numer miesiąca)
+MONTH_NAMES = ("", "styczeń", "luty", "marzec", "kwiecień", "maj", "czerwiec", "lipiec", "sierpień",
+               "wrzesień", "październik", "listopad", "grudzień")
+
+# Kanały Atom/RSS: liczba najnowszych wpisów oraz tytuły kanałów
+FEED_SIZE = 20
+FEEDS = {
+    "news": "MIKROBOT – Aktualności",
+    "achievements": "MIKROBOT – Osiągnięcia",
+}
+
+# Dziennik zmian dla replik (/changes): domyślna i największa liczba zmian na stronę
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 1000
+# Jeśli ustawiony, /changes wymaga nagłówka "Authorization: Bearer <token>"
+REPLICATION_TOKEN = os.environ.get("MIKROBOT_REPLICATION_TOKEN")
+
+# Tryb pracy procesu: "all" – strona publiczna i panel na bazie głównej;
+# "public" – tylko strona publiczna, czytana z opublikowanej kopii bazy
+# (zob. publish.py), panel wyłączony; "admin" – panel na bazie głównej,
+# który po każdej zmianie publikuje nową kopię dla procesów publicznych
+APP_MODE = os.environ.get("MIKROBOT_MODE", "all")
+if APP_MODE not in ("all", "public", "admin"):
+    raise RuntimeError(f"Nieznany tryb MIKROBOT_MODE={APP_MODE!r} (dozwolone: all, public, admin).")
+PUBLISHED_DATABASE = PUBLISH_DIR / CURRENT
+if APP_MODE == "public" and not PUBLISHED_DATABASE.exists():
+    raise RuntimeError(f"Brak opublikowanej bazy {PUBLISHED_DATABASE}; uruchom najpierw python publish.py.")
+
+# Kontrola przyjmowania żądań (zob. admission.py): pula -> (limit współbieżności,
+# długość kolejki, maksymalny czas oczekiwania w s). Żądania zmieniające dane
+# w panelu (przesyłanie zdjęć) mają osobną, małą pulę, więc nie mogą zająć
+# wątków obsługujących stronę publiczną; ścieżki z najcięższymi wysyłkami
+# mają dodatkowo własne limity.
+ADMISSION_POOLS = {
+    "public": (int(os.environ.get("MIKROBOT_PUBLIC_CONCURRENCY", "32")), 64, 2.0),
+    "admin": (int(os.environ.get("MIKROBOT_ADMIN_CONCURRENCY", "2")), 2, 10.0),
+}
+ADMISSION_ROUTE_LIMITS = {
+    "admin_news": (1, 1, 10.0),
+    "admin_achievements": (1, 1, 10.0),
+    "admin_publications": (1, 1, 10.0),
+}
+# Strony publiczne, dla których wysyłane są nagłówki preload i 103 Early Hints
+PRELOAD_ENDPOINTS = set(PUBLIC_ENDPOINTS)
+# Sugerowany czas ponowienia (nagłówek Retry-After) dla odrzuconych żądań
+RETRY_AFTER = {"public": 1, "admin": 10}
+
+# Konserwacja bazy w tle (zob. maintenance.py): kopie zapasowe, ANALYZE
+# i odzyskiwanie miejsca; odzyskiwanie tylko po IDLE_SECONDS bez żądań
+MAINTENANCE = os.environ.get("MIKROBOT_MAINTENANCE", "1") != "0" and APP_MODE != "public"
+IDLE_SECONDS = 5
+
+# Wiele serwisów w jednym procesie (zob. tenants.py): katalog dzierżawców
+# <host>/mikrobot.db wybieranych po nagłówku Host i liczba naraz otwartych.
+# Bez MIKROBOT_TENANTS_DIR proces obsługuje jeden serwis z katalogu aplikacji.
+TENANTS_DIR = os.environ.get("MIKROBOT_TENANTS_DIR")
+TENANT_CACHE = int(os.environ.get("MIKROBOT_TENANT_CACHE", "64"))
+if TENANTS_DIR and APP_MODE != "all":
+    raise RuntimeError("Wielu dzierżawców (MIKROBOT_TENANTS_DIR) wymaga trybu MIKROBOT_MODE=all.")
+
+# Liczba zaufanych serwerów pośredniczących (np. nginx przed gunicornem na
+# 127.0.0.1). Przy wartości > 0 adres klienta – od którego zależy limit
+# formularza kontaktowego – i schemat brane są z nagłówków X-Forwarded-For
+# i X-Forwarded-Proto dopisanych przez te serwery; 0 – aplikacja przyjmuje
+# połączenia bezpośrednio od przeglądarek.
+PROXY_HOPS = int(os.environ.get("MIKROBOT_PROXY_HOPS", "0"))
+
+# Formularz kontaktowy (zob. mailqueue.py): największa długość pól i prosty
+# wzorzec adresu e-mail; wysyłka wyłączona, jeśli nie ustawiono MIKROBOT_SMTP_HOST
+CONTACT_MAX_NAME = 200
+CONTACT_MAX_MESSAGE = 5000
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+MAIL_SETTINGS = smtp_settings_from_env()
+# Skrzynka w panelu: liczba wyświetlanych najnowszych wiadomości
+INBOX_SIZE = 200
+
+# Listy w panelu administracyjnym (admin_listing): wyświetlane kolumny (klucz,
+# nagłówek, nazwa sortowania), sortowania (kolumny ORDER BY – każde obsługuje
+# indeks – i domyślny kierunek), kolumna wyszukiwania po początku oraz filtry
+ADMIN_PAGE_SIZE = 50
+MEMBER_CATEGORIES = ("opiekun", "zarząd", "członek")
+ADMIN_TABLES = {
+    "news": {
+        "columns": (("title", "Tytuł", "title"), ("date_posted", "Data", "date"), ("image_count", "Zdjęcia", None)),
+        "sorts": {"date": (("date_posted", "id"), "desc"), "title": (("title COLLATE NOCASE", "id"), "asc")},
+        "default_sort": "date",
+        "search": "title",
+        "year_filter": True,
+        "edit": ("edit_news", "news_id"),
+        "delete": "delete_news",
+    },
+    "achievements": {
+        "columns": (("title", "Tytuł", "title"), ("date", "Data", "date"), ("image_count", "Zdjęcia", None)),
+        "sorts": {"date": (("date", "id"), "desc"), "title": (("title COLLATE NOCASE", "id"), "asc")},
+        "default_sort": "date",
+        "search": "title",
+        "year_filter": True,
+        "edit": ("edit_achievement", "achievement_id"),
+        "delete": "delete_achievement",
+    },
+    "publications": {
+        "columns": (("title", "Tytuł", "title"), ("date", "Data", "date"), ("image_count", "Zdjęcia", None)),
+        "sorts": {"date": (("date", "id"), "desc"), "title": (("title COLLATE NOCASE", "id"), "asc")},
+        "default_sort": "date",
+        "search": "title",
+        "year_filter": True,
+        "edit": ("edit_publication", "publication_id"),
+        "delete": "delete_publication",
+    },
+    "members": {
+        "columns": (("name", "Imię i nazwisko", "name"), ("role", "Funkcja", None), ("category", "Kategoria", "category")),
+        "sorts": {
+            "id": (("id",), "asc"),
+            "name": (("name COLLATE NOCASE", "id"), "asc"),
+            "category": (("category", "name COLLATE NOCASE", "id"), "asc"),
+        },
+        "default_sort": "id",
+        "search": "name",
+        "year_filter": False,
+        "edit": ("edit_member", "member_id"),
+        "delete": "delete_member",
+    },
+}
+
 # Hasło do panelu administracyjnego; w realnej instalacji należy je zmienić
 ADMIN_PASSWORD = "admin123"
 
 
 def get_db_connection():
-    """Zwraca połączenie do bazy danych z ustawioną fabryką wierszy."""
-    conn = sqlite3.connect(DATABASE)
+    """Zwraca połączenie do bazy danych z ustawioną fabryką wierszy.
+
+    W trybie public jest to połączenie tylko do odczytu z opublikowaną kopią bazy.
+    """
+    if APP_MODE == "public":
+        conn = connect_published(PUBLISHED_DATABASE)
+        conn.row_factory = sqlite3.Row
+        return conn
+    # Zapisy w panelu są krótkie (pliki przygotowywane są przed transakcją),
+    # więc przy równoczesnych zapisach lepiej poczekać na blokadę niż zwrócić błąd
+    conn = sqlite3.connect(current_tenant().database, timeout=30)
     conn.row_factory = sqlite3.Row
+    # Bez tego ON DELETE CASCADE nie usuwa powiązanych zdjęć
+    conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
 
+# Dociągnij schemat istniejącej bazy do bieżącej wersji (kolumny liczników, wyzwalacze, indeksy).
+# Procesy publiczne nie zapisują do bazy głównej – migracje wykonuje panel lub init_db.py.
+if DATABASE.exists() and APP_MODE != "public":
+    _conn = sqlite3.connect(DATABASE)
+    migrate_db(_conn)
+    _conn.close()
+
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "very-secret-key"  # potrzebne do flashowania komunikatów
+# Skompilowane szablony zapisywane na dysku (domyślnie w katalogu tymczasowym), więc
+# nowe procesy serwera wczytują gotowy kod zamiast kompilować szablony od nowa
+app.jinja_options = {
+    **app.jinja_options,
+    "bytecode_cache": FileSystemBytecodeCache(os.environ.get("MIKROBOT_TEMPLATE_CACHE")),
+}
+# Strony /news i /achievements renderowane są strumieniowo
+app.config["STREAM_LISTINGS"] = True
+if PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS, x_proto=PROXY_HOPS)
+
+# Serwis z katalogu aplikacji i – przy MIKROBOT_TENANTS_DIR – dzierżawcy
+# wczytywani przy pierwszym żądaniu do ich hosta. Każdy ma własną bazę,
+# magazyn plików, migawkę treści i pamięć stron (zob. tenants.py).
+default_tenant = Tenant(
+    "", BASE_DIR,
+    snapshots=PublishedSnapshotStore(PUBLISHED_DATABASE, check_interval=0.5) if APP_MODE == "public" else None,
+)
+tenants = TenantRegistry(TENANTS_DIR, max_open=TENANT_CACHE) if TENANTS_DIR else None
+
+
+def current_tenant() -> Tenant:
+    """Dzierżawca bieżącego żądania; poza żądaniem (skrypty, testy) – serwis z katalogu aplikacji."""
+    if has_request_context() and "tenant" in g:
+        return g.tenant
+    return default_tenant
+
+
+# Migawka publicznych treści w pamięci procesu (zob. snapshot.py) – strony
+# publiczne czytają wyłącznie z niej, zmiany w bazie wykrywa PRAGMA data_version
+# (w trybie public – zmiana opublikowanej kopii)
+snapshots = LocalProxy(lambda: current_tenant().snapshots)
+# Magazyn przesłanych zdjęć: katalog static/uploads albo serwer S3 (zob. storage.py)
+storage = LocalProxy(lambda: current_tenant().storage)
+# Gotowe strony publiczne współdzielone przez procesy serwera
+app.config["SHARED_PAGE_CACHE"] = True
+page_cache = LocalProxy(lambda: current_tenant().page_cache)
+# Gotowe odpowiedzi API zapisane pod kluczem zawierającym wersję tabeli
+api_cache = LRUCache(maxsize=512)
+# Wygenerowane kanały Atom/RSS – jeden wpis na kanał, format i wersję treści
+feed_cache = LRUCache(maxsize=16)
+# Pule przyjmowania żądań: strona publiczna i zapisy w panelu
+admission = Admission(ADMISSION_POOLS, ADMISSION_ROUTE_LIMITS)
+
+
+def site_databases() -> list:
+    """Bazy obsługiwane przez proces: baza serwisu albo bazy wszystkich dzierżawców."""
+    return tenants.databases() if tenants else [DATABASE]
+
+
+# Harmonogram konserwacji bazy, uruchamiany przy pierwszym żądaniu procesu
+maintenance = MaintenanceScheduler(site_databases, is_idle=lambda: admission.idle(IDLE_SECONDS))
+# Wysyłka wiadomości z formularza kontaktowego w tle (tylko procesy z dostępem do panelu)
+mail_worker = MailWorker(site_databases, MAIL_SETTINGS) if MAIL_SETTINGS and APP_MODE != "public" else None
+# Stałe próbkowanie stosów trwających żądań, sumowane według ścieżki
+route_sampler = RouteSampler(PROFILE_SAMPLE_INTERVAL)
+# Krytyczny CSS stron publicznych zbudowany przez critical_css.py ({endpoint: CSS});
+# wersja zasobów jest częścią kluczy wspólnej pamięci stron
+critical_css = load_critical_css()
+ASSETS_VERSION = assets_version(critical_css)
 
-# Configure upload folder in Flask
-app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
 def allowed_file(filename: str) -> bool:
     """Sprawdza, czy przesłany plik ma dozwolone rozszerzenie"""
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def save_upload(file, prefix: str):
+    """Zapisuje przesłany plik w katalogu uploads pod unikalną nazwą.
+
+    Zwraca ścieżkę względną wobec katalogu static (np. "uploads/news_...png")
+    lub None, jeśli plik ma niedozwolone rozszerzenie.
+    """
+    filename = secure_filename(file.filename)
+    if not allowed_file(filename):
+        return None
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    ext = filename.rsplit(".", 1)[1].lower()
+    # Losowa końcówka – równoczesne wysyłki w kilku procesach mogą trafić w tę samą mikrosekundę
+    unique_filename = f"{prefix}_{timestamp}_{secrets.token_hex(3)}.{ext}"
+    file.save(current_tenant().upload_folder / unique_filename)
+    return f"uploads/{unique_filename}"
+
+
+def prepare_media(rel_path: str):
+    """Przygotowuje zapisany plik do dodania do tabeli media.
+
+    Wymiary, rozmiar pliku, kolor dominujący, obraz zastępczy i pomniejszona
+    kopia (dla galerii) tworzone są od razu z pliku zapisanego lokalnie, po czym oba pliki trafiają do magazynu
+    (przy magazynie zdalnym kopie lokalne są usuwane). Zwraca None dla zdjęcia
+    o zbyt dużej rozdzielczości (images.MAX_PIXELS) – takiego pliku nie dekodujemy.
+    """
+    static_dir = current_tenant().static_dir
+    path = static_dir / rel_path
+    width, height = probe_image(path)
+    if too_large(width, height):
+        path.unlink(missing_ok=True)
+        return None
+    color, placeholder = image_placeholder(path)
+    thumb = make_thumbnail(static_dir, rel_path)
+    size = path.stat().st_size
+    for key in filter(None, (rel_path, thumb)):
+        storage.put(key, static_dir / key)
+        if not storage.is_local:
+            (static_dir / key).unlink()
+    return {
+        "filename": rel_path, "width": width, "height": height, "bytes": size,
+        "thumb": thumb, "color": color, "placeholder": placeholder,
+    }
+
+
+def save_media(files, prefix: str):
+    """Zapisuje przesłane zdjęcia w magazynie – przed otwarciem transakcji zapisu.
+
+    Przetwarzanie obrazów trwa dłużej niż cały zapis w bazie, więc robione jest
+    bez blokady bazy; transakcja tylko wstawia gotowe wiersze (insert_media).
+    Zwraca listę przygotowanych zdjęć albo None, jeśli któryś plik ma
+    niedozwolone rozszerzenie lub zbyt dużą rozdzielczość (zapisane już pliki
+    są wtedy usuwane).
+    """
+    media = []
+    try:
+        for file in files:
+            if not file or not file.filename:
+                continue
+            rel_path = save_upload(file, prefix)
+            if rel_path is None:
+                discard_media(media)
+                return None
+            # Wpis zastępczy: jeśli przetwarzanie obrazu się nie powiedzie, plik też zostanie usunięty
+            media.append({"filename": rel_path, "thumb": None})
+            prepared = prepare_media(rel_path)
+            if prepared is None:
+                discard_media(media)
+                return None
+            media[-1] = prepared
+    except Exception:
+        discard_media(media)
+        raise
+    return media
+
+
+def discard_media(media):
+    """Usuwa z magazynu pliki zdjęć, których wiersze nie trafiły do bazy."""
+    for item in media:
+        remove_media_files(item)
+
+
+def insert_media(cur, owner_type: str, owner_id: int, item: dict):
+    """Dodaje przygotowane zdjęcie do tabeli media jako kolejne zdjęcie właściciela.
+
+    Liczniki i miniaturę właściciela aktualizują wyzwalacze.
+    """
+    cur.execute(
+        """
+        INSERT INTO media (owner_type, owner_id, position, filename, width, height, bytes, thumb, color, placeholder)
+        VALUES (?, ?, (SELECT COALESCE(MAX(position) + 1, 0) FROM media WHERE owner_type = ? AND owner_id = ?),
+                ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (owner_type, owner_id, owner_type, owner_id, item["filename"], item["width"], item["height"],
+         item["bytes"], item["thumb"], item["color"], item["placeholder"]),
+    )
+
+
+def mark_content_changed():
+    """Zaznacza, że żądanie zatwierdziło zmianę treści (zob. refresh_snapshot)."""
+    g.content_changed = True
+
+
+@contextmanager
+def media_transaction(conn, media):
+    """Transakcja zapisu wpisu ze zdjęciami; gdy się nie powiedzie, pliki zdjęć są usuwane."""
+    try:
+        yield conn.cursor()
+        conn.commit()
+        mark_content_changed()
+    except Exception:
+        conn.rollback()
+        discard_media(media)
+        raise
+
+
+def delete_owner(conn, owner_type: str, owner_id: int) -> bool:
+    """Usuwa wpis wraz ze zdjęciami. Zwraca False, jeśli wpisu nie było.
+
+    Lista zdjęć odczytywana jest w tej samej transakcji zapisu co usunięcie,
+    a pliki usuwane są dopiero po zatwierdzeniu – zdjęcie dodane w tej chwili
+    przez inny proces nie zostanie bez pliku, a nieudane usunięcie nie
+    zostawi wierszy bez plików.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        images = get_media(conn, owner_type, owner_id)
+        # Wiersze media usuwa wyzwalacz
+        deleted = conn.execute(f"DELETE FROM {owner_type} WHERE id = ?", (owner_id,)).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if deleted:
+        mark_content_changed()
+    for row in images:
+        remove_media_files(row)
+    return deleted > 0
+
+
+def delete_media(conn, owner_type: str, image_id: int):
+    """Usuwa jedno zdjęcie (wiersz, potem pliki). Zwraca wiersz zdjęcia albo None, jeśli go nie było."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT owner_id, filename, thumb FROM media WHERE id = ? AND owner_type = ?",
+            (image_id, owner_type),
+        ).fetchone()
+        if row:
+            # Jeśli było to zdjęcie-miniatura, wyzwalacz wybierze kolejne (lub NULL)
+            conn.execute("DELETE FROM media WHERE id = ?", (image_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if row:
+        mark_content_changed()
+        remove_media_files(row)
+    return row
+
+
+def get_media(conn, owner_type: str, owner_id: int):
+    """Zwraca zdjęcia właściciela w kolejności wyświetlania."""
+    return conn.execute(
+        """
+        SELECT id, filename, thumb, width, height FROM media
+        WHERE owner_type = ? AND owner_id = ?
+        ORDER BY position, id
+        """,
+        (owner_type, owner_id),
+    ).fetchall()
+
+
+def remove_static_file(rel_path: str):
+    """Usuwa plik z magazynu. Pliki spoza uploads (przykładowe grafiki w static) są pomijane."""
+    if not rel_path or not rel_path.startswith("uploads/"):
+        return
+    storage.delete(rel_path)
+
+
+@app.template_global()
+def media_url(rel_path, external: bool = False) -> str:
+    """Adres zdjęcia zapisanego w bazie – z magazynu (uploads/) albo z katalogu static.
+
+    Przy magazynie zdalnym przeglądarka pobiera zdjęcie bezpośrednio z niego,
+    z pominięciem serwera aplikacji. Dostępne w szablonach jako media_url().
+    """
+    if not rel_path:
+        return ""
+    if not rel_path.startswith("uploads/"):
+        return url_for("static", filename=rel_path, _external=external)
+    if not storage.is_local:
+        return storage.url(rel_path)
+    if tenants is not None:
+        return url_for("tenant_upload", filename=rel_path[len("uploads/"):], _external=external)
+    return url_for("static", filename=rel_path, _external=external)
+
+
+@app.template_global()
+def media_urls(image_list) -> str:
+    """Adresy zdjęć z kolumny image_list (oddzielone przecinkami) dla atrybutu data-images."""
+    return ",".join(media_url(rel_path) for rel_path in (image_list or "").split(",") if rel_path)
+
+
+@app.template_global()
+def image_attrs(image) -> Markup:
+    """Atrybuty width/height i tło zastępcze znacznika <img> dla zdjęcia z migawki (MediaRecord).
+
+    Wymiary pozwalają przeglądarce zarezerwować miejsce przed pobraniem
+    zdjęcia, a kolor dominujący i rozmyty obraz zastępczy (osadzony w stronie)
+    wypełniają je do czasu wczytania. Tło usuwa main.js po wczytaniu zdjęcia.
+    """
+    attrs = []
+    if image and image.width and image.height:
+        attrs.append(Markup('width="{}" height="{}"').format(image.width, image.height))
+    if image and image.placeholder:
+        attrs.append(Markup('style="background-color: {}; background-image: url({})" data-placeholder').format(
+            image.color, image.placeholder
+        ))
+    return Markup(" ").join(attrs)
+
+
+def remove_media_files(row):
+    """Usuwa z dysku plik zdjęcia wraz z jego pomniejszoną kopią."""
+    remove_static_file(row["filename"])
+    remove_static_file(row["thumb"])
+
+
+def fetch_gallery_page(snapshot, before=None, limit: int = GALLERY_PAGE_SIZE):
+    """Zwraca stronę galerii (najnowsze zdjęcia treści) oraz id do pobrania następnej strony.
+
+    Stronicowanie kluczem (id < before) wyszukuje początek strony w migawce
+    przez bisekcję, więc koszt strony nie zależy od liczby wszystkich zdjęć.
+    """
+    rows = snapshot.gallery.page((before,) if before else None, limit + 1)
+    next_before = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_before
+
+
+def gallery_item(row) -> dict:
+    """Zamienia wiersz galerii na słownik używany w szablonie i odpowiedzi JSON."""
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "thumb": media_url(row["thumb"] or row["filename"]),
+        "full": media_url(row["filename"]),
+        "width": row["width"],
+        "height": row["height"],
+        "color": row["color"],
+        "link": url_for("all_news") if row["owner_type"] == "news" else url_for("achievements"),
+    }
+
+
+@app.before_request
+def select_tenant():
+    """Wybiera serwis po nagłówku Host (tylko przy MIKROBOT_TENANTS_DIR); nieznany host dostaje 404."""
+    if tenants is None:
+        return
+    tenant = tenants.get(request.host)
+    if tenant is None:
+        return "Nie znaleziono serwisu.", 404
+    g.tenant = tenant
+
+
+@app.before_request
+def disable_admin_in_public_mode():
+    """W trybie public panel administracyjny nie istnieje – zapisy obsługuje serwer główny."""
+    if APP_MODE == "public" and request.path.startswith("/skrwaw"):
+        return "Nie znaleziono strony.", 404
+
+
+@app.before_request
+def admit_request():
+    """Przydziela żądanie do puli; gdy pula i jej kolejka są pełne, od razu zwraca 503.
+
+    Zapisy w panelu (POST /skrwaw...) trafiają do puli "admin", pozostałe
+    żądania do puli "public". Miejsce zwalniane jest po wygenerowaniu
+    odpowiedzi (strony strumieniowe – po wygenerowaniu początku), więc
+    wolny klient nie blokuje puli.
+    """
+    pool = "admin" if request.method == "POST" and request.path.startswith("/skrwaw") else "public"
+    taken = admission.acquire(pool, request.endpoint if pool == "admin" else None)
+    if taken is None:
+        response = app.response_class("Serwer jest przeciążony, spróbuj ponownie za chwilę.", 503,
+                                      mimetype="text/plain")
+        response.headers["Retry-After"] = str(RETRY_AFTER[pool])
+        return response
+    g.admission = taken
+    if MAINTENANCE:
+        maintenance.start()
+    if mail_worker is not None:
+        mail_worker.start()
+
+
+def after_response(response, callback):
+    """Wywołuje callback po wysłaniu odpowiedzi strumieniowej albo od razu dla zwykłej."""
+    if response.is_streamed:
+        response.call_on_close(callback)
+    else:
+        callback()
+
+
+@app.after_request
+def release_admission(response):
+    """Zwalnia miejsce w puli po wygenerowaniu odpowiedzi (strumieniowej – po jej początku)."""
+    taken = g.pop("admission", None)
+    if taken is not None:
+        admission.release(taken)
+    return response
+
+
+@app.before_request
+def start_profiling():
+    """Rejestruje żądanie w stałym próbkowaniu; na życzenie administratora profiluje je w całości.
+
+    Profil pojedynczego żądania włącza parametr ?_profile=1 albo nagłówek
+    X-Mikrobot-Profile: 1 – tylko w sesji zalogowanego administratora.
+    """
+    route_sampler.enter(request.endpoint or "nie_znaleziono")
+    g.sampled_thread = threading.get_ident()
+    if session.get("admin_logged_in") and (request.args.get("_profile") or request.headers.get("X-Mikrobot-Profile")):
+        g.profile = RequestProfile(threading.get_ident()).start()
+
+
+@app.after_request
+def finish_profiling(response):
+    """Kończy próbkowanie po wygenerowaniu odpowiedzi (strumieniowej – po ostatnim fragmencie) i zapisuje profil."""
+    thread_id = g.pop("sampled_thread", threading.get_ident())
+    profile = g.pop("profile", None)
+    name = profile_name(request.endpoint or "nie_znaleziono") if profile is not None else None
+    meta = f"{request.method} {request.full_path.rstrip('?')} -> {response.status_code}"
+
+    def finish():
+        route_sampler.leave(thread_id)
+        if profile is not None:
+            profile.stop()
+            save_profile(PROFILE_DIR, name, profile, meta)
+
+    after_response(response, finish)
+    if profile is not None:
+        response.headers["X-Mikrobot-Profile"] = url_for("view_profile", name=name)
+    return response
+
+
+@app.teardown_request
+def release_after_error(exc):
+    """Zwalnia miejsce w puli i kończy próbkowanie żądania, dla którego nie wykonano after_request.
+
+    Flask pomija funkcje after_request, gdy wyjątek widoku jest przekazywany
+    dalej (PROPAGATE_EXCEPTIONS, np. app.run(debug=True)) – bez tego miejsce
+    w puli pozostałoby zajęte na zawsze. Po zwykłej odpowiedzi after_request
+    zdejmuje już oba wpisy z g, więc nic nie jest zwalniane dwa razy.
+    """
+    taken = g.pop("admission", None)
+    if taken is not None:
+        admission.release(taken)
+    thread_id = g.pop("sampled_thread", None)
+    if thread_id is not None:
+        route_sampler.leave(thread_id)
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profile.stop()
+
+
+def first_card_image(endpoint: str, snapshot):
+    """Zdjęcie pierwszej karty z obrazem na stronie (kandydat na największy element strony)."""
+    items = {
+        "index": snapshot.news.items[:5],
+        "all_news": snapshot.news.items,
+        "achievements": snapshot.achievements.items,
+    }.get(endpoint, ())
+    return next((item.cover_image for item in items if item.cover_image), None)
+
+
+def preload_links(endpoint: str) -> list:
+    """Nagłówki Link: rel=preload dla arkusza, logo, zdjęcia hero i pierwszego zdjęcia karty."""
+    links = [
+        f"<{url_for('static', filename='css/main.css')}>; rel=preload; as=style",
+        f"<{url_for('static', filename='images/logo.png')}>; rel=preload; as=image",
+    ]
+    if endpoint == "index":
+        links.append(f"<{url_for('static', filename='images/hero.jpg')}>; rel=preload; as=image")
+    image = first_card_image(endpoint, snapshots.get())
+    if image:
+        links.append(f"<{media_url(image)}>; rel=preload; as=image")
+    return links
+
+
+@app.before_request
+def send_early_hints():
+    """Wskazuje przeglądarce zasoby strony publicznej, zanim powstanie HTML.
+
+    Serwery obsługujące 103 Early Hints (np. gunicorn przez
+    environ["wsgi.early_hints"]) wysyłają je od razu; te same nagłówki Link
+    trafiają też do właściwej odpowiedzi (zob. add_preload_headers).
+    """
+    if request.method != "GET" or request.endpoint not in PRELOAD_ENDPOINTS:
+        return
+    g.preload = preload_links(request.endpoint)
+    early_hints = request.environ.get("wsgi.early_hints")
+    if early_hints is not None:
+        early_hints([("Link", link) for link in g.preload])
+
+
+@app.after_request
+def add_preload_headers(response):
+    links = g.pop("preload", None)
+    if links and response.status_code == 200 and response.mimetype == "text/html":
+        response.headers["Link"] = ", ".join(links)
+    return response
+
+
+@app.template_global()
+def page_critical_css():
+    """Krytyczny CSS bieżącej strony (pusty, jeśli nie został zbudowany)."""
+    return Markup(critical_css.get(request.endpoint, ""))
+
+
+@app.after_request
+def refresh_snapshot(response):
+    """Po zmianie w panelu administracyjnym zwiększa generację treści i przebudowuje migawkę.
+
+    Działa tylko wtedy, gdy widok panelu zatwierdził zmianę treści
+    (mark_content_changed) – nieudane logowanie, odrzucone żądanie czy
+    zapis bez zmian nie unieważniają wspólnej pamięci stron. Nowa generacja
+    unieważnia strony we wszystkich procesach; migawka tego procesu jest
+    przebudowywana od razu. W trybie admin zmiana jest od razu publikowana
+    dla procesów publicznych.
+    """
+    if APP_MODE == "public":
+        return response
+    if g.pop("content_changed", False):
+        conn = get_db_connection()
+        conn.execute("UPDATE cache_generation SET generation = generation + 1")
+        conn.commit()
+        conn.close()
+        snapshots.refresh()
+        if APP_MODE == "admin":
+            publish()
+    return response
+
+
+def shared_page(view):
+    """Obsługuje stronę publiczną ze wspólnej pamięci podręcznej (pagecache.py).
+
+    Strona szukana jest pod generacją bieżącej migawki treści. Administrator
+    i żądania z oczekującymi komunikatami flash dostają zawsze świeżą stronę,
+    bo jej wygląd zależy od sesji. Strony renderowane strumieniowo są
+    zapisywane po wysłaniu ostatniego fragmentu.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not app.config["SHARED_PAGE_CACHE"] or session.get("admin_logged_in") or session.get("_flashes"):
+            return view(*args, **kwargs)
+        generation = snapshots.get().generation
+        key = f"{request.host}{request.path}|{datetime.now().year}|{storage.cache_tag()}|{ASSETS_VERSION}"
+        cached = page_cache.get(key, generation)
+        if cached is not None:
+            body, etag = cached
+            response = app.response_class(body, mimetype="text/html")
+            response.set_etag(etag)
+            return response.make_conditional(request)
+        response = app.make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+        if not response.is_streamed:
+            body = response.get_data()
+            etag = hashlib.sha1(body).hexdigest()
+            page_cache.set(key, generation, body, etag)
+            response.set_etag(etag)
+            return response
+
+        chunks = response.response
+
+        def store_after_streaming():
+            parts = []
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+            body = "".join(parts).encode()
+            page_cache.set(key, generation, body, hashlib.sha1(body).hexdigest())
+
+        response.response = store_after_streaming()
+        return response
+
+    return wrapper
+
+
 @app.context_processor
 def inject_now():
     """Wstawia bieżący rok oraz stan logowania do kontekstu szablonów."""
@@ -59,23 +824,11 @@ def inject_now():
 
 
 @app.route("/")
+@shared_page
 def index():
     """Strona główna – wyświetla najnowsze aktualności."""
-    conn = get_db_connection()
-    # Pobierz najnowsze 5 aktualności wraz z listą powiązanych obrazów i liczbą obrazów
-    news = conn.execute(
-        """
-        SELECT n.id, n.title, n.content, n.date_posted, n.image,
-               GROUP_CONCAT(ni.filename) AS images,
-               COUNT(ni.id) AS images_count
-        FROM news n
-        LEFT JOIN news_images ni ON ni.news_id = n.id
-        GROUP BY n.id
-        ORDER BY n.date_posted DESC, n.id DESC
-        LIMIT 5
-        """
-    ).fetchall()
-    conn.close()
+    # Najnowsze 5 aktualności; lista zdjęć i ich liczba są utrzymywane przez wyzwalacze
+    news = snapshots.get().news.items[:5]
     return render_template("index.html", news=news)
 
 
@@ -86,17 +839,12 @@ def about():
 
 
 @app.route("/members")
+@shared_page
 def members():
     """Wyświetla członków koła podzielonych na kategorie (opiekunowie, zarząd, członkowie)."""
-    conn = get_db_connection()
-    # Pobierz wszystkich członków i zgrupuj według kategorii
-    rows = conn.execute("SELECT * FROM members ORDER BY id").fetchall()
-    conn.close()
-    categories = {
-        "opiekun": [],
-        "zarząd": [],
-        "członek": [],
-    }
+    # Zgrupuj wszystkich członków według kategorii
+    rows = snapshots.get().members
+    categories = {category: [] for category in MEMBER_CATEGORIES}
     for row in rows:
         cat = row["category"] if row["category"] in categories else "członek"
         categories[cat].append(row)
@@ -117,57 +865,487 @@ def grants():
     return redirect(url_for("achievements"))
 
 
+def render_listing(template: str, **context):
+    """Renderuje stronę z długą listą.
+
+    W trybie STREAM_LISTINGS szablon jest renderowany strumieniowo – nagłówek
+    i nawigacja trafiają do przeglądarki od razu, a gotowy HTML nie jest
+    składany w pamięci w całości, więc jej zużycie nie zależy od liczby wpisów.
+    """
+    if not app.config["STREAM_LISTINGS"]:
+        return render_template(template, **context)
+
+    # stream_template zachowuje kontekst żądania na czas iteracji generatora
+    chunks = stream_template(template, **context)
+
+    def generate():
+        buffer, size, limit = [], 0, STREAM_FIRST_CHUNK
+        for chunk in chunks:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= limit:
+                yield "".join(buffer)
+                buffer, size, limit = [], 0, STREAM_CHUNK
+        yield "".join(buffer)
+
+    return app.response_class(generate(), mimetype="text/html")
+
+
+def day_number(value: date) -> int:
+    """Numer dnia (dni od 1970-01-01) – ten sam, który wyzwalacze zapisują w kolumnach day."""
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def news_months(snapshot) -> list:
+    """Archiwum aktualności z liczników miesięcy: [(rok, [(miesiąc, liczba), ...]), ...], od najnowszych."""
+    years = {}
+    for year, month, count in snapshot.months.get("news", ()):
+        years.setdefault(year, []).append((month, count))
+    return list(years.items())
+
+
+def achievement_years(snapshot) -> list:
+    """Lata z osiągnięciami lub publikacjami i liczba wpisów w każdym: [(rok, liczba), ...]."""
+    years = Counter()
+    for kind in ("achievements", "publications"):
+        for year, _, count in snapshot.months.get(kind, ()):
+            years[year] += count
+    return sorted(years.items(), reverse=True)
+
+
 @app.route("/news")
+@shared_page
 def all_news():
     """Strona wyświetlająca wszystkie aktualności."""
-    conn = get_db_connection()
-    # Pobierz wszystkie aktualności wraz z listą obrazów i liczbą obrazów
-    news_list = conn.execute(
-        """
-        SELECT n.id, n.title, n.content, n.date_posted, n.image,
-               GROUP_CONCAT(ni.filename) AS images,
-               COUNT(ni.id) AS images_count
-        FROM news n
-        LEFT JOIN news_images ni ON ni.news_id = n.id
-        GROUP BY n.id
-        ORDER BY n.date_posted DESC, n.id DESC
-        """
-    ).fetchall()
-    conn.close()
-    return render_template("news.html", news=news_list)
+    snapshot = snapshots.get()
+    # Wszystkie aktualności wraz z listą obrazów i liczbą obrazów
+    return render_listing("news.html", news=snapshot.news, archive=news_months(snapshot), month_names=MONTH_NAMES)
+
+
+@app.route("/news/<int:year>/<int:month>")
+@shared_page
+def news_archive(year: int, month: int):
+    """Aktualności z jednego miesiąca – zakres numerów dni wybierany z migawki przez bisekcję."""
+    if not (1 <= year <= 9998 and 1 <= month <= 12):
+        abort(404)
+    snapshot = snapshots.get()
+    start = day_number(date(year, month, 1))
+    end = day_number(date(year + month // 12, month % 12 + 1, 1))
+    items = snapshot.by_day["news"].between(start, end)
+    if not items:
+        abort(404)
+    return render_listing(
+        "news.html", news=items, archive=news_months(snapshot), month_names=MONTH_NAMES,
+        period=f"{MONTH_NAMES[month]} {year}",
+    )
 
 
 @app.route("/achievements")
+@shared_page
 def achievements():
     """Wyświetla listę osiągnięć oraz publikacji wraz z podglądem zdjęć."""
+    snapshot = snapshots.get()
+    # Osiągnięcia i publikacje wraz z listą wszystkich obrazów (łączonych przecinkiem).
+    # Kolumna image_list jest utrzymywana przez wyzwalacze na tabeli media.
+    # Pierwszy element listy zostanie wyświetlony jako podgląd, a jeśli jest
+    # więcej obrazów, skrypt JavaScript zrealizuje pokaz slajdów.
+    return render_listing(
+        "achievements.html", achievements=snapshot.achievements, publications=snapshot.publications,
+        archive=achievement_years(snapshot),
+    )
+
+
+@app.route("/achievements/<int:year>")
+@shared_page
+def achievements_archive(year: int):
+    """Osiągnięcia i publikacje z jednego roku."""
+    if not 1 <= year <= 9998:
+        abort(404)
+    snapshot = snapshots.get()
+    start, end = day_number(date(year, 1, 1)), day_number(date(year + 1, 1, 1))
+    achievements_list = snapshot.by_day["achievements"].between(start, end)
+    publications_list = snapshot.by_day["publications"].between(start, end)
+    if not achievements_list and not publications_list:
+        abort(404)
+    return render_listing(
+        "achievements.html", achievements=achievements_list, publications=publications_list,
+        archive=achievement_years(snapshot), period=year,
+    )
+
+
+@app.route("/gallery")
+def gallery():
+    """Galeria wszystkich zdjęć aktualności, osiągnięć i publikacji – od najnowszych."""
+    rows, next_before = fetch_gallery_page(snapshots.get(), request.args.get("before", type=int))
+    return render_template(
+        "gallery.html", items=[gallery_item(row) for row in rows], next_before=next_before
+    )
+
+
+@app.route("/uploads/<path:filename>")
+def tenant_upload(filename: str):
+    """Przesłane pliki dzierżawcy z magazynu lokalnego (jeden serwis korzysta z /static/uploads)."""
+    if tenants is None:
+        abort(404)
+    return send_from_directory(current_tenant().upload_folder, filename)
+
+
+@app.route("/gallery.json")
+def gallery_json():
+    """Kolejna strona galerii w formacie JSON, doładowywana przez skrypt podczas przewijania."""
+    rows, next_before = fetch_gallery_page(snapshots.get(), request.args.get("before", type=int))
+    return jsonify(
+        items=[gallery_item(row) for row in rows],
+        next=url_for("gallery_json", before=next_before) if next_before else None,
+    )
+
+
+def encode_cursor(values) -> str:
+    """Zamienia wartości kolumn sortowania ostatniego wiersza na nieprzezroczysty kursor."""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> list:
+    """Odczytuje kursor utworzony przez encode_cursor(); przy błędnym kursorze zgłasza ValueError."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Nieprawidłowy kursor.") from exc
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError("Nieprawidłowy kursor.")
+    return values
+
+
+def build_api_page(snapshot, resource: str, fields: tuple, limit: int, after) -> bytes:
+    """Pobiera z migawki stronę zasobu API (stronicowanie kluczem sortowania) i zwraca JSON."""
+    order = API_RESOURCES[resource]["order"]
+    rows = getattr(snapshot, resource).page(after, limit + 1)
+    data = []
+    for row in rows[:limit]:
+        item = {}
+        for field in fields:
+            value = row[API_COLUMNS.get(field, field)]
+            if field in ("cover_image", "photo") and value:
+                value = media_url(value, external=True)
+            elif field == "images":
+                value = [media_url(f, external=True) for f in value.split(",")] if value else []
+            item[field] = value
+        data.append(item)
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(rows[limit - 1][column] for column in order)
+    return json.dumps({"data": data, "next_cursor": next_cursor}, ensure_ascii=False).encode()
+
+
+@app.route("/api/v1/<resource>")
+def api_list(resource: str):
+    """Publiczne API tylko do odczytu: aktualności, osiągnięcia, publikacje i członkowie.
+
+    Obsługuje wybór pól (?fields=id,title), stronicowanie kursorem (?cursor=,
+    ?limit=) oraz ETag. Gotowe odpowiedzi są zapamiętywane pod kluczem z wersją
+    tabeli, więc powtarzane zapytania obsługiwane są z pamięci, bez SQLite.
+    """
+    spec = API_RESOURCES.get(resource)
+    if spec is None:
+        return jsonify(error="Nieznany zasób."), 404
+    fields_arg = request.args.get("fields")
+    fields = tuple(fields_arg.split(",")) if fields_arg else spec["fields"]
+    if not set(fields) <= set(spec["fields"]):
+        return jsonify(error="Nieznane pole.", fields=spec["fields"]), 400
+    limit = min(max(request.args.get("limit", API_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+    cursor = request.args.get("cursor", "")
+    snapshot = snapshots.get()
+    key = (request.host_url, resource, fields, limit, cursor, snapshot.version(resource)[0], storage.cache_tag())
+    cached = api_cache.get(key)
+    if cached is None:
+        try:
+            after = decode_cursor(cursor, len(spec["order"])) if cursor else None
+            body = build_api_page(snapshot, resource, fields, limit, after)
+        except (ValueError, TypeError):
+            return jsonify(error="Nieprawidłowy kursor."), 400
+        cached = (body, hashlib.sha1(body).hexdigest())
+        api_cache.set(key, cached)
+    body, etag = cached
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def feed_date(value: str) -> datetime:
+    """Zamienia datę zapisaną jako tekst RRRR-MM-DD na datę w strefie UTC."""
+    try:
+        return datetime.strptime(value[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def build_feed(snapshot, kind: str, fmt: str) -> bytes:
+    """Generuje kanał Atom lub RSS z tej samej migawki, z której korzystają strony."""
+    rows = getattr(snapshot, kind).items[:FEED_SIZE]
+    page_url = url_for("all_news" if kind == "news" else "achievements", _external=True)
+    entries = []
+    for row in rows:
+        published = feed_date(row["date_posted"] if kind == "news" else row["date"])
+        entries.append({
+            "id": row["id"],
+            "title": row["title"],
+            "summary": row["content_html"],
+            "link": f"{page_url}#{kind}-{row['id']}",
+            "image": media_url(row["images"][0].thumb or row["cover_image"], external=True) if row["images"] else None,
+            "updated": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "pub_date": format_datetime(published, usegmt=True),
+        })
+    updated = max((entry["updated"] for entry in entries), default="1970-01-01T00:00:00Z")
+    return render_template(
+        f"feed.{fmt}.xml",
+        title=FEEDS[kind],
+        kind=kind,
+        page_url=page_url,
+        feed_url=url_for("feed", kind=kind, fmt=fmt, _external=True),
+        updated=updated,
+        entries=entries,
+    ).encode()
+
+
+@app.route("/feeds/<kind>.<fmt>")
+def feed(kind: str, fmt: str):
+    """Kanał Atom lub RSS z najnowszymi aktualnościami albo osiągnięciami.
+
+    Kanał jest generowany raz na każdą zmianę treści (klucz zawiera wersję
+    tabeli) i wysyłany z nagłówkami ETag oraz Last-Modified, więc czytniki
+    odpytujące kanał dostają zwykle odpowiedź 304.
+    """
+    if kind not in FEEDS or fmt not in ("atom", "rss"):
+        return "Nie znaleziono kanału.", 404
+    snapshot = snapshots.get()
+    version, updated_at = snapshot.version(kind)
+    key = (request.host_url, kind, fmt, version, storage.cache_tag())
+    cached = feed_cache.get(key)
+    if cached is None:
+        body = build_feed(snapshot, kind, fmt)
+        cached = (body, hashlib.sha1(body).hexdigest())
+        feed_cache.set(key, cached)
+    body, etag = cached
+    mimetype = "application/atom+xml" if fmt == "atom" else "application/rss+xml"
+    response = app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    if updated_at:
+        response.last_modified = datetime.strptime(updated_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    return response.make_conditional(request)
+
+
+@app.route("/changes")
+def changes():
+    """Dziennik zmian dla replik: zmiany o numerach większych niż ?since=.
+
+    Każda zmiana zawiera bieżący stan wiersza (row) albo null, jeśli wiersz
+    został w międzyczasie usunięty – replika nanosi więc zawsze najnowszy
+    stan. Zmiany zdjęć podają w polu files adresy przesłanych plików (jak
+    media_url – z magazynu zdalnego albo spod /uploads dzierżawcy), z których
+    replika je pobiera. Pole next to kursor następnego zapytania, latest –
+    ostatnia zmiana na serwerze (do wyliczenia opóźnienia repliki).
+    """
+    if REPLICATION_TOKEN and request.headers.get("Authorization") != f"Bearer {REPLICATION_TOKEN}":
+        return jsonify(error="Brak dostępu."), 403
+    since = max(request.args.get("since", 0, type=int), 0)
+    limit = min(max(request.args.get("limit", CHANGES_PAGE_SIZE, type=int), 1), CHANGES_MAX_PAGE_SIZE)
     conn = get_db_connection()
-    # Pobierz osiągnięcia wraz z listą wszystkich obrazów (łączonych przecinkiem).
-    # Używamy GROUP_CONCAT, aby przekazać pełną listę zdjęć do szablonu. Pierwszy
-    # element listy zostanie wyświetlony jako podgląd, a jeśli jest więcej
-    # obrazów, skrypt JavaScript zrealizuje pokaz slajdów.
-    achievements_list = conn.execute(
-        """
-        SELECT a.id, a.title, a.description, a.date,
-               GROUP_CONCAT(ai.filename) AS images
-        FROM achievements a
-        LEFT JOIN achievement_images ai ON ai.achievement_id = a.id
-        GROUP BY a.id
-        ORDER BY a.date DESC, a.id DESC
-        """
+    conn.execute("BEGIN")
+    log = conn.execute(
+        "SELECT seq, table_name, row_id, changed_at FROM changelog WHERE seq > ? ORDER BY seq LIMIT ?",
+        (since, limit),
     ).fetchall()
-    # Pobierz publikacje wraz z listą wszystkich obrazów (łączonych przecinkiem)
-    publications_list = conn.execute(
-        """
-        SELECT p.id, p.title, p.description, p.date,
-               GROUP_CONCAT(pi.filename) AS images
-        FROM publications p
-        LEFT JOIN publication_images pi ON pi.publication_id = p.id
-        GROUP BY p.id
-        ORDER BY p.date DESC, p.id DESC
-        """
+    items = []
+    for seq, table, row_id, changed_at in log:
+        row = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (row_id,)).fetchone()
+        item = {
+            "seq": seq,
+            "table": table,
+            "id": row_id,
+            "changed_at": changed_at,
+            "row": dict(row) if row is not None else None,
+        }
+        if table == "media" and row is not None:
+            item["files"] = {
+                path: media_url(path, external=True)
+                for path in (row["filename"], row["thumb"])
+                if path and path.startswith("uploads/")
+            }
+        items.append(item)
+    latest = conn.execute("SELECT seq, changed_at FROM changelog ORDER BY seq DESC LIMIT 1").fetchone()
+    schema = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.execute("COMMIT")
+    conn.close()
+    return jsonify(
+        schema=schema,
+        changes=items,
+        next=items[-1]["seq"] if items else since,
+        latest={"seq": latest["seq"], "changed_at": latest["changed_at"]} if latest else {"seq": 0, "changed_at": None},
+    )
+
+
+@app.route("/metrics")
+def metrics():
+    """Metryki w formacie tekstowym Prometheusa: dziennik zmian, opóźnienie replik, konserwacja bazy i pule żądań.
+
+    Liczniki pul dotyczą procesu, który obsłużył żądanie.
+    """
+    conn = get_db_connection()
+    latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog").fetchone()[0]
+    replicas = conn.execute("SELECT * FROM replica_state").fetchall()
+    runs = last_runs(conn)
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    mail_counts = queue_counts(conn)
+    conn.close()
+    now = datetime.now(timezone.utc).timestamp()
+    lines = [
+        "# HELP mikrobot_changelog_seq Numer ostatniej zmiany w dzienniku tej bazy.",
+        "# TYPE mikrobot_changelog_seq gauge",
+        f"mikrobot_changelog_seq {latest}",
+    ]
+    if replicas:
+        lines += [
+            "# HELP mikrobot_replication_lag_seconds Odstęp między ostatnią zmianą źródła a ostatnią zmianą naniesioną na replikę.",
+            "# TYPE mikrobot_replication_lag_seconds gauge",
+            "# HELP mikrobot_replication_pending_changes Liczba zmian źródła oczekujących na naniesienie.",
+            "# TYPE mikrobot_replication_pending_changes gauge",
+            "# HELP mikrobot_replication_last_sync_age_seconds Czas od ostatniej udanej synchronizacji.",
+            "# TYPE mikrobot_replication_last_sync_age_seconds gauge",
+        ]
+        for row in replicas:
+            label = row["source"].replace("\\", "\\\\").replace('"', '\\"')
+            pending = max(row["source_seq"] - row["applied_seq"], 0)
+            lag = 0.0
+            if pending and row["source_changed_at"] is not None:
+                lag = max(row["source_changed_at"] - (row["applied_changed_at"] or 0), 0.0)
+            lines += [
+                f'mikrobot_replication_lag_seconds{{source="{label}"}} {lag:.3f}',
+                f'mikrobot_replication_pending_changes{{source="{label}"}} {pending}',
+                f'mikrobot_replication_last_sync_age_seconds{{source="{label}"}} {now - (row["synced_at"] or 0):.3f}',
+            ]
+    lines += [
+        "# HELP mikrobot_db_free_pages Wolne strony w pliku bazy (do odzyskania przez incremental_vacuum).",
+        "# TYPE mikrobot_db_free_pages gauge",
+        f"mikrobot_db_free_pages {free_pages}",
+        "# HELP mikrobot_maintenance_last_run_timestamp Początek ostatniego wykonania zadania konserwacji.",
+        "# TYPE mikrobot_maintenance_last_run_timestamp gauge",
+        "# HELP mikrobot_maintenance_last_duration_seconds Czas ostatniego wykonania zadania konserwacji.",
+        "# TYPE mikrobot_maintenance_last_duration_seconds gauge",
+        "# HELP mikrobot_maintenance_last_success Czy ostatnie wykonanie zadania się powiodło.",
+        "# TYPE mikrobot_maintenance_last_success gauge",
+    ]
+    for task, row in sorted(runs.items()):
+        lines += [
+            f'mikrobot_maintenance_last_run_timestamp{{task="{task}"}} {row["started_at"]:.0f}',
+            f'mikrobot_maintenance_last_duration_seconds{{task="{task}"}} {row["duration"]:.3f}',
+            f'mikrobot_maintenance_last_success{{task="{task}"}} {row["ok"]}',
+        ]
+    lines += [
+        "# HELP mikrobot_mail_queue Wiadomości z formularza kontaktowego według stanu wysyłki.",
+        "# TYPE mikrobot_mail_queue gauge",
+    ]
+    for status in ("queued", "sent", "failed"):
+        lines.append(f'mikrobot_mail_queue{{status="{status}"}} {mail_counts.get(status, 0)}')
+    if tenants is not None:
+        lines += [
+            "# HELP mikrobot_tenants_open Dzierżawcy wczytani w tym procesie.",
+            "# TYPE mikrobot_tenants_open gauge",
+            f"mikrobot_tenants_open {len(tenants)}",
+        ]
+    lines += [
+        "# HELP mikrobot_admission_active Żądania obsługiwane w puli.",
+        "# TYPE mikrobot_admission_active gauge",
+        "# HELP mikrobot_admission_waiting Żądania oczekujące w kolejce puli.",
+        "# TYPE mikrobot_admission_waiting gauge",
+        "# HELP mikrobot_admission_admitted_total Żądania przyjęte przez pulę.",
+        "# TYPE mikrobot_admission_admitted_total counter",
+        "# HELP mikrobot_admission_shed_total Żądania odrzucone z odpowiedzią 503.",
+        "# TYPE mikrobot_admission_shed_total counter",
+    ]
+    for pool in admission.all_pools():
+        lines += [
+            f'mikrobot_admission_active{{pool="{pool.name}"}} {pool.active}',
+            f'mikrobot_admission_waiting{{pool="{pool.name}"}} {pool.waiting}',
+            f'mikrobot_admission_admitted_total{{pool="{pool.name}"}} {pool.admitted}',
+            f'mikrobot_admission_shed_total{{pool="{pool.name}"}} {pool.shed}',
+        ]
+    return app.response_class("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def admin_listing(table: str) -> dict:
+    """Strona listy panelu według parametrów adresu: ?q= (początek tytułu), ?year=, ?category=, ?sort=, ?dir=, ?page=.
+
+    Pobierane są tylko wyświetlane kolumny; sortowanie i filtry korzystają
+    z indeksów (tytuł/imię NOCASE, data, numer dnia, kategoria).
+    """
+    spec = ADMIN_TABLES[table]
+    sort = request.args.get("sort")
+    if sort not in spec["sorts"]:
+        sort = spec["default_sort"]
+    order, direction = spec["sorts"][sort]
+    if request.args.get("dir") in ("asc", "desc"):
+        direction = request.args["dir"]
+    where, params = [], []
+    query = request.args.get("q", "").strip()
+    if query:
+        # Zakres zamiast LIKE: porównanie NOCASE korzysta z indeksu tytułu
+        where.append(f"{spec['search']} >= ? COLLATE NOCASE AND {spec['search']} < ? COLLATE NOCASE")
+        params += [query, query + "\U0010ffff"]
+    year = request.args.get("year", type=int) if spec["year_filter"] else None
+    if year is not None and 1 <= year < 9999:
+        where.append("day >= ? AND day < ?")
+        params += [day_number(date(year, 1, 1)), day_number(date(year + 1, 1, 1))]
+    else:
+        year = None
+    category = request.args.get("category") if table == "members" else None
+    if category in MEMBER_CATEGORIES:
+        where.append("category = ?")
+        params.append(category)
+    else:
+        category = None
+    condition = f"WHERE {' AND '.join(where)}" if where else ""
+    columns = ", ".join(["id"] + [key for key, _, _ in spec["columns"]])
+
+    conn = get_db_connection()
+    total = conn.execute(f"SELECT COUNT(*) FROM {table} {condition}", params).fetchone()[0]
+    pages = max((total + ADMIN_PAGE_SIZE - 1) // ADMIN_PAGE_SIZE, 1)
+    page = min(max(request.args.get("page", 1, type=int), 1), pages)
+    rows = conn.execute(
+        f"SELECT {columns} FROM {table} {condition} "
+        f"ORDER BY {', '.join(f'{column} {direction.upper()}' for column in order)} LIMIT ? OFFSET ?",
+        params + [ADMIN_PAGE_SIZE, (page - 1) * ADMIN_PAGE_SIZE],
     ).fetchall()
+    years = []
+    if spec["year_filter"]:
+        years = [row[0] for row in conn.execute(
+            "SELECT DISTINCT year FROM archive_months WHERE kind = ? ORDER BY year DESC", (table,)
+        )]
     conn.close()
-    return render_template("achievements.html", achievements=achievements_list, publications=publications_list)
+    return {
+        "table": table,
+        "spec": spec,
+        "rows": rows,
+        "total": total,
+        "page": page,
+        "pages": pages,
+        "sort": sort,
+        "direction": direction,
+        "years": years,
+        "categories": MEMBER_CATEGORIES if table == "members" else (),
+        # Bieżące parametry listy – podstawa odnośników sortowania i stronicowania
+        "params": {"q": query or None, "year": year, "category": category, "sort": sort, "dir": direction},
+    }
+
+
+def render_admin_list(template: str, table: str):
+    """Renderuje stronę z listą panelu albo – dla skryptu (nagłówek X-Fragment) – samą tabelę."""
+    listing = admin_listing(table)
+    if request.headers.get("X-Fragment"):
+        response = make_response(render_template("admin_table.html", listing=listing, fragment=True))
+    else:
+        response = make_response(render_template(template, listing=listing))
+    response.vary.add("X-Fragment")
+    return response
 
 
 @app.route("/skrwaw/members", methods=["GET", "POST"])
@@ -178,7 +1356,7 @@ def admin_members():
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     # Upewnij się, że katalog upload istnieje
-    app.config["UPLOAD_FOLDER"].mkdir(parents=True, exist_ok=True)
+    current_tenant().upload_folder.mkdir(parents=True, exist_ok=True)
     if request.method == "POST":
         name = request.form.get("name")
         role = request.form.get("role")
@@ -191,33 +1369,24 @@ def admin_members():
             if not category:
                 flash("Wybierz kategorię.", "warning")
                 return redirect(url_for("admin_members"))
-            photo_filename = None
-            if uploaded_file and uploaded_file.filename:
-                filename = secure_filename(uploaded_file.filename)
-                if allowed_file(filename):
-                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                    name_part, ext = filename.rsplit('.', 1)
-                    unique_filename = f"member_{timestamp}.{ext.lower()}"
-                    save_path = app.config["UPLOAD_FOLDER"] / unique_filename
-                    uploaded_file.save(save_path)
-                    photo_filename = f"uploads/{unique_filename}"
-                else:
-                    flash("Niedozwolony format pliku.", "warning")
-                    return redirect(url_for("admin_members"))
+            media = save_media([uploaded_file], "member")
+            if media is None:
+                flash("Niedozwolony format pliku lub zbyt duże zdjęcie.", "warning")
+                return redirect(url_for("admin_members"))
             conn = get_db_connection()
-            conn.execute(
-                "INSERT INTO members (name, role, description, photo, category) VALUES (?, ?, ?, ?, ?)",
-                (name.strip(), role.strip(), description.strip(), photo_filename or "", category)
-            )
-            conn.commit()
+            with media_transaction(conn, media) as cur:
+                # Kolumnę photo ustawia wyzwalacz po dodaniu zdjęcia do tabeli media
+                cur.execute(
+                    "INSERT INTO members (name, role, description, photo, category) VALUES (?, ?, ?, '', ?)",
+                    (name.strip(), role.strip(), description.strip(), category)
+                )
+                for item in media:
+                    insert_media(cur, "members", cur.lastrowid, item)
             conn.close()
             flash("Członek dodany pomyślnie!", "success")
             return redirect(url_for("admin_members"))
-    # Pobierz listę członków
-    conn = get_db_connection()
-    members_list = conn.execute("SELECT * FROM members ORDER BY id").fetchall()
-    conn.close()
-    return render_template("admin_members.html", members=members_list)
+    # Lista członków z filtrami i stronicowaniem
+    return render_admin_list("admin_members.html", "members")
 
 
 @app.route("/skrwaw/members/edit/<int:member_id>", methods=["GET", "POST"])
@@ -246,36 +1415,35 @@ def edit_member(member_id: int):
                 flash("Wybierz kategorię.", "warning")
                 conn.close()
                 return redirect(url_for("edit_member", member_id=member_id))
-            photo_filename = member["photo"]
             # Obsłuż ewentualną zmianę zdjęcia
-            if uploaded_file and uploaded_file.filename:
-                filename = secure_filename(uploaded_file.filename)
-                if allowed_file(filename):
-                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                    name_part, ext = filename.rsplit('.', 1)
-                    unique_filename = f"member_{timestamp}.{ext.lower()}"
-                    save_path = app.config["UPLOAD_FOLDER"] / unique_filename
-                    uploaded_file.save(save_path)
-                    new_photo_path = f"uploads/{unique_filename}"
-                    # Usuń stary plik jeśli istniał
-                    if photo_filename:
-                        old_path = BASE_DIR / "static" / photo_filename
-                        try:
-                            old_path.unlink()
-                        except FileNotFoundError:
-                            pass
-                    photo_filename = new_photo_path
-                else:
-                    flash("Niedozwolony format pliku.", "warning")
-                    conn.close()
-                    return redirect(url_for("edit_member", member_id=member_id))
-            # Aktualizuj wiersz wraz z kategorią
-            conn.execute(
-                "UPDATE members SET name = ?, role = ?, description = ?, photo = ?, category = ? WHERE id = ?",
-                (name.strip(), role.strip(), description.strip(), photo_filename or "", category, member_id)
-            )
-            conn.commit()
+            media = save_media([uploaded_file], "member")
+            if media is None:
+                flash("Niedozwolony format pliku lub zbyt duże zdjęcie.", "warning")
+                conn.close()
+                return redirect(url_for("edit_member", member_id=member_id))
+            old_photos = []
+            with media_transaction(conn, media) as cur:
+                # Aktualizuj wiersz wraz z kategorią
+                cur.execute(
+                    "UPDATE members SET name = ?, role = ?, description = ?, category = ? WHERE id = ?",
+                    (name.strip(), role.strip(), description.strip(), category, member_id)
+                )
+                found = cur.rowcount > 0
+                if found and media:
+                    # Zastąp stare zdjęcie; wyzwalacz ustawi nowe photo
+                    old_photos = get_media(conn, "members", member_id)
+                    for old in old_photos:
+                        cur.execute("DELETE FROM media WHERE id = ?", (old["id"],))
+                    insert_media(cur, "members", member_id, media[0])
             conn.close()
+            # Pliki usuwane dopiero po zatwierdzeniu zmian w bazie
+            for old in old_photos:
+                remove_media_files(old)
+            if not found:
+                # Członek został usunięty w trakcie edycji
+                discard_media(media)
+                flash("Nie znaleziono podanego członka.", "danger")
+                return redirect(url_for("admin_members"))
             flash("Dane członka zaktualizowane pomyślnie!", "success")
             return redirect(url_for("admin_members"))
     conn.close()
@@ -290,21 +1458,12 @@ def delete_member(member_id: int):
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     conn = get_db_connection()
-    member = conn.execute("SELECT * FROM members WHERE id = ?", (member_id,)).fetchone()
-    if not member:
-        conn.close()
+    # Usuń członka wraz ze zdjęciem (wiersz media i pliki)
+    deleted = delete_owner(conn, "members", member_id)
+    conn.close()
+    if not deleted:
         flash("Nie znaleziono podanego członka.", "danger")
         return redirect(url_for("admin_members"))
-    # Usuń zdjęcie, jeśli istnieje
-    if member["photo"]:
-        photo_path = BASE_DIR / "static" / member["photo"]
-        try:
-            photo_path.unlink()
-        except FileNotFoundError:
-            pass
-    conn.execute("DELETE FROM members WHERE id = ?", (member_id,))
-    conn.commit()
-    conn.close()
     flash("Członek został usunięty.", "success")
     return redirect(url_for("admin_members"))
 
@@ -317,7 +1476,7 @@ def admin_achievements():
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     # Upewnij się, że katalog upload istnieje
-    app.config["UPLOAD_FOLDER"].mkdir(parents=True, exist_ok=True)
+    current_tenant().upload_folder.mkdir(parents=True, exist_ok=True)
     if request.method == "POST":
         title = request.form.get("title")
         description = request.form.get("description")
@@ -326,50 +1485,26 @@ def admin_achievements():
         if not title or not description or not date_str:
             flash("Uzupełnij wszystkie pola.", "warning")
         else:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO achievements (title, description, date) VALUES (?, ?, ?)",
-                (title.strip(), description.strip(), date_str.strip())
-            )
-            achievement_id = cur.lastrowid
             # Zapisz wiele obrazów
-            for uploaded_file in uploaded_files:
-                if uploaded_file and uploaded_file.filename:
-                    filename = secure_filename(uploaded_file.filename)
-                    if allowed_file(filename):
-                        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                        name_part, ext = filename.rsplit('.', 1)
-                        unique_filename = f"ach_{achievement_id}_{timestamp}.{ext.lower()}"
-                        save_path = app.config["UPLOAD_FOLDER"] / unique_filename
-                        uploaded_file.save(save_path)
-                        image_rel_path = f"uploads/{unique_filename}"
-                        cur.execute(
-                            "INSERT INTO achievement_images (achievement_id, filename) VALUES (?, ?)",
-                            (achievement_id, image_rel_path)
-                        )
-                    else:
-                        flash("Jeden z plików ma niedozwolone rozszerzenie.", "warning")
-                        conn.rollback()
-                        conn.close()
-                        return redirect(url_for("admin_achievements"))
-            conn.commit()
+            media = save_media(uploaded_files, "ach")
+            if media is None:
+                flash("Jeden z plików ma niedozwolone rozszerzenie lub zbyt dużą rozdzielczość.", "warning")
+                return redirect(url_for("admin_achievements"))
+            conn = get_db_connection()
+            with media_transaction(conn, media) as cur:
+                cur.execute(
+                    "INSERT INTO achievements (title, description, content_html, excerpt, word_count, date) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (title.strip(), description.strip(), *render_markup(description), date_str.strip())
+                )
+                achievement_id = cur.lastrowid
+                for item in media:
+                    insert_media(cur, "achievements", achievement_id, item)
             conn.close()
             flash("Osiągnięcie dodane pomyślnie!", "success")
             return redirect(url_for("admin_achievements"))
-    # Pobierz listę osiągnięć wraz z liczbą obrazów
-    conn = get_db_connection()
-    achievements_list = conn.execute(
-        """
-        SELECT a.id, a.title, a.description, a.date, COUNT(ai.id) AS images_count
-        FROM achievements a
-        LEFT JOIN achievement_images ai ON ai.achievement_id = a.id
-        GROUP BY a.id
-        ORDER BY a.date DESC, a.id DESC
-        """
-    ).fetchall()
-    conn.close()
-    return render_template("admin_achievements.html", achievements=achievements_list)
+    # Lista osiągnięć wraz z liczbą obrazów
+    return render_admin_list("admin_achievements.html", "achievements")
 
 
 @app.route("/skrwaw/achievements/edit/<int:achievement_id>", methods=["GET", "POST"])
@@ -389,10 +1524,7 @@ def edit_achievement(achievement_id: int):
         flash("Nie znaleziono podanego osiągnięcia.", "danger")
         return redirect(url_for("admin_achievements"))
     # Pobierz powiązane obrazy
-    images = cur.execute(
-        "SELECT id, filename FROM achievement_images WHERE achievement_id = ? ORDER BY id",
-        (achievement_id,)
-    ).fetchall()
+    images = get_media(conn, "achievements", achievement_id)
     if request.method == "POST":
         title = request.form.get("title")
         description = request.form.get("description")
@@ -401,33 +1533,29 @@ def edit_achievement(achievement_id: int):
         if not title or not description or not date_str:
             flash("Uzupełnij wszystkie pola.", "warning")
         else:
-            # Aktualizuj rekord z nową datą (łańcuch tekstowy)
-            cur.execute(
-                "UPDATE achievements SET title = ?, description = ?, date = ? WHERE id = ?",
-                (title.strip(), description.strip(), date_str.strip(), achievement_id)
-            )
             # Dodaj nowe pliki, jeśli są przesłane
-            for uploaded_file in uploaded_files:
-                if uploaded_file and uploaded_file.filename:
-                    filename = secure_filename(uploaded_file.filename)
-                    if allowed_file(filename):
-                        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                        name_part, ext = filename.rsplit('.', 1)
-                        unique_filename = f"ach_{achievement_id}_{timestamp}.{ext.lower()}"
-                        save_path = app.config["UPLOAD_FOLDER"] / unique_filename
-                        uploaded_file.save(save_path)
-                        image_rel_path = f"uploads/{unique_filename}"
-                        cur.execute(
-                            "INSERT INTO achievement_images (achievement_id, filename) VALUES (?, ?)",
-                            (achievement_id, image_rel_path)
-                        )
-                    else:
-                        flash("Jeden z plików ma niedozwolone rozszerzenie.", "warning")
-                        conn.rollback()
-                        conn.close()
-                        return redirect(url_for("edit_achievement", achievement_id=achievement_id))
-            conn.commit()
+            media = save_media(uploaded_files, f"ach_{achievement_id}")
+            if media is None:
+                flash("Jeden z plików ma niedozwolone rozszerzenie lub zbyt dużą rozdzielczość.", "warning")
+                conn.close()
+                return redirect(url_for("edit_achievement", achievement_id=achievement_id))
+            with media_transaction(conn, media) as cur:
+                # Aktualizuj rekord z nową datą (łańcuch tekstowy)
+                cur.execute(
+                    "UPDATE achievements SET title = ?, description = ?, content_html = ?, excerpt = ?, "
+                    "word_count = ?, date = ? WHERE id = ?",
+                    (title.strip(), description.strip(), *render_markup(description), date_str.strip(),
+                     achievement_id)
+                )
+                # Osiągnięcie mogło zostać usunięte w trakcie edycji
+                found = cur.rowcount > 0
+                for item in media if found else ():
+                    insert_media(cur, "achievements", achievement_id, item)
             conn.close()
+            if not found:
+                discard_media(media)
+                flash("Nie znaleziono podanego osiągnięcia.", "danger")
+                return redirect(url_for("admin_achievements"))
             flash("Osiągnięcie zaktualizowane pomyślnie!", "success")
             return redirect(url_for("admin_achievements"))
     conn.close()
@@ -442,22 +1570,12 @@ def delete_achievement(achievement_id: int):
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     conn = get_db_connection()
-    # Pobierz obrazy, aby usunąć pliki
-    images = conn.execute(
-        "SELECT filename FROM achievement_images WHERE achievement_id = ?",
-        (achievement_id,)
-    ).fetchall()
-    for row in images:
-        if row["filename"]:
-            image_path = BASE_DIR / "static" / row["filename"]
-            try:
-                image_path.unlink()
-            except FileNotFoundError:
-                pass
-    # Usuń rekord w achievements (ON DELETE CASCADE usuwa powiązane obrazy)
-    conn.execute("DELETE FROM achievements WHERE id = ?", (achievement_id,))
-    conn.commit()
+    # Usuń rekord w achievements wraz z wierszami media i plikami zdjęć
+    deleted = delete_owner(conn, "achievements", achievement_id)
     conn.close()
+    if not deleted:
+        flash("Nie znaleziono podanego osiągnięcia.", "danger")
+        return redirect(url_for("admin_achievements"))
     flash("Osiągnięcie usunięte pomyślnie!", "success")
     return redirect(url_for("admin_achievements"))
 
@@ -470,27 +1588,13 @@ def delete_achievement_image(image_id: int):
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     conn = get_db_connection()
-    # Pobierz obraz
-    row = conn.execute(
-        "SELECT achievement_id, filename FROM achievement_images WHERE id = ?",
-        (image_id,)
-    ).fetchone()
+    # Usuń rekord, a po nim plik
+    row = delete_media(conn, "achievements", image_id)
+    conn.close()
     if not row:
-        conn.close()
         flash("Nie znaleziono zdjęcia.", "danger")
         return redirect(url_for("admin_achievements"))
-    # Usuń plik
-    if row["filename"]:
-        image_path = BASE_DIR / "static" / row["filename"]
-        try:
-            image_path.unlink()
-        except FileNotFoundError:
-            pass
-    # Usuń rekord
-    conn.execute("DELETE FROM achievement_images WHERE id = ?", (image_id,))
-    conn.commit()
-    achievement_id = row["achievement_id"]
-    conn.close()
+    achievement_id = row["owner_id"]
     flash("Zdjęcie zostało usunięte.", "success")
     return redirect(url_for("edit_achievement", achievement_id=achievement_id))
 
@@ -501,10 +1605,40 @@ def statute():
     return render_template("statute.html")
 
 
-@app.route("/contact")
+@app.route("/contact", methods=["GET", "POST"])
 def contact():
-    """Dane kontaktowe i formularz kontaktowy (do rozwinięcia)."""
-    return render_template("contact.html")
+    """Dane kontaktowe i formularz kontaktowy.
+
+    Wiadomość trafia do kolejki w bazie (także w trybie public – kolejka jest
+    w bazie głównej, nie w opublikowanej kopii) i jest wysyłana w tle, więc
+    odpowiedź nie czeka na serwer poczty. Z jednego adresu IP przyjmowanych
+    jest najwyżej kilka wiadomości na godzinę.
+    """
+    if request.method == "GET":
+        return render_template("contact.html", form={})
+    name = " ".join(request.form.get("name", "").split())
+    email = request.form.get("email", "").strip()
+    message = request.form.get("message", "").strip()
+    if (
+        not name or len(name) > CONTACT_MAX_NAME or not EMAIL_PATTERN.match(email)
+        or not message or len(message) > CONTACT_MAX_MESSAGE
+    ):
+        flash(f"Podaj imię, poprawny adres e-mail i treść wiadomości (do {CONTACT_MAX_MESSAGE} znaków).", "danger")
+        return render_template("contact.html", form=request.form), 400
+    conn = sqlite3.connect(current_tenant().database, timeout=5)
+    try:
+        accepted = enqueue(conn, name, email, message, request.remote_addr or "")
+    finally:
+        conn.close()
+    if not accepted:
+        flash("Wysłano zbyt wiele wiadomości z tego adresu. Spróbuj ponownie później.", "danger")
+        response = app.make_response((render_template("contact.html", form=request.form), 429))
+        response.headers["Retry-After"] = str(RATE_WINDOW)
+        return response
+    if mail_worker is not None:
+        mail_worker.notify()
+    flash("Dziękujemy! Wiadomość została przyjęta – odpowiemy najszybciej, jak to możliwe.", "success")
+    return redirect(url_for("contact"))
 
 
 @app.route("/skrwaw/news", methods=["GET", "POST"])
@@ -515,7 +1649,7 @@ def admin_news():
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     # Upewnij się, że folder na pliki istnieje
-    app.config["UPLOAD_FOLDER"].mkdir(parents=True, exist_ok=True)
+    current_tenant().upload_folder.mkdir(parents=True, exist_ok=True)
     if request.method == "POST":
         title = request.form.get("title")
         content = request.form.get("content")
@@ -523,58 +1657,33 @@ def admin_news():
         if not title or not content:
             flash("Uzupełnij wszystkie pola.", "warning")
         else:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            images_to_insert = []
-            first_image = None
             # Przetwarzanie wielu plików (jeśli przesłane)
-            for file in uploaded_files:
-                if file and file.filename:
-                    fname = secure_filename(file.filename)
-                    if allowed_file(fname):
-                        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                        name_part, ext = fname.rsplit('.', 1)
-                        unique_filename = f"news_{timestamp}.{ext.lower()}"
-                        save_path = app.config["UPLOAD_FOLDER"] / unique_filename
-                        file.save(save_path)
-                        rel_path = f"uploads/{unique_filename}"
-                        # Zapisz pierwszy obraz jako miniaturę w tabeli news
-                        if not first_image:
-                            first_image = rel_path
-                        images_to_insert.append(rel_path)
-                    else:
-                        flash("Jeden z plików ma niedozwolone rozszerzenie. Dozwolone: png, jpg, jpeg, gif.", "warning")
-                        conn.close()
-                        return redirect(url_for("admin_news"))
-            # Wstaw wpis do tabeli news z datą aktualną (bez czasu) i miniaturą (może być None)
-            cur.execute(
-                "INSERT INTO news (title, content, date_posted, image) VALUES (?, ?, ?, ?)",
-                (title.strip(), content.strip(), datetime.now().strftime("%Y-%m-%d"), first_image),
-            )
-            news_id = cur.lastrowid
-            # Zapisz wszystkie obrazy do tabeli news_images
-            for rel_path in images_to_insert:
+            media = save_media(uploaded_files, "news")
+            if media is None:
+                flash(
+                    "Jeden z plików ma niedozwolone rozszerzenie (dozwolone: png, jpg, jpeg, gif) "
+                    "lub zbyt dużą rozdzielczość.",
+                    "warning",
+                )
+                return redirect(url_for("admin_news"))
+            conn = get_db_connection()
+            with media_transaction(conn, media) as cur:
+                # Wstaw wpis do tabeli news z datą aktualną (bez czasu)
                 cur.execute(
-                    "INSERT INTO news_images (news_id, filename) VALUES (?, ?)",
-                    (news_id, rel_path)
+                    "INSERT INTO news (title, content, content_html, excerpt, word_count, date_posted) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (title.strip(), content.strip(), *render_markup(content), datetime.now().strftime("%Y-%m-%d")),
                 )
-            conn.commit()
+                news_id = cur.lastrowid
+                # Zapisz wszystkie obrazy do tabeli media; wyzwalacze ustawią miniaturę
+                # (cover_image) oraz liczbę zdjęć w tabeli news
+                for item in media:
+                    insert_media(cur, "news", news_id, item)
             conn.close()
             flash("Aktualność dodana pomyślnie!", "success")
             return redirect(url_for("admin_news"))
     # Przy GET lub po zakończonej operacji – wyświetl listę aktualności wraz z liczbą zdjęć
-    conn = get_db_connection()
-    news_list = conn.execute(
-        """
-        SELECT n.id, n.title, n.content, n.date_posted, n.image, COUNT(ni.id) AS images_count
-        FROM news n
-        LEFT JOIN news_images ni ON ni.news_id = n.id
-        GROUP BY n.id
-        ORDER BY n.date_posted DESC, n.id DESC
-        """
-    ).fetchall()
-    conn.close()
-    return render_template("admin_news.html", news=news_list)
+    return render_admin_list("admin_news.html", "news")
 
 
 @app.route("/skrwaw/news/edit/<int:news_id>", methods=["GET", "POST"])
@@ -593,10 +1702,7 @@ def edit_news(news_id: int):
         flash("Nie znaleziono podanej aktualności.", "danger")
         return redirect(url_for("admin_news"))
     # Pobierz powiązane obrazy
-    images = cur.execute(
-        "SELECT id, filename FROM news_images WHERE news_id = ? ORDER BY id",
-        (news_id,)
-    ).fetchall()
+    images = get_media(conn, "news", news_id)
     if request.method == "POST":
         title = request.form.get("title")
         content = request.form.get("content")
@@ -604,59 +1710,27 @@ def edit_news(news_id: int):
         if not title or not content:
             flash("Uzupełnij wszystkie pola.", "warning")
         else:
-            # Aktualizuj tytuł i treść
-            cur.execute(
-                "UPDATE news SET title = ?, content = ? WHERE id = ?",
-                (title.strip(), content.strip(), news_id),
-            )
-            # Obsłuż nowe pliki: zapisuj i dodawaj do tabeli; pierwszy nowy obraz staje się miniaturą w tabeli news
-            new_image_thumbnail = None
-            for file in uploaded_files:
-                if file and file.filename:
-                    fname = secure_filename(file.filename)
-                    if allowed_file(fname):
-                        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                        name_part, ext = fname.rsplit('.', 1)
-                        unique_filename = f"news_{news_id}_{timestamp}.{ext.lower()}"
-                        save_path = app.config["UPLOAD_FOLDER"] / unique_filename
-                        file.save(save_path)
-                        rel_path = f"uploads/{unique_filename}"
-                        # Jeśli to pierwszy z nowych plików, zaktualizuj miniaturę w news
-                        if not new_image_thumbnail:
-                            new_image_thumbnail = rel_path
-                        cur.execute(
-                            "INSERT INTO news_images (news_id, filename) VALUES (?, ?)",
-                            (news_id, rel_path),
-                        )
-                    else:
-                        flash("Jeden z plików ma niedozwolone rozszerzenie.", "warning")
-                        conn.rollback()
-                        conn.close()
-                        return redirect(url_for("edit_news", news_id=news_id))
-            # Jeśli dodano nowy obraz miniatury, usuń poprzednią miniaturę (o ile nie jest w tabeli news_images)
-            if new_image_thumbnail:
-                # Usuń stary plik graficzny, jeśli istnieje i jeśli nie należy do news_images
-                old_image = news_item["image"]
-                if old_image:
-                    # Sprawdź, czy stary plik jest zapisany w news_images; jeśli tak, nie usuwaj go podwójnie
-                    cur2 = conn.cursor()
-                    existing = cur2.execute(
-                        "SELECT 1 FROM news_images WHERE news_id = ? AND filename = ?",
-                        (news_id, old_image),
-                    ).fetchone()
-                    if not existing:
-                        old_path = BASE_DIR / "static" / old_image
-                        try:
-                            old_path.unlink()
-                        except FileNotFoundError:
-                            pass
-                # Zaktualizuj miniaturę w tabeli news
+            # Obsłuż nowe pliki: zapisuj i dodawaj do tabeli; miniaturę aktualizują wyzwalacze
+            media = save_media(uploaded_files, f"news_{news_id}")
+            if media is None:
+                flash("Jeden z plików ma niedozwolone rozszerzenie lub zbyt dużą rozdzielczość.", "warning")
+                conn.close()
+                return redirect(url_for("edit_news", news_id=news_id))
+            with media_transaction(conn, media) as cur:
+                # Aktualizuj tytuł i treść wraz z gotowym HTML-em, skrótem i liczbą słów
                 cur.execute(
-                    "UPDATE news SET image = ? WHERE id = ?",
-                    (new_image_thumbnail, news_id),
+                    "UPDATE news SET title = ?, content = ?, content_html = ?, excerpt = ?, word_count = ? WHERE id = ?",
+                    (title.strip(), content.strip(), *render_markup(content), news_id),
                 )
-            conn.commit()
+                # Aktualność mogła zostać usunięta w trakcie edycji
+                found = cur.rowcount > 0
+                for item in media if found else ():
+                    insert_media(cur, "news", news_id, item)
             conn.close()
+            if not found:
+                discard_media(media)
+                flash("Nie znaleziono podanej aktualności.", "danger")
+                return redirect(url_for("admin_news"))
             flash("Aktualność zaktualizowana pomyślnie!", "success")
             return redirect(url_for("admin_news"))
     conn.close()
@@ -671,41 +1745,12 @@ def delete_news(news_id: int):
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     conn = get_db_connection()
-    # Pobierz wiersz, aby ewentualnie usunąć powiązane pliki
-    news_item = conn.execute("SELECT * FROM news WHERE id = ?", (news_id,)).fetchone()
-    if not news_item:
-        conn.close()
+    # Usuń wiersz z bazy wraz z wierszami media, a po nim pliki wszystkich powiązanych obrazów
+    deleted = delete_owner(conn, "news", news_id)
+    conn.close()
+    if not deleted:
         flash("Nie znaleziono podanej aktualności.", "danger")
         return redirect(url_for("admin_news"))
-    # Usuń wszystkie powiązane obrazy (z tabeli news_images)
-    images = conn.execute(
-        "SELECT filename FROM news_images WHERE news_id = ?",
-        (news_id,)
-    ).fetchall()
-    for row in images:
-        if row["filename"]:
-            img_path = BASE_DIR / "static" / row["filename"]
-            try:
-                img_path.unlink()
-            except FileNotFoundError:
-                pass
-    # Usuń miniaturę zapisane w kolumnie image, jeśli nie znajduje się w news_images (może być duplikatem)
-    if news_item["image"]:
-        # Sprawdź, czy plik jest w news_images; jeśli nie, usuń
-        in_table = conn.execute(
-            "SELECT 1 FROM news_images WHERE news_id = ? AND filename = ?",
-            (news_id, news_item["image"]),
-        ).fetchone()
-        if not in_table:
-            thumb_path = BASE_DIR / "static" / news_item["image"]
-            try:
-                thumb_path.unlink()
-            except FileNotFoundError:
-                pass
-    # Usuń wiersz z bazy (powiązane rekordy w news_images zostaną usunięte dzięki ON DELETE CASCADE)
-    conn.execute("DELETE FROM news WHERE id = ?", (news_id,))
-    conn.commit()
-    conn.close()
     flash("Aktualność usunięta pomyślnie!", "success")
     return redirect(url_for("admin_news"))
 
@@ -718,52 +1763,13 @@ def delete_news_image(image_id: int):
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     conn = get_db_connection()
-    # Pobierz obraz
-    row = conn.execute(
-        "SELECT news_id, filename FROM news_images WHERE id = ?",
-        (image_id,),
-    ).fetchone()
+    # Usuń rekord z bazy, a po zatwierdzeniu plik z dysku
+    row = delete_media(conn, "news", image_id)
+    conn.close()
     if not row:
-        conn.close()
         flash("Nie znaleziono zdjęcia.", "danger")
         return redirect(url_for("admin_news"))
-    # Usuń plik z dysku
-    if row["filename"]:
-        image_path = BASE_DIR / "static" / row["filename"]
-        try:
-            image_path.unlink()
-        except FileNotFoundError:
-            pass
-    # Usuń rekord z bazy
-    conn.execute("DELETE FROM news_images WHERE id = ?", (image_id,))
-    # Jeśli usunięte zdjęcie było również miniaturą w tabeli news, zaktualizuj miniaturę na inny obraz lub NULL
-    news_id = row["news_id"]
-    # Sprawdź, czy ten plik był przypisany jako miniatura
-    cur = conn.cursor()
-    # Pobierz bieżącą miniaturę
-    current_thumb = cur.execute(
-        "SELECT image FROM news WHERE id = ?",
-        (news_id,),
-    ).fetchone()
-    if current_thumb and current_thumb[0] == row["filename"]:
-        # Znajdź inny obraz powiązany z aktualnością, aby ustawić go jako miniaturę
-        new_thumb = cur.execute(
-            "SELECT filename FROM news_images WHERE news_id = ? ORDER BY id LIMIT 1",
-            (news_id,),
-        ).fetchone()
-        if new_thumb:
-            cur.execute(
-                "UPDATE news SET image = ? WHERE id = ?",
-                (new_thumb[0], news_id),
-            )
-        else:
-            # Brak innych obrazów – ustaw miniaturę na NULL
-            cur.execute(
-                "UPDATE news SET image = NULL WHERE id = ?",
-                (news_id,),
-            )
-    conn.commit()
-    conn.close()
+    news_id = row["owner_id"]
     flash("Zdjęcie zostało usunięte.", "success")
     return redirect(url_for("edit_news", news_id=news_id))
 
@@ -776,6 +1782,115 @@ def admin_logout():
     flash("Wylogowano pomyślnie!", "info")
     return redirect(url_for("admin_home"))
 
+
+@app.route("/skrwaw/messages")
+def admin_messages():
+    """Skrzynka wiadomości z formularza kontaktowego wraz ze stanem wysyłki."""
+    if not session.get("admin_logged_in"):
+        flash("Zaloguj się do panelu administracyjnego.", "danger")
+        return redirect(url_for("admin_home"))
+    conn = get_db_connection()
+    messages = conn.execute(
+        """
+        SELECT *, strftime('%Y-%m-%d %H:%M', created_at, 'unixepoch', 'localtime') AS created,
+               strftime('%Y-%m-%d %H:%M', next_attempt_at, 'unixepoch', 'localtime') AS next_attempt
+        FROM contact_messages ORDER BY id DESC LIMIT ?
+        """,
+        (INBOX_SIZE,),
+    ).fetchall()
+    counts = queue_counts(conn)
+    conn.close()
+    return render_template(
+        "admin_messages.html", messages=messages, counts=counts, mail_enabled=MAIL_SETTINGS is not None
+    )
+
+
+@app.route("/skrwaw/messages/retry/<int:message_id>", methods=["POST"])
+def retry_message(message_id: int):
+    """Ponownie wstawia wiadomość do kolejki wysyłki (np. po awarii serwera poczty)."""
+    if not session.get("admin_logged_in"):
+        flash("Zaloguj się do panelu administracyjnego.", "danger")
+        return redirect(url_for("admin_home"))
+    conn = get_db_connection()
+    conn.execute(
+        f"UPDATE contact_messages SET status = 'queued', attempts = 0, next_attempt_at = {UNIX_NOW_SQL} "
+        "WHERE id = ? AND status != 'sent'",
+        (message_id,),
+    )
+    conn.commit()
+    conn.close()
+    if mail_worker is not None:
+        mail_worker.notify()
+    flash("Wiadomość wróciła do kolejki wysyłki.", "success")
+    return redirect(url_for("admin_messages"))
+
+
+@app.route("/skrwaw/messages/delete/<int:message_id>", methods=["POST"])
+def delete_message(message_id: int):
+    """Usuwa wiadomość ze skrzynki."""
+    if not session.get("admin_logged_in"):
+        flash("Zaloguj się do panelu administracyjnego.", "danger")
+        return redirect(url_for("admin_home"))
+    conn = get_db_connection()
+    conn.execute("DELETE FROM contact_messages WHERE id = ?", (message_id,))
+    conn.commit()
+    conn.close()
+    flash("Wiadomość usunięta.", "success")
+    return redirect(url_for("admin_messages"))
+
+
+@app.route("/skrwaw/profiles")
+def admin_profiles():
+    """Zapisane profile żądań oraz najgorętsze ścieżki ze stałego próbkowania tego procesu."""
+    if not session.get("admin_logged_in"):
+        flash("Zaloguj się do panelu administracyjnego.", "danger")
+        return redirect(url_for("admin_home"))
+    routes = []
+    for route, stacks in route_sampler.snapshot().items():
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rpartition(";")[2]] += count
+        routes.append({"route": route, "samples": sum(stacks.values()), "hot": leaves.most_common(3)})
+    routes.sort(key=lambda item: -item["samples"])
+    return render_template(
+        "admin_profiles.html",
+        profiles=list_profiles(PROFILE_DIR),
+        routes=routes,
+        interval=PROFILE_SAMPLE_INTERVAL,
+    )
+
+
+@app.route("/skrwaw/profiles/<name>")
+def view_profile(name: str):
+    """Wykres płomieniowy zapisanego profilu; ?format=collapsed pobiera plik."""
+    if not session.get("admin_logged_in"):
+        flash("Zaloguj się do panelu administracyjnego.", "danger")
+        return redirect(url_for("admin_home"))
+    path = safe_join(str(PROFILE_DIR), name)
+    if path is None or not name.endswith(".collapsed") or not os.path.isfile(path):
+        abort(404)
+    if request.args.get("format") == "collapsed":
+        return send_from_directory(PROFILE_DIR, name, mimetype="text/plain", as_attachment=True)
+    return render_template("profile.html", title=" – ".join(profile_header(path)), rows=flame_rows(load_profile(path)),
+                           download=url_for("view_profile", name=name, format="collapsed"))
+
+
+@app.route("/skrwaw/profiles/routes/<route>")
+def view_route_profile(route: str):
+    """Wykres płomieniowy stałego próbkowania jednej ścieżki; ?format=collapsed pobiera stosy."""
+    if not session.get("admin_logged_in"):
+        flash("Zaloguj się do panelu administracyjnego.", "danger")
+        return redirect(url_for("admin_home"))
+    stacks = route_sampler.snapshot().get(route)
+    if stacks is None:
+        abort(404)
+    if request.args.get("format") == "collapsed":
+        return app.response_class(format_collapsed(stacks, prefix=f"{route};"), mimetype="text/plain")
+    return render_template("profile.html", title=f"{route} – próbkowanie stałe, proces {os.getpid()}",
+                           rows=flame_rows(stacks),
+                           download=url_for("view_route_profile", route=route, format="collapsed"))
+
+
 # Ważne linki – prosta podstrona z odnośnikami do zasobów zewnętrznych lub partnerów
 @app.route("/links")
 def links():
@@ -791,7 +1906,7 @@ def admin_publications():
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     # Upewnij się, że katalog upload istnieje
-    app.config["UPLOAD_FOLDER"].mkdir(parents=True, exist_ok=True)
+    current_tenant().upload_folder.mkdir(parents=True, exist_ok=True)
     if request.method == "POST":
         title = request.form.get("title")
         description = request.form.get("description")
@@ -800,51 +1915,27 @@ def admin_publications():
         if not title or not description or not date_str:
             flash("Uzupełnij wszystkie pola.", "warning")
         else:
+            # Zapisz wiele obrazów, jeśli zostały przesłane
+            media = save_media(uploaded_files, "pub")
+            if media is None:
+                flash("Jeden z plików ma niedozwolone rozszerzenie lub zbyt dużą rozdzielczość.", "warning")
+                return redirect(url_for("admin_publications"))
             # Wstaw nową publikację
             conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO publications (title, description, date) VALUES (?, ?, ?)",
-                (title.strip(), description.strip(), date_str.strip()),
-            )
-            publication_id = cur.lastrowid
-            # Zapisz wiele obrazów, jeśli zostały przesłane
-            for uploaded_file in uploaded_files:
-                if uploaded_file and uploaded_file.filename:
-                    filename = secure_filename(uploaded_file.filename)
-                    if allowed_file(filename):
-                        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                        name_part, ext = filename.rsplit('.', 1)
-                        unique_filename = f"pub_{publication_id}_{timestamp}.{ext.lower()}"
-                        save_path = app.config["UPLOAD_FOLDER"] / unique_filename
-                        uploaded_file.save(save_path)
-                        image_rel_path = f"uploads/{unique_filename}"
-                        cur.execute(
-                            "INSERT INTO publication_images (publication_id, filename) VALUES (?, ?)",
-                            (publication_id, image_rel_path),
-                        )
-                    else:
-                        flash("Jeden z plików ma niedozwolone rozszerzenie.", "warning")
-                        conn.rollback()
-                        conn.close()
-                        return redirect(url_for("admin_publications"))
-            conn.commit()
+            with media_transaction(conn, media) as cur:
+                cur.execute(
+                    "INSERT INTO publications (title, description, content_html, excerpt, word_count, date) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (title.strip(), description.strip(), *render_markup(description), date_str.strip()),
+                )
+                publication_id = cur.lastrowid
+                for item in media:
+                    insert_media(cur, "publications", publication_id, item)
             conn.close()
             flash("Publikacja dodana pomyślnie!", "success")
             return redirect(url_for("admin_publications"))
     # Przy GET wyświetl listę publikacji wraz z liczbą zdjęć
-    conn = get_db_connection()
-    publications_list = conn.execute(
-        """
-        SELECT p.id, p.title, p.description, p.date, COUNT(pi.id) AS images_count
-        FROM publications p
-        LEFT JOIN publication_images pi ON pi.publication_id = p.id
-        GROUP BY p.id
-        ORDER BY p.date DESC, p.id DESC
-        """
-    ).fetchall()
-    conn.close()
-    return render_template("admin_publications.html", publications=publications_list)
+    return render_admin_list("admin_publications.html", "publications")
 
 
 @app.route("/skrwaw/publications/edit/<int:publication_id>", methods=["GET", "POST"])
@@ -864,9 +1955,7 @@ def edit_publication(publication_id: int):
         flash("Nie znaleziono podanej publikacji.", "danger")
         return redirect(url_for("admin_publications"))
     # Pobierz powiązane obrazy
-    images = cur.execute(
-        "SELECT id, filename FROM publication_images WHERE publication_id = ? ORDER BY id", (publication_id,)
-    ).fetchall()
+    images = get_media(conn, "publications", publication_id)
     if request.method == "POST":
         title = request.form.get("title")
         description = request.form.get("description")
@@ -875,33 +1964,29 @@ def edit_publication(publication_id: int):
         if not title or not description or not date_str:
             flash("Uzupełnij wszystkie pola.", "warning")
         else:
-            # Aktualizuj rekord
-            cur.execute(
-                "UPDATE publications SET title = ?, description = ?, date = ? WHERE id = ?",
-                (title.strip(), description.strip(), date_str.strip(), publication_id),
-            )
             # Dodaj nowe pliki, jeśli są przesłane
-            for uploaded_file in uploaded_files:
-                if uploaded_file and uploaded_file.filename:
-                    filename = secure_filename(uploaded_file.filename)
-                    if allowed_file(filename):
-                        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                        name_part, ext = filename.rsplit('.', 1)
-                        unique_filename = f"pub_{publication_id}_{timestamp}.{ext.lower()}"
-                        save_path = app.config["UPLOAD_FOLDER"] / unique_filename
-                        uploaded_file.save(save_path)
-                        image_rel_path = f"uploads/{unique_filename}"
-                        cur.execute(
-                            "INSERT INTO publication_images (publication_id, filename) VALUES (?, ?)",
-                            (publication_id, image_rel_path),
-                        )
-                    else:
-                        flash("Jeden z plików ma niedozwolone rozszerzenie.", "warning")
-                        conn.rollback()
-                        conn.close()
-                        return redirect(url_for("edit_publication", publication_id=publication_id))
-            conn.commit()
+            media = save_media(uploaded_files, f"pub_{publication_id}")
+            if media is None:
+                flash("Jeden z plików ma niedozwolone rozszerzenie lub zbyt dużą rozdzielczość.", "warning")
+                conn.close()
+                return redirect(url_for("edit_publication", publication_id=publication_id))
+            with media_transaction(conn, media) as cur:
+                # Aktualizuj rekord
+                cur.execute(
+                    "UPDATE publications SET title = ?, description = ?, content_html = ?, excerpt = ?, "
+                    "word_count = ?, date = ? WHERE id = ?",
+                    (title.strip(), description.strip(), *render_markup(description), date_str.strip(),
+                     publication_id),
+                )
+                # Publikacja mogła zostać usunięta w trakcie edycji
+                found = cur.rowcount > 0
+                for item in media if found else ():
+                    insert_media(cur, "publications", publication_id, item)
             conn.close()
+            if not found:
+                discard_media(media)
+                flash("Nie znaleziono podanej publikacji.", "danger")
+                return redirect(url_for("admin_publications"))
             flash("Publikacja zaktualizowana pomyślnie!", "success")
             return redirect(url_for("admin_publications"))
     conn.close()
@@ -915,22 +2000,12 @@ def delete_publication(publication_id: int):
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     conn = get_db_connection()
-    # Pobierz obrazy, aby usunąć pliki z dysku
-    images = conn.execute(
-        "SELECT filename FROM publication_images WHERE publication_id = ?",
-        (publication_id,)
-    ).fetchall()
-    for row in images:
-        if row["filename"]:
-            image_path = BASE_DIR / "static" / row["filename"]
-            try:
-                image_path.unlink()
-            except FileNotFoundError:
-                pass
-    # Usuń rekord z bazy (powiązane obrazy usuwane są przez ON DELETE CASCADE)
-    conn.execute("DELETE FROM publications WHERE id = ?", (publication_id,))
-    conn.commit()
+    # Usuń rekord z bazy wraz z wierszami media, a po nim pliki z dysku
+    deleted = delete_owner(conn, "publications", publication_id)
     conn.close()
+    if not deleted:
+        flash("Nie znaleziono podanej publikacji.", "danger")
+        return redirect(url_for("admin_publications"))
     flash("Publikacja została usunięta.", "success")
     return redirect(url_for("admin_publications"))
 
@@ -942,27 +2017,13 @@ def delete_publication_image(image_id: int):
         flash("Zaloguj się do panelu administracyjnego.", "danger")
         return redirect(url_for("admin_home"))
     conn = get_db_connection()
-    # Pobierz obraz
-    row = conn.execute(
-        "SELECT publication_id, filename FROM publication_images WHERE id = ?",
-        (image_id,)
-    ).fetchone()
+    # Usuń rekord z bazy, a po nim plik
+    row = delete_media(conn, "publications", image_id)
+    conn.close()
     if not row:
-        conn.close()
         flash("Nie znaleziono zdjęcia.", "danger")
         return redirect(url_for("admin_publications"))
-    # Usuń plik
-    if row["filename"]:
-        image_path = BASE_DIR / "static" / row["filename"]
-        try:
-            image_path.unlink()
-        except FileNotFoundError:
-            pass
-    # Usuń rekord z bazy
-    conn.execute("DELETE FROM publication_images WHERE id = ?", (image_id,))
-    conn.commit()
-    publication_id = row["publication_id"]
-    conn.close()
+    publication_id = row["owner_id"]
     flash("Zdjęcie zostało usunięte.", "success")
     return redirect(url_for("edit_publication", publication_id=publication_id))
 
@@ -1005,5 +2066,29 @@ def admin_home():
     return render_template("admin_home.html", logged_in=logged_in)
 
 
+def warm_up() -> dict:
+    """Przygotowuje proces do obsługi żądań: kompiluje szablony, mapę adresów i buduje migawkę treści.
+
+    Bez tego koszty te ponosi pierwsze żądanie każdego procesu. Przy
+    wczytaniu aplikacji przed fork() (gunicorn.conf.py) procesy robocze
+    dziedziczą gotowe obiekty. Nie wykonuje żądań, więc nie uruchamia wątków
+    tła (konserwacja, poczta, próbkowanie) w procesie nadrzędnym. Zwraca
+    czasy etapów w sekundach: {"templates": ..., "routing": ..., "database": ...}.
+    """
+    timings = {}
+    started = time.perf_counter()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    timings["templates"] = time.perf_counter() - started
+    started = time.perf_counter()
+    app.url_map.update()
+    timings["routing"] = time.perf_counter() - started
+    started = time.perf_counter()
+    if APP_MODE == "public" or DATABASE.exists():
+        default_tenant.snapshots.get()
+    timings["database"] = time.perf_counter() - started
+    return timings
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
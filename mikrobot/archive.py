@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Eksport i import pełnej treści serwisu w jednym archiwum (migracje, klonowanie, dane startowe).
+
+Archiwum to strumień tar (opcjonalnie gzip) zawierający kolejno:
+
+- manifest.json – wersja formatu i schematu bazy, identyfikator archiwum,
+  kolumny eksportowanych tabel,
+- records/<tabela>/<nr>.ndjson – wiersze tabel treści (VERSIONED_TABLES),
+  po CHUNK_ROWS wierszy w pliku, jeden obiekt JSON na linię,
+- files/<klucz> – przesłane pliki (static/uploads lub magazyn S3)
+  wskazywane przez tabelę media,
+- summary.json – liczby wierszy i plików; jego obecność oznacza pełne archiwum.
+
+Eksport i import przetwarzają archiwum strumieniowo, więc zużycie pamięci
+nie zależy od liczby wpisów i zdjęć. Eksport odczytuje bazę w jednej
+transakcji (spójna migawka, w trybie WAL bez blokowania panelu).
+
+Import nanosi każdy plik NDJSON w jednej transakcji (executemany z
+INSERT … ON CONFLICT(id) DO UPDATE), a przesłane pliki zapisuje atomowo
+(plik .part), pomijając te, które już istnieją w magazynie z tym samym
+rozmiarem. Pliki zapisywane są w tle przez kilka wątków (lokalnie i do
+magazynu S3), podczas gdy import czyta kolejne części archiwum. Postęp
+zapisywany jest w pliku obok bazy, więc przerwany import wystarczy
+uruchomić ponownie – naniesione części są pomijane.
+
+Identyfikatory wierszy są przenoszone bez zmian, więc import do bazy, która
+ma już treść, nadpisałby wpisy (i ich zdjęcia) o tych samych numerach. Taki
+import jest odrzucany – treść trzeba zastąpić opcją --replace.
+
+Przykłady:
+
+    python archive.py export mikrobot.tar.gz
+    python archive.py import mikrobot.tar.gz --replace
+    python archive.py export - | ssh nowy-serwer 'cd mikrobot && python archive.py import -'
+"""
+
+import argparse
+import io
+import json
+import os
+import sqlite3
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from init_db import DB_PATH, STATIC_DIR, VERSIONED_TABLES, init_db, migrate_db
+from storage import storage_from_env
+
+FORMAT = "mikrobot-archive"
+FORMAT_VERSION = 1
+# Liczba wierszy w jednym pliku NDJSON (i w jednej transakcji importu)
+CHUNK_ROWS = 1000
+# Równoległe odczyty i zapisy plików w magazynie oraz limit plików „w locie”
+FILE_WORKERS = 8
+MAX_PENDING_FILES = 2 * FILE_WORKERS
+COPY_BUFFER = 1024 * 1024
+# Pliki do tej wielkości czekają na zapis do magazynu lokalnego w pamięci,
+# większe zapisywane są od razu (limit pamięci: MAX_PENDING_FILES plików)
+LOCAL_BUFFER_LIMIT = 8 * 1024 * 1024
+
+
+def log(message: str):
+    # Postęp na stderr – stdout może być strumieniem archiwum
+    print(message, file=sys.stderr, flush=True)
+
+
+def _add_bytes(tar, name: str, data: bytes, mtime=None):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(mtime or time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _tar_mode(path: str, writing: bool) -> str:
+    if not writing:
+        return "r|*"
+    return "w|gz" if path.endswith((".gz", ".tgz")) else "w|"
+
+
+def _open_archive(path: str, writing: bool):
+    mode = _tar_mode(path, writing)
+    if path == "-":
+        stream = sys.stdout.buffer if writing else sys.stdin.buffer
+        return tarfile.open(fileobj=stream, mode=mode)
+    return tarfile.open(path, mode=mode)
+
+
+def upload_keys(conn):
+    """Klucze przesłanych plików wskazywanych przez tabelę media (bez plików statycznych serwisu)."""
+    for (key,) in conn.execute(
+        """
+        SELECT filename FROM media WHERE filename LIKE 'uploads/%'
+        UNION SELECT thumb FROM media WHERE thumb LIKE 'uploads/%'
+        ORDER BY 1
+        """
+    ):
+        yield key
+
+
+def _remote_blobs(storage, keys):
+    """Pobiera pliki z magazynu zdalnego równolegle, zachowując kolejność i limit plików w pamięci."""
+    with ThreadPoolExecutor(max_workers=FILE_WORKERS) as pool:
+        pending = deque()
+        for key in keys:
+            pending.append((key, pool.submit(storage.get, key)))
+            if len(pending) >= MAX_PENDING_FILES:
+                key, future = pending.popleft()
+                yield key, future.result()
+        while pending:
+            key, future = pending.popleft()
+            yield key, future.result()
+
+
+def export_archive(path: str, database=DB_PATH, storage=None, files: bool = True) -> dict:
+    """Zapisuje tabele treści i przesłane pliki w archiwum `path` ("-" – standardowe wyjście)."""
+    storage = storage or storage_from_env(STATIC_DIR)
+    conn = sqlite3.connect(database, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    summary = {"tables": {}, "files": 0, "bytes": 0}
+    try:
+        # Jedna transakcja odczytu – wiersze i lista plików pochodzą z tej samej migawki
+        conn.execute("BEGIN")
+        manifest = {
+            "format": FORMAT,
+            "version": FORMAT_VERSION,
+            "id": uuid.uuid4().hex,
+            "schema": conn.execute("PRAGMA user_version").fetchone()[0],
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "tables": {
+                table: [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                for table in VERSIONED_TABLES
+            },
+        }
+        with _open_archive(path, writing=True) as tar:
+            _add_bytes(tar, "manifest.json", json.dumps(manifest, indent=2).encode())
+            for table in VERSIONED_TABLES:
+                cursor = conn.execute(f"SELECT * FROM {table} ORDER BY id")
+                count = part = 0
+                while rows := cursor.fetchmany(CHUNK_ROWS):
+                    part += 1
+                    lines = "".join(json.dumps(dict(row), ensure_ascii=False) + "\n" for row in rows)
+                    _add_bytes(tar, f"records/{table}/{part:06d}.ndjson", lines.encode())
+                    count += len(rows)
+                summary["tables"][table] = count
+                log(f"{table}: {count} wierszy")
+            if files:
+                if storage.is_local:
+                    for key in upload_keys(conn):
+                        source = storage.path(key)
+                        if not source.is_file():
+                            log(f"Brak pliku {key}, pominięto")
+                            continue
+                        tar.add(source, arcname=f"files/{key}", recursive=False)
+                        summary["files"] += 1
+                        summary["bytes"] += source.stat().st_size
+                else:
+                    for key, data in _remote_blobs(storage, upload_keys(conn)):
+                        _add_bytes(tar, f"files/{key}", data)
+                        summary["files"] += 1
+                        summary["bytes"] += len(data)
+                log(f"Pliki: {summary['files']} ({summary['bytes'] / 1024 / 1024:.1f} MiB)")
+            _add_bytes(tar, "summary.json", json.dumps(summary, indent=2).encode())
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return summary
+
+
+class ImportState:
+    """Postęp importu archiwum: nazwy naniesionych części zapisywane w pliku obok bazy."""
+
+    def __init__(self, database, archive_id: str):
+        self.path = Path(database).with_name(Path(database).name + ".import")
+        self.done = set()
+        self.resumed = False
+        if self.path.exists():
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+            if lines and lines[0] == archive_id:
+                self.done = set(lines[1:])
+                self.resumed = True
+        if not self.resumed:
+            self.path.write_text(archive_id + "\n", encoding="utf-8")
+
+    def mark(self, name: str):
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(name + "\n")
+        self.done.add(name)
+
+    def finish(self):
+        self.path.unlink(missing_ok=True)
+
+
+def _upsert_sql(table: str, names: list) -> str:
+    return (
+        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+        f"ON CONFLICT(id) DO UPDATE SET {', '.join(f'{name} = excluded.{name}' for name in names if name != 'id')}"
+    )
+
+
+class FileWriter:
+    """Zapisuje pliki z archiwum w magazynie (atomowo) równolegle w tle.
+
+    Strumień tar da się czytać tylko po kolei, więc plik jest najpierw
+    odczytywany (do pamięci albo, dla S3, na dysk tymczasowy), a zapis do
+    magazynu biegnie w puli wątków, gdy import czyta kolejne pliki archiwum.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.written = self.skipped = 0
+        self._pool = ThreadPoolExecutor(max_workers=FILE_WORKERS)
+        self._slots = threading.BoundedSemaphore(MAX_PENDING_FILES)
+        self._futures = deque()
+        self._tmp = tempfile.TemporaryDirectory(prefix="mikrobot-import-") if not storage.is_local else None
+
+    def add(self, key: str, size: int, stream):
+        existing = self.storage.stat(key)
+        if existing is not None and existing["size"] == size:
+            self.skipped += 1
+            return
+        self.written += 1
+        if self.storage.is_local and size > LOCAL_BUFFER_LIMIT:
+            self._write_local(key, stream)
+            return
+        self._slots.acquire()
+        try:
+            if self.storage.is_local:
+                source = io.BytesIO(stream.read())
+            else:
+                source = Path(self._tmp.name) / uuid.uuid4().hex
+                with open(source, "wb") as fh:
+                    _copy(stream, fh)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._futures.append(self._pool.submit(self._write, key, source))
+        while self._futures and self._futures[0].done():
+            self._futures.popleft().result()
+
+    def _write(self, key: str, source):
+        try:
+            if self.storage.is_local:
+                self._write_local(key, source)
+            else:
+                try:
+                    self.storage.put(key, source)
+                finally:
+                    source.unlink(missing_ok=True)
+        finally:
+            self._slots.release()
+
+    def _write_local(self, key: str, stream):
+        target = self.storage.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + ".part")
+        with open(partial, "wb") as fh:
+            _copy(stream, fh)
+        os.replace(partial, target)
+
+    def close(self):
+        """Czeka na zakończenie zapisów; zgłasza pierwszy błąd."""
+        try:
+            while self._futures:
+                self._futures.popleft().result()
+        finally:
+            self._pool.shutdown()
+            if self._tmp:
+                self._tmp.cleanup()
+
+
+def _copy(source, target):
+    while chunk := source.read(COPY_BUFFER):
+        target.write(chunk)
+
+
+def _has_content(conn) -> bool:
+    return any(conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() for table in VERSIONED_TABLES)
+
+
+def import_archive(path: str, database=DB_PATH, storage=None, replace: bool = False, files: bool = True) -> dict:
+    """Nanosi archiwum `path` ("-" – standardowe wejście) na bazę i magazyn plików.
+
+    replace – przed importem usuń bieżącą treść (klon serwisu). Bez niego baza
+    docelowa musi być pusta – identyfikatory z archiwum nadpisałyby jej wpisy.
+    Nieistniejąca baza jest tworzona (init_db) i zawsze zastępowana.
+    """
+    storage = storage or storage_from_env(STATIC_DIR)
+    if not Path(database).exists():
+        init_db(database)
+        replace = True
+    conn = sqlite3.connect(database, timeout=30)
+    migrate_db(conn)
+    schema = conn.execute("PRAGMA user_version").fetchone()[0]
+    columns = {
+        table: {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for table in VERSIONED_TABLES
+    }
+    writer = FileWriter(storage) if files else None
+    summary = {"tables": {}, "files": 0, "complete": False}
+    state = None
+    try:
+        with _open_archive(path, writing=False) as tar:
+            for member in tar:
+                name = member.name
+                if name == "manifest.json":
+                    manifest = json.load(tar.extractfile(member))
+                    if manifest.get("format") != FORMAT or manifest.get("version") != FORMAT_VERSION:
+                        raise RuntimeError(f"Nieobsługiwany format archiwum: {manifest.get('format')} {manifest.get('version')}")
+                    if manifest["schema"] > schema:
+                        raise RuntimeError(
+                            f"Archiwum ze schematu {manifest['schema']}, baza ma schemat {schema}. "
+                            "Zaktualizuj aplikację przed importem."
+                        )
+                    state = ImportState(database, manifest["id"])
+                    if state.resumed:
+                        log(f"Wznawianie importu (naniesione części: {len(state.done)})")
+                    elif replace:
+                        # Usunięcie właścicieli usuwa też ich zdjęcia (wyzwalacze)
+                        with conn:
+                            for table in reversed(VERSIONED_TABLES):
+                                conn.execute(f"DELETE FROM {table}")
+                    elif _has_content(conn):
+                        state.finish()
+                        raise RuntimeError(
+                            f"Baza {database} zawiera już treść – import nadpisałby wpisy o tych samych "
+                            "numerach. Użyj --replace, aby zastąpić treść archiwum."
+                        )
+                    continue
+                if state is None:
+                    raise RuntimeError("Archiwum nie zaczyna się od manifest.json")
+                if name.startswith("records/") and member.isfile():
+                    table = name.split("/")[1]
+                    if table not in columns:
+                        raise ValueError(f"Nieznana tabela w archiwum: {table}")
+                    rows = [json.loads(line) for line in tar.extractfile(member)]
+                    summary["tables"][table] = summary["tables"].get(table, 0) + len(rows)
+                    if name in state.done or not rows:
+                        continue
+                    names = [column for column in rows[0] if column in columns[table]]
+                    with conn:
+                        conn.executemany(_upsert_sql(table, names), ([row.get(column) for column in names] for row in rows))
+                    state.mark(name)
+                elif name.startswith("files/") and member.isfile():
+                    summary["files"] += 1
+                    if writer:
+                        writer.add(name[len("files/"):], member.size, tar.extractfile(member))
+                elif name == "summary.json":
+                    expected = json.load(tar.extractfile(member))
+                    if expected["tables"] != summary["tables"] or expected["files"] != summary["files"]:
+                        raise RuntimeError(f"Archiwum niekompletne: oczekiwano {expected}, odczytano {summary}")
+                    summary["complete"] = True
+        if writer:
+            writer.close()
+            summary.update(written=writer.written, skipped=writer.skipped)
+            writer = None
+        if not summary["complete"]:
+            raise RuntimeError("Archiwum urwane – brak summary.json. Uruchom import ponownie z pełnym archiwum.")
+        with conn:
+            # Nowa generacja unieważnia strony we wspólnej pamięci podręcznej
+            conn.execute("UPDATE cache_generation SET generation = generation + 1")
+        state.finish()
+    finally:
+        if writer:
+            writer.close()
+        conn.close()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eksport i import treści serwisu MIKROBOT.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="zapisz treść i przesłane pliki w archiwum")
+    export_cmd.add_argument("archive", help="plik archiwum (.tar, .tar.gz) albo - dla standardowego wyjścia")
+    export_cmd.add_argument("--no-files", action="store_true", help="tylko wiersze bazy, bez przesłanych plików")
+    import_cmd = commands.add_parser("import", help="nanieś archiwum na bazę i magazyn plików")
+    import_cmd.add_argument("archive", help="plik archiwum albo - dla standardowego wejścia")
+    import_cmd.add_argument("--replace", action="store_true", help="usuń bieżącą treść przed importem (wymagane, gdy baza ma już treść)")
+    import_cmd.add_argument("--no-files", action="store_true", help="pomiń przesłane pliki")
+    args = parser.parse_args()
+    started = time.monotonic()
+    if args.command == "export":
+        result = export_archive(args.archive, files=not args.no_files)
+    else:
+        result = import_archive(args.archive, replace=args.replace, files=not args.no_files)
+    log(f"{json.dumps(result, ensure_ascii=False)} ({time.monotonic() - started:.1f} s)")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Budżet wagi stron publicznych: bajty, liczba żądań i największe zdjęcie.
+
+Skrypt renderuje przez klienta testowego Flask każdą stronę publiczną (reguły
+bez parametrów obsługujące GET, poza panelem, plikami statycznymi i
+zasobami maszynowymi) i odczytuje wszystkie zasoby, które pobierze
+przeglądarka: arkusze, skrypty, zasoby z <link rel="preload"> i z nagłówków
+Link (preload), ikony, zdjęcia z src i data-images (pokaz slajdów) oraz
+adresy url(...) z atrybutów style, bloków <style> (krytyczny CSS) i samych
+arkuszy (tła, czcionki, @import). Każdy adres liczony jest raz – tak jak
+w pamięci przeglądarki.
+Zasoby z innych hostów (np. magazyn S3 z CDN) liczone są jako żądania
+o nieznanym rozmiarze.
+
+Dla każdej strony wypisywany jest raport: liczba żądań, łączny rozmiar
+i największe zdjęcie. Strona przekraczająca budżet (BUDGETS, dla
+wybranych stron ROUTE_BUDGETS, albo wartości z opcji) kończy skrypt kodem
+wyjścia 1 – uruchamiany przed wdrożeniem zatrzymuje zmianę szablonu lub
+grafiki, która wyraźnie pogarsza wczytywanie stron:
+
+    python budget.py
+    python budget.py --max-bytes 2000000 --json
+"""
+
+import argparse
+import json
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+# Budżet każdej strony: łączny rozmiar (bajty), liczba żądań, największe zdjęcie (bajty)
+BUDGETS = {"bytes": 1_000_000, "requests": 40, "image": 300_000}
+# Budżety wybranych stron (endpoint -> zmienione wartości)
+ROUTE_BUDGETS = {
+    # Galeria pokazuje do GALLERY_PAGE_SIZE miniatur wczytywanych leniwie
+    "gallery": {"requests": 60},
+}
+# Ścieżki pomijane: panel, pliki statyczne i zasoby dla maszyn (API, kanały, metryki)
+SKIPPED_PREFIXES = ("/skrwaw", "/static", "/uploads", "/api/", "/feeds/", "/metrics", "/changes", "/gallery.json")
+# Rodzaje <link>, których zasoby pobiera przeglądarka
+FETCHED_LINKS = {"stylesheet", "preload", "icon", "shortcut", "apple-touch-icon", "modulepreload"}
+# Nazwy limitów w raporcie
+LIMIT_NAMES = {"bytes": "rozmiar", "requests": "żądania", "image": "zdjęcie"}
+STYLE_URL = re.compile(r"url\(\s*['\"]?([^'\")]+)['\"]?\s*\)")
+# Pozycja nagłówka Link: <adres>; parametry
+LINK_HEADER = re.compile(r"<([^>]*)>([^,]*)")
+LINK_PARAM = re.compile(r";\s*([a-z]+)\s*=\s*\"?([^;\"]*)\"?")
+
+
+class AssetCollector(HTMLParser):
+    """Zbiera adresy zasobów pobieranych przez przeglądarkę wraz z informacją, czy są zdjęciami."""
+
+    def __init__(self):
+        super().__init__()
+        self.assets = {}
+        self.in_style = False
+
+    def add(self, url, image: bool = False):
+        url = (url or "").strip()
+        if url and not url.startswith(("data:", "#", "javascript:")):
+            self.assets[url] = self.assets.get(url, False) or image
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "img":
+            self.add(attrs.get("src"), image=True)
+            for url in (attrs.get("data-images") or "").split(","):
+                self.add(url, image=True)
+        elif tag in ("script", "source", "audio", "video", "iframe"):
+            self.add(attrs.get("src"), image=tag == "source")
+        elif tag == "link" and FETCHED_LINKS & set((attrs.get("rel") or "").lower().split()):
+            self.add(attrs.get("href"), image=attrs.get("as") == "image")
+        if tag == "video":
+            self.add(attrs.get("poster"), image=True)
+        for url in STYLE_URL.findall(attrs.get("style") or ""):
+            self.add(url, image=True)
+        self.in_style = tag == "style"
+
+    def handle_endtag(self, tag):
+        if tag == "style":
+            self.in_style = False
+
+    def handle_data(self, data):
+        if self.in_style:
+            for url in STYLE_URL.findall(data):
+                self.add(url)
+
+
+def link_header_assets(values) -> list:
+    """Zasoby z nagłówków Link: rel=preload – lista (adres, czy zdjęcie)."""
+    assets = []
+    for value in values:
+        for url, params in LINK_HEADER.findall(value):
+            params = {name.lower(): param.strip() for name, param in LINK_PARAM.findall(params)}
+            if FETCHED_LINKS & set(params.get("rel", "").lower().split()):
+                assets.append((url.strip(), params.get("as") == "image"))
+    return assets
+
+
+def public_paths(site) -> dict:
+    """Strony publiczne aplikacji: {endpoint: ścieżka}."""
+    paths = {}
+    for rule in site.app.url_map.iter_rules():
+        if rule.arguments or "GET" not in rule.methods or rule.rule.startswith(SKIPPED_PREFIXES):
+            continue
+        paths[rule.endpoint] = rule.rule
+    return dict(sorted(paths.items(), key=lambda item: item[1]))
+
+
+def measure_page(client, path: str):
+    """Zwraca pomiar strony albo None, jeśli nie jest to strona HTML (przekierowanie, błąd)."""
+    response = client.get(path)
+    if response.status_code != 200 or response.mimetype != "text/html":
+        return None
+    html = response.get_data()
+    collector = AssetCollector()
+    collector.feed(html.decode("utf-8", "replace"))
+    for url, image in link_header_assets(response.headers.getlist("Link")):
+        collector.add(url, image)
+    page = {"requests": 1, "bytes": len(html), "image": 0, "largest": None, "external": [], "missing": []}
+    base = f"http://localhost{path}"
+    # Kolejka zasobów: arkusze dopisują do niej adresy ze swoich url(...)
+    queue = [(urljoin(base, url), image) for url, image in collector.assets.items()]
+    seen = {url for url, _ in queue}
+    while queue:
+        url, image = queue.pop(0)
+        page["requests"] += 1
+        parts = urlsplit(url)
+        if parts.netloc != "localhost":
+            page["external"].append(url)
+            continue
+        asset = client.get(parts.path + (f"?{parts.query}" if parts.query else ""))
+        if asset.status_code != 200:
+            page["missing"].append(parts.path)
+            asset.close()
+            continue
+        body = asset.get_data()
+        asset.close()
+        size = len(body)
+        page["bytes"] += size
+        if (image or asset.mimetype.startswith("image/")) and size > page["image"]:
+            page["image"], page["largest"] = size, parts.path
+        if asset.mimetype == "text/css":
+            for nested in STYLE_URL.findall(body.decode("utf-8", "replace")):
+                nested = urljoin(url, nested.strip())
+                if not nested.startswith("data:") and nested not in seen:
+                    seen.add(nested)
+                    queue.append((nested, False))
+    return page
+
+
+def over_budget(page: dict, budget: dict) -> list:
+    """Nazwy przekroczonych limitów strony."""
+    return [name for name in ("bytes", "requests", "image") if page[name] > budget[name]]
+
+
+def kb(size: int) -> str:
+    return f"{size / 1000:.0f} kB"
+
+
+def limit(name: str, value: int) -> str:
+    return str(value) if name == "requests" else kb(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Budżet wagi stron publicznych MIKROBOT.")
+    parser.add_argument("--max-bytes", type=int, help=f"łączny rozmiar strony (domyślnie {BUDGETS['bytes']})")
+    parser.add_argument("--max-requests", type=int, help=f"liczba żądań (domyślnie {BUDGETS['requests']})")
+    parser.add_argument("--max-image", type=int, help=f"największe zdjęcie (domyślnie {BUDGETS['image']})")
+    parser.add_argument("--json", action="store_true", help="wypisz raport jako JSON")
+    args = parser.parse_args()
+    overrides = {
+        name: value
+        for name, value in (("bytes", args.max_bytes), ("requests", args.max_requests), ("image", args.max_image))
+        if value is not None
+    }
+
+    # Import aplikacji dopiero tutaj – tak jak w critical_css.py
+    import app as site
+
+    site.app.config["SHARED_PAGE_CACHE"] = False
+    client = site.app.test_client()
+    report = {}
+    for endpoint, path in public_paths(site).items():
+        page = measure_page(client, path)
+        if page is None:
+            continue
+        budget = BUDGETS | ROUTE_BUDGETS.get(endpoint, {}) | overrides
+        page["budget"] = budget
+        page["over"] = over_budget(page, budget)
+        report[path] = page
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'strona':<16}{'żądań':>7}{'rozmiar':>11}{'zdjęcie':>10}  wynik")
+        for path, page in report.items():
+            verdict = "OK" if not page["over"] else "PRZEKROCZONO: " + ", ".join(
+                f"{LIMIT_NAMES[name]} {limit(name, page[name])} > {limit(name, page['budget'][name])}"
+                for name in page["over"]
+            )
+            print(f"{path:<16}{page['requests']:>7}{kb(page['bytes']):>11}{kb(page['image']):>10}  {verdict}")
+            if page["over"] and page["largest"]:
+                print(f"{'':<16}największe zdjęcie: {page['largest']}")
+            if page["missing"]:
+                print(f"{'':<16}brak zasobów: {', '.join(page['missing'])}")
+            if page["external"]:
+                print(f"{'':<16}zewnętrzne (rozmiar nieznany): {len(page['external'])}")
+    failed = [path for path, page in report.items() if page["over"] or page["missing"]]
+    if failed and not args.json:
+        print(f"Budżet przekroczony na {len(failed)} z {len(report)} stron.")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
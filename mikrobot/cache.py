@@ -0,0 +1,43 @@
+"""
+Pamięć podręczna odpowiedzi generowanych z bazy danych.
+
+Każda tabela treści ma licznik wersji w tabeli table_versions, zwiększany
+przez wyzwalacze przy każdej zmianie. Odpowiedzi zapisujemy pod kluczem
+zawierającym wersję tabeli, więc po zmianie danych stare wpisy po prostu
+przestają być trafiane i z czasem wypadają z ograniczonego bufora LRU.
+Wersje odczytywane są z migawki treści (zob. snapshot.py).
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Ograniczony, bezpieczny wątkowo słownik usuwający najdawniej używane wpisy."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
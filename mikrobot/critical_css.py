@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Wyodrębnia krytyczny CSS („above the fold”) dla stron publicznych.
+
+Skrypt renderuje każdą stronę publiczną przez klienta testowego Flask,
+zbiera znaczniki, klasy, identyfikatory i atrybuty pierwszych FOLD_TAGS
+elementów <body> (pasek nawigacji, nagłówek i pierwsze karty) i wybiera
+z main.css reguły, których selektory mogą pasować do tych elementów.
+Wynik zapisywany jest w static/css/critical/<endpoint>.css; layout.html
+osadza go w <style>, a pełny arkusz wczytuje asynchronicznie.
+
+Skrypt należy uruchomić po każdej zmianie main.css lub szablonów
+(np. w kroku wdrożenia), na bazie z reprezentatywną treścią:
+
+    python critical_css.py
+"""
+
+import hashlib
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+STYLESHEET = STATIC_DIR / "css" / "main.css"
+CRITICAL_DIR = STATIC_DIR / "css" / "critical"
+# Liczba pierwszych elementów <body> traktowanych jako widoczne bez przewijania
+FOLD_TAGS = 150
+# Strony publiczne, dla których budowany jest krytyczny CSS
+PUBLIC_ENDPOINTS = (
+    "index", "about", "members", "all_news", "achievements", "gallery", "statute", "contact", "links",
+)
+# Selektory zawsze pasujące (elementy dokumentu, które nie muszą pojawić się w zebranych znacznikach)
+ALWAYS = {"*", "html", "body"}
+
+
+class FoldCollector(HTMLParser):
+    """Zbiera nazwy znaczników, klasy, identyfikatory i atrybuty pierwszych elementów <body>."""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.count = 0
+        self.in_body = False
+        self.tags, self.classes, self.ids, self.attrs = set(ALWAYS), set(), set(), set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self.in_body = True
+            return
+        if not self.in_body or self.count >= self.limit:
+            return
+        self.count += 1
+        self.tags.add(tag)
+        for name, value in attrs:
+            self.attrs.add(name)
+            if name == "class" and value:
+                self.classes.update(value.split())
+            elif name == "id" and value:
+                self.ids.add(value)
+
+
+def split_rules(css: str):
+    """Dzieli arkusz na reguły: krotki (selektory, deklaracje) lub (warunek @media, lista reguł)."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    rules, pos = [], 0
+    while True:
+        start = css.find("{", pos)
+        if start < 0:
+            return rules
+        prelude = css[pos:start].strip()
+        if prelude.startswith("@"):
+            depth, end = 1, start + 1
+            while depth:
+                depth += {"{": 1, "}": -1}.get(css[end], 0)
+                end += 1
+            rules.append((prelude, split_rules(css[start + 1:end - 1])))
+        else:
+            end = css.index("}", start) + 1
+            rules.append((prelude, css[start + 1:end - 1].strip()))
+        pos = end
+
+
+def selector_matches(selector: str, fold: FoldCollector) -> bool:
+    """Czy selektor może pasować do zebranych elementów (każda jego część musi w nich występować)."""
+    # Pseudoklasy i pseudoelementy (:hover, ::before, :not(...)) nie zawężają wyboru
+    selector = re.sub(r"::?[\w-]+(\([^)]*\))?", "", selector)
+    for attr in re.findall(r"\[\s*([\w-]+)", selector):
+        if attr not in fold.attrs:
+            return False
+    selector = re.sub(r"\[[^\]]*\]", "", selector)
+    for compound in re.split(r"\s*[\s>+~]\s*", selector.strip()):
+        if not compound:
+            continue
+        tag = re.match(r"^[a-zA-Z][\w-]*|^\*", compound)
+        if tag and tag.group(0).lower() not in fold.tags:
+            return False
+        if any(name not in fold.classes for name in re.findall(r"\.([\w-]+)", compound)):
+            return False
+        if any(name not in fold.ids for name in re.findall(r"#([\w-]+)", compound)):
+            return False
+    return True
+
+
+def minify(declarations: str) -> str:
+    return re.sub(r"\s*([:;,])\s*", r"\1", re.sub(r"\s+", " ", declarations)).strip().rstrip(";")
+
+
+def critical_rules(rules, fold: FoldCollector) -> str:
+    out = []
+    for prelude, body in rules:
+        if isinstance(body, list):
+            inner = critical_rules(body, fold)
+            if inner:
+                condition = re.sub(r"\s+", " ", prelude)
+                out.append(f"{condition}{{{inner}}}")
+            continue
+        selectors = [s.strip() for s in prelude.split(",") if selector_matches(s, fold)]
+        if selectors:
+            out.append(f"{','.join(selectors)}{{{minify(body)}}}")
+    return "".join(out)
+
+
+def extract(html: str, css: str, fold_tags: int = FOLD_TAGS) -> str:
+    """Zwraca krytyczny CSS strony `html` wybrany z arkusza `css`."""
+    fold = FoldCollector(fold_tags)
+    fold.feed(html)
+    return critical_rules(split_rules(css), fold)
+
+
+def load_critical_css(directory=CRITICAL_DIR) -> dict:
+    """Wczytuje zbudowane pliki: {endpoint: CSS}. Brak katalogu oznacza pusty słownik."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return {}
+    return {path.stem: path.read_text(encoding="utf-8") for path in sorted(directory.glob("*.css"))}
+
+
+def assets_version(critical: dict) -> str:
+    """Skrót arkusza i krytycznego CSS – zmienia się po każdej przebudowie."""
+    digest = hashlib.sha1(STYLESHEET.read_bytes())
+    for endpoint, css in sorted(critical.items()):
+        digest.update(endpoint.encode() + css.encode())
+    return digest.hexdigest()[:12]
+
+
+def build():
+    # Import aplikacji dopiero tutaj – app.py importuje z tego modułu funkcje wczytujące
+    import app as site
+
+    css = STYLESHEET.read_text(encoding="utf-8")
+    CRITICAL_DIR.mkdir(parents=True, exist_ok=True)
+    client = site.app.test_client()
+    site.app.config["SHARED_PAGE_CACHE"] = False
+    with site.app.test_request_context():
+        paths = {endpoint: site.url_for(endpoint) for endpoint in PUBLIC_ENDPOINTS}
+    for endpoint, path in paths.items():
+        response = client.get(path)
+        if response.status_code != 200:
+            print(f"{path}: HTTP {response.status_code}, pominięto")
+            continue
+        critical = extract(response.get_data(as_text=True), css)
+        (CRITICAL_DIR / f"{endpoint}.css").write_text(critical, encoding="utf-8")
+        print(f"{path}: {len(critical)} B krytycznego CSS (arkusz {len(css)} B)")
+
+
+if __name__ == "__main__":
+    build()
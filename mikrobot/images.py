@@ -0,0 +1,154 @@
+"""
+Pomocnicze funkcje do obsługi przesłanych zdjęć.
+
+Wymiary obrazu odczytujemy bezpośrednio z nagłówka pliku (PNG, GIF, JPEG),
+dzięki czemu nie potrzebujemy dodatkowych bibliotek graficznych; obrót
+zapisany w EXIF uwzględniamy, gdy Pillow jest dostępny. Miniatury,
+kolor dominujący i obraz zastępczy tworzone są przez Pillow – bez tej
+biblioteki strony używają oryginałów i nie mają tła zastępczego.
+"""
+
+import base64
+import io
+import struct
+from pathlib import Path
+
+# Katalog miniatur (względem static) i ich maksymalny rozmiar w pikselach
+THUMB_DIR = "uploads/thumbs"
+THUMB_SIZE = (480, 480)
+# Maksymalny bok rozmytego obrazu zastępczego osadzanego w stronie (ok. 0,5 KB)
+PLACEHOLDER_SIZE = 12
+# Największa rozdzielczość przyjmowanego zdjęcia (ok. 67 Mpx); większe pliki
+# to zwykle „bomby dekompresji” – kilka KB, które rozpakowują się do gigabajtów
+MAX_PIXELS = 64 * 1024 * 1024
+
+
+# Wartości znacznika EXIF Orientation oznaczające obrót o 90° lub 270°
+SWAPPED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def probe_image(path: Path):
+    """Zwraca krotkę (szerokość, wysokość) zdjęcia w postaci wyświetlanej lub (None, None).
+
+    Wymiary pochodzą z nagłówka pliku; gdy EXIF zapisuje obrót o 90° lub 270°,
+    szerokość i wysokość są zamieniane, tak jak obraca je przeglądarka.
+    """
+    width, height = _probe_header(path)
+    if width and _exif_orientation(path) in SWAPPED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+
+def too_large(width, height) -> bool:
+    """Czy zdjęcie o podanych wymiarach przekracza MAX_PIXELS (nieznane wymiary – nie)."""
+    return bool(width and height) and width * height > MAX_PIXELS
+
+
+def _probe_header(path: Path):
+    """Zwraca krotkę (szerokość, wysokość) odczytaną z nagłówka pliku lub (None, None)."""
+    try:
+        with open(path, "rb") as fh:
+            head = fh.read(26)
+            # PNG: wymiary zapisane są w bloku IHDR tuż za sygnaturą
+            if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+                return struct.unpack(">II", head[16:24])
+            # GIF: szerokość i wysokość jako liczby 16-bitowe little-endian
+            if head[:6] in (b"GIF87a", b"GIF89a"):
+                return struct.unpack("<HH", head[6:10])
+            # JPEG: szukamy znacznika SOFn, który zawiera wymiary klatki
+            if head[:2] == b"\xff\xd8":
+                fh.seek(2)
+                return _probe_jpeg(fh)
+    except (OSError, struct.error):
+        pass
+    return None, None
+
+
+def _probe_jpeg(fh):
+    """Przegląda kolejne segmenty JPEG aż do znacznika SOFn."""
+    while True:
+        marker = fh.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None, None
+        code = marker[1]
+        # Znaczniki bez długości (RSTn, TEM) oraz wypełnienie 0xFF
+        if code == 0xFF:
+            fh.seek(-1, 1)
+            continue
+        if 0xD0 <= code <= 0xD7 or code == 0x01:
+            continue
+        (length,) = struct.unpack(">H", fh.read(2))
+        if code in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            height, width = struct.unpack(">xHH", fh.read(5))
+            return width, height
+        fh.seek(length - 2, 1)
+
+
+def _exif_orientation(path: Path) -> int:
+    """Zwraca wartość znacznika EXIF Orientation (0x0112); 1 bez Pillow lub bez EXIF."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return 1
+    try:
+        # Image.open czyta tylko nagłówek – dane obrazu nie są dekodowane
+        with Image.open(path) as img:
+            return img.getexif().get(0x0112, 1)
+    except (OSError, Image.DecompressionBombError):
+        return 1
+
+
+def make_thumbnail(static_dir: Path, rel_path: str):
+    """Tworzy pomniejszoną kopię zdjęcia w katalogu miniatur.
+
+    Zwraca ścieżkę miniatury względem katalogu static lub None, jeśli Pillow
+    nie jest zainstalowany albo pliku nie da się odczytać.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+    source = static_dir / rel_path
+    thumb_rel = f"{THUMB_DIR}/{source.name}"
+    target = static_dir / thumb_rel
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with Image.open(source) as img:
+            # Zdjęcia z aparatów są często zapisane bokiem, z obrotem tylko w EXIF
+            upright = ImageOps.exif_transpose(img)
+            upright.thumbnail(THUMB_SIZE)
+            upright.save(target)
+    except (OSError, Image.DecompressionBombError):
+        return None
+    return thumb_rel
+
+
+def image_placeholder(path: Path):
+    """Zwraca krotkę (kolor dominujący "#rrggbb", obraz zastępczy jako adres data:).
+
+    Obraz zastępczy to kilkunastopikselowa, rozmyta wersja zdjęcia w JPEG;
+    przeglądarka rozciąga ją do rozmiaru zdjęcia, zanim to się wczyta. Bez
+    Pillow albo dla nieczytelnego pliku zwraca (None, None).
+    """
+    try:
+        from PIL import Image, ImageFilter, ImageOps
+    except ImportError:
+        return None, None
+    try:
+        with Image.open(path) as img:
+            # Dla JPEG dekoder od razu zmniejsza obraz – nie czytamy pełnej rozdzielczości
+            img.draft("RGB", (128, 128))
+            small = ImageOps.exif_transpose(img).convert("RGB")
+    except (OSError, Image.DecompressionBombError):
+        return None, None
+    small.thumbnail((64, 64))
+    # Kolor dominujący: najliczniejszy kolor palety zredukowanej do czterech barw
+    palette = small.quantize(colors=4)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    tiny = small.filter(ImageFilter.GaussianBlur(1))
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    tiny.save(buffer, "JPEG", quality=60, optimize=True)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return f"#{red:02x}{green:02x}{blue:02x}", f"data:image/jpeg;base64,{data}"
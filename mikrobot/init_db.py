@@ -6,16 +6,738 @@ Uruchom ten skrypt przed pierwszym startem aplikacji, aby utworzyć plik
 `mikrobot.db` wraz z podstawową strukturą tabel oraz przykładowymi danymi.
 """
 
+import argparse
+import fcntl
+import os
 import sqlite3
 from pathlib import Path
 from datetime import datetime
 
+from images import image_placeholder, make_thumbnail, probe_image
+from markup import render_markup
+
 DB_PATH = Path(__file__).resolve().parent / "mikrobot.db"
 
+STATIC_DIR = DB_PATH.parent / "static"
+
+# Tabele zdjęć sprzed migracji 2: tabela nadrzędna -> (tabela zdjęć, kolumna klucza obcego)
+LEGACY_IMAGE_TABLES = {
+    "news": ("news_images", "news_id"),
+    "achievements": ("achievement_images", "achievement_id"),
+    "publications": ("publication_images", "publication_id"),
+}
+
+# Rodzaje właścicieli w tabeli media (nazwy odpowiadają tabelom nadrzędnym).
+# Treści z galerią mają zdenormalizowane kolumny image_count/cover_image/image_list,
+# członkowie – kolumnę photo wskazującą pierwsze zdjęcie.
+GALLERY_OWNERS = ("news", "achievements", "publications")
+MEDIA_OWNERS = GALLERY_OWNERS + ("members",)
+# Kolumna z treścią w lekkim formatowaniu dla każdej tabeli z galerią
+CONTENT_COLUMNS = {"news": "content", "achievements": "description", "publications": "description"}
+# Kolumna z datą wpisu (tekst) dla każdej tabeli z galerią
+DATE_COLUMNS = {"news": "date_posted", "achievements": "date", "publications": "date"}
+# Tabele, których zmiany unieważniają pamięć podręczną (zob. table_versions)
+# i są przesyłane do replik (zob. changelog)
+VERSIONED_TABLES = MEDIA_OWNERS + ("media",)
+# Bieżący czas uniksowy z ułamkiem sekundy (SQLite < 3.42 nie ma unixepoch('subsec'))
+UNIX_NOW_SQL = "((julianday('now') - 2440587.5) * 86400.0)"
+
+
+def _recompute_legacy_images_sql(parent: str) -> str:
+    """Przelicza kolumny zdjęć wszystkich wierszy na podstawie tabel sprzed migracji 2."""
+    images, fk = LEGACY_IMAGE_TABLES[parent]
+    return f"""
+        UPDATE {parent} SET
+            image_count = (SELECT COUNT(*) FROM {images} WHERE {fk} = {parent}.id),
+            cover_image = (SELECT filename FROM {images} WHERE {fk} = {parent}.id ORDER BY id LIMIT 1),
+            image_list = (SELECT GROUP_CONCAT(filename) FROM
+                            (SELECT filename FROM {images} WHERE {fk} = {parent}.id ORDER BY id))
+    """
+
+
+def _recompute_media_sql(owner_type: str, owner_expr: str) -> str:
+    """Zwraca instrukcję UPDATE przeliczającą zdenormalizowane kolumny zdjęć jednego wiersza."""
+    where = f"owner_type = '{owner_type}' AND owner_id = {owner_expr}"
+    if owner_type == "members":
+        return f"""
+        UPDATE members SET
+            photo = COALESCE((SELECT filename FROM media WHERE {where} ORDER BY position, id LIMIT 1), '')
+        WHERE id = {owner_expr}
+        """
+    return f"""
+        UPDATE {owner_type} SET
+            image_count = (SELECT COUNT(*) FROM media WHERE {where}),
+            cover_image = (SELECT filename FROM media WHERE {where} ORDER BY position, id LIMIT 1),
+            image_list = (SELECT GROUP_CONCAT(filename) FROM
+                            (SELECT filename FROM media WHERE {where} ORDER BY position, id))
+        WHERE id = {owner_expr}
+    """
+
+
+def _migration_1_denormalized_images(cur, static_dir):
+    """Dodaje kolumny image_count, cover_image i image_list utrzymywane przez wyzwalacze.
+
+    Listy kart (strona główna, aktualności, osiągnięcia, panel) czytają wtedy
+    jedną tabelę po indeksie daty – bez LEFT JOIN, GROUP BY i GROUP_CONCAT.
+    """
+    for parent, (images, fk) in LEGACY_IMAGE_TABLES.items():
+        cur.execute(f"ALTER TABLE {parent} ADD COLUMN image_count INTEGER NOT NULL DEFAULT 0;")
+        cur.execute(f"ALTER TABLE {parent} ADD COLUMN cover_image TEXT;")
+        cur.execute(f"ALTER TABLE {parent} ADD COLUMN image_list TEXT;")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{images}_owner ON {images} ({fk}, id);")
+        # Wyzwalacze przeliczają liczniki po każdej zmianie w tabeli zdjęć
+        recompute = _recompute_legacy_images_sql(parent)
+        for event, where in (
+            ("INSERT", f"id = NEW.{fk}"),
+            ("DELETE", f"id = OLD.{fk}"),
+            ("UPDATE", f"id IN (OLD.{fk}, NEW.{fk})"),
+        ):
+            cur.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{images}_{event.lower()} AFTER {event} ON {images} BEGIN"
+                f"{recompute} WHERE {where}; END;"
+            )
+
+    # Indeksy zgodne z kolejnością sortowania list, aby uniknąć sortowania w pamięci
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_news_date ON news (date_posted DESC, id DESC);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_achievements_date ON achievements (date DESC, id DESC);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_publications_date ON publications (date DESC, id DESC);")
+
+    # Starsze wpisy mogły mieć miniaturę tylko w kolumnie news.image – przenieś ją do news_images
+    cur.execute(
+        """
+        INSERT INTO news_images (news_id, filename)
+        SELECT n.id, n.image FROM news n
+        WHERE n.image IS NOT NULL AND n.image != ''
+          AND NOT EXISTS (SELECT 1 FROM news_images ni WHERE ni.news_id = n.id AND ni.filename = n.image)
+        """
+    )
+    for parent in LEGACY_IMAGE_TABLES:
+        cur.execute(_recompute_legacy_images_sql(parent))
+
+
+def _migration_2_unified_media(cur, static_dir):
+    """Zastępuje news_images, achievement_images, publication_images oraz kolumny
+    members.photo i news.image jedną tabelą media.
+
+    Każdy plik ma jeden wiersz z rodzajem i identyfikatorem właściciela, pozycją,
+    wymiarami i rozmiarem, więc zdjęcia dowolnej treści (albo wszystkich treści
+    naraz) pobiera pojedyncze zapytanie po indeksie.
+    """
+    cur.execute(
+        """
+        CREATE TABLE media (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_type TEXT NOT NULL,
+            owner_id INTEGER NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            filename TEXT NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            bytes INTEGER,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        """
+    )
+    cur.execute("CREATE INDEX idx_media_owner ON media (owner_type, owner_id, position, id);")
+    # Wyszukiwanie miejsc użycia pliku
+    cur.execute("CREATE INDEX idx_media_filename ON media (filename);")
+
+    # Przenieś istniejące zdjęcia, zachowując ich kolejność w obrębie właściciela
+    for parent, (images, fk) in LEGACY_IMAGE_TABLES.items():
+        cur.execute(
+            f"""
+            INSERT INTO media (owner_type, owner_id, position, filename)
+            SELECT '{parent}', {fk}, ROW_NUMBER() OVER (PARTITION BY {fk} ORDER BY id) - 1, filename
+            FROM {images} ORDER BY id
+            """
+        )
+        cur.execute(f"DROP TABLE {images};")
+    cur.execute(
+        """
+        INSERT INTO media (owner_type, owner_id, position, filename)
+        SELECT 'members', id, 0, photo FROM members WHERE photo != '' ORDER BY id
+        """
+    )
+    # Miniatura news.image została przeniesiona do news_images w migracji 1
+    cur.execute("ALTER TABLE news DROP COLUMN image;")
+
+    for owner_type in MEDIA_OWNERS:
+        where = f"owner_type = '{owner_type}'"
+        cur.execute(
+            f"CREATE TRIGGER trg_media_{owner_type}_insert AFTER INSERT ON media "
+            f"WHEN NEW.{where} BEGIN{_recompute_media_sql(owner_type, 'NEW.owner_id')}; END;"
+        )
+        cur.execute(
+            f"CREATE TRIGGER trg_media_{owner_type}_delete AFTER DELETE ON media "
+            f"WHEN OLD.{where} BEGIN{_recompute_media_sql(owner_type, 'OLD.owner_id')}; END;"
+        )
+        cur.execute(
+            f"CREATE TRIGGER trg_media_{owner_type}_update AFTER UPDATE ON media "
+            f"WHEN OLD.{where} OR NEW.{where} BEGIN"
+            f"{_recompute_media_sql(owner_type, 'OLD.owner_id')};"
+            f"{_recompute_media_sql(owner_type, 'NEW.owner_id')}; END;"
+        )
+        # Odpowiednik ON DELETE CASCADE – media nie mają klucza obcego do wielu tabel
+        cur.execute(
+            f"CREATE TRIGGER trg_{owner_type}_delete_media AFTER DELETE ON {owner_type} BEGIN "
+            f"DELETE FROM media WHERE {where} AND owner_id = OLD.id; END;"
+        )
+    backfill_media_metadata(cur, static_dir)
+    check_image_counters(cur, repair=True)
+
+
+def _migration_3_gallery(cur, static_dir):
+    """Dodaje miniatury zdjęć oraz indeks częściowy dla galerii.
+
+    Indeks obejmuje tylko zdjęcia treści (bez zdjęć członków), więc każda
+    strona galerii to zakres tego indeksu od zadanego id w dół – koszt nie
+    zależy od liczby wszystkich zdjęć. Miniatury istniejących zdjęć tworzy
+    polecenie `python init_db.py --backfill-media`.
+    """
+    cur.execute("ALTER TABLE media ADD COLUMN thumb TEXT;")
+    cur.execute(
+        f"CREATE INDEX idx_media_gallery ON media (id) WHERE owner_type IN {GALLERY_OWNERS!r};"
+    )
+
+
+def _migration_4_table_versions(cur, static_dir):
+    """Dodaje liczniki wersji tabel treści, zwiększane przez wyzwalacze przy każdej zmianie.
+
+    Wersja tabeli jest częścią klucza pamięci podręcznej odpowiedzi (API,
+    kanały), więc po zmianie danych nieaktualne wpisy nie są już używane.
+    """
+    cur.execute(
+        """
+        CREATE TABLE table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+        );
+        """
+    )
+    for table in VERSIONED_TABLES:
+        cur.execute("INSERT INTO table_versions (name) VALUES (?)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(
+                f"""
+                CREATE TRIGGER trg_{table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                    UPDATE table_versions
+                    SET version = version + 1, updated_at = strftime('%Y-%m-%dT%H:%M:%SZ', 'now')
+                    WHERE name = '{table}';
+                END;
+                """
+            )
+
+
+def _migration_5_wal(cur, static_dir):
+    """Przełącza bazę w tryb WAL.
+
+    Strony z długimi listami są wysyłane strumieniowo i trzymają otwarty kursor
+    do końca odpowiedzi. W trybie WAL czytelnicy nie blokują zapisu, więc
+    panel administracyjny może zatwierdzać zmiany w trakcie takiego odczytu.
+    """
+    cur.execute("PRAGMA journal_mode = WAL;")
+
+
+def _migration_6_rendered_content(cur, static_dir):
+    """Dodaje kolumny content_html, excerpt i word_count wyliczane przy zapisie.
+
+    Treść jest formatowana raz, w panelu administracyjnym (markup.py), więc
+    strony publiczne nie przetwarzają tekstu przy każdym wyświetleniu.
+    """
+    for table in GALLERY_OWNERS:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN content_html TEXT NOT NULL DEFAULT '';")
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN excerpt TEXT NOT NULL DEFAULT '';")
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN word_count INTEGER NOT NULL DEFAULT 0;")
+    backfill_content(cur)
+
+
+def _migration_7_cache_generation(cur, static_dir):
+    """Dodaje globalny numer generacji treści dla wspólnej pamięci stron (pagecache.py).
+
+    Panel administracyjny zwiększa go po każdej zmianie; migawka treści
+    zapamiętuje go przy budowie, a strony w pamięci podręcznej są szukane
+    pod generacją migawki, z której zostały wygenerowane.
+    """
+    cur.execute(
+        """
+        CREATE TABLE cache_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL
+        );
+        """
+    )
+    # Generacja startuje od bieżącego czasu, aby po odtworzeniu bazy nie trafiać
+    # w strony zapamiętane dla poprzedniej bazy pod tym samym numerem
+    cur.execute("INSERT INTO cache_generation (id, generation) VALUES (1, CAST(strftime('%s', 'now') AS INTEGER));")
+
+
+def _migration_8_changelog(cur, static_dir):
+    """Dodaje dziennik zmian (changelog) dla replik oraz stan synchronizacji repliki.
+
+    Wyzwalacze dopisują do changelog każdą zmianę wiersza tabel treści
+    (także te wykonane przez inne wyzwalacze). Repliki pobierają dziennik
+    przez /changes?since=<seq> i nanoszą bieżący stan zmienionych wierszy
+    (sync.py). Istniejące wiersze są wpisywane do dziennika od razu, aby
+    pusta replika mogła zsynchronizować się od seq 0.
+    """
+    cur.execute(
+        """
+        CREATE TABLE changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            changed_at REAL NOT NULL
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE replica_state (
+            source TEXT PRIMARY KEY,
+            applied_seq INTEGER NOT NULL DEFAULT 0,
+            applied_changed_at REAL,
+            source_seq INTEGER NOT NULL DEFAULT 0,
+            source_changed_at REAL,
+            synced_at REAL
+        );
+        """
+    )
+    for table in VERSIONED_TABLES:
+        cur.execute(
+            f"INSERT INTO changelog (table_name, row_id, changed_at) SELECT '{table}', id, {UNIX_NOW_SQL} FROM {table} ORDER BY id"
+        )
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            cur.execute(
+                f"""
+                CREATE TRIGGER trg_{table}_changelog_{event.lower()} AFTER {event} ON {table} BEGIN
+                    INSERT INTO changelog (table_name, row_id, changed_at)
+                    VALUES ('{table}', {row}.id, {UNIX_NOW_SQL});
+                END;
+                """
+            )
+
+
+def _migration_9_maintenance(cur, static_dir):
+    """Włącza auto_vacuum=INCREMENTAL i dodaje dziennik konserwacji bazy (maintenance.py).
+
+    Bez auto_vacuum strony zwolnione przez usunięte wpisy i zdjęcia nigdy nie
+    wracają do systemu plików. Zmiana trybu wymaga jednorazowego VACUUM
+    (przebudowa całego pliku); później miejsce odzyskuje w krótkich krokach
+    PRAGMA incremental_vacuum.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            duration REAL NOT NULL,
+            ok INTEGER NOT NULL,
+            detail TEXT NOT NULL
+        );
+        """
+    )
+    cur.connection.commit()
+    cur.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+    cur.execute("VACUUM;")
+
+
+def _migration_10_placeholders(cur, static_dir):
+    """Dodaje do zdjęć kolor dominujący i rozmyty obraz zastępczy (images.image_placeholder).
+
+    Strony podają je razem z wymiarami zdjęcia, więc karty mają właściwy
+    rozmiar i tło, zanim zdjęcie się wczyta. Wartości dla istniejących
+    zdjęć zapisanych lokalnie są wyliczane od razu.
+    """
+    cur.execute("ALTER TABLE media ADD COLUMN color TEXT;")
+    cur.execute("ALTER TABLE media ADD COLUMN placeholder TEXT;")
+    backfill_placeholders(cur, static_dir)
+
+
+def _migration_11_contact_messages(cur, static_dir):
+    """Dodaje kolejkę wiadomości z formularza kontaktowego (mailqueue.py).
+
+    Formularz zapisuje wiadomość i od razu odpowiada, a wysyłkę przez SMTP
+    wykonuje wątek w tle. Indeksy obsługują wybór wiadomości do wysłania
+    i limit wiadomości z jednego adresu IP.
+    """
+    cur.execute(
+        """
+        CREATE TABLE contact_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            message TEXT NOT NULL,
+            ip TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            sent_at REAL,
+            last_error TEXT
+        );
+        """
+    )
+    cur.execute("CREATE INDEX idx_contact_due ON contact_messages (next_attempt_at) WHERE status = 'queued';")
+    cur.execute("CREATE INDEX idx_contact_ip ON contact_messages (ip, created_at);")
+
+
+def day_number_sql(column: str) -> str:
+    """Wyrażenie SQL zamieniające datę tekstową na numer dnia (dni od 1970-01-01) albo NULL.
+
+    Rozpoznawane formaty: RRRR-MM-DD (także z godziną), RRRR-MM, RRRR oraz
+    DD.MM.RRRR; niepełna data oznacza pierwszy dzień miesiąca lub roku.
+    """
+    text = f"trim({column})"
+    return f"""CAST(julianday(CASE
+        WHEN {text} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' THEN substr({text}, 1, 10)
+        WHEN {text} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]' THEN {text} || '-01'
+        WHEN {text} GLOB '[0-9][0-9][0-9][0-9]' THEN {text} || '-01-01'
+        WHEN {text} GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]'
+            THEN substr({text}, 7, 4) || '-' || substr({text}, 4, 2) || '-' || substr({text}, 1, 2)
+    END) - 2440587.5 AS INTEGER)"""
+
+
+def _month_delta_sql(kind: str, row: str, delta: int) -> str:
+    """Instrukcje zmieniające licznik miesiąca wiersza `row` (NEW/OLD) w archive_months o `delta`."""
+    year = f"CAST(strftime('%Y', {row}.day * 86400, 'unixepoch') AS INTEGER)"
+    month = f"CAST(strftime('%m', {row}.day * 86400, 'unixepoch') AS INTEGER)"
+    if delta > 0:
+        return f"""
+            INSERT INTO archive_months (kind, year, month, count)
+            SELECT '{kind}', {year}, {month}, {delta} WHERE {row}.day IS NOT NULL
+            ON CONFLICT (kind, year, month) DO UPDATE SET count = count + {delta};"""
+    return f"""
+            UPDATE archive_months SET count = count - {-delta}
+            WHERE {row}.day IS NOT NULL AND kind = '{kind}' AND year = {year} AND month = {month};
+            DELETE FROM archive_months WHERE kind = '{kind}' AND count <= 0;"""
+
+
+def _archive_months_select(table: str) -> str:
+    """Zapytanie zliczające wpisy tabeli w miesiącach: (kind, year, month, count)."""
+    return f"""
+        SELECT '{table}', CAST(strftime('%Y', day * 86400, 'unixepoch') AS INTEGER),
+               CAST(strftime('%m', day * 86400, 'unixepoch') AS INTEGER), COUNT(*)
+        FROM {table} WHERE day IS NOT NULL GROUP BY 2, 3
+        """
+
+
+def rebuild_archive_months(cur):
+    """Przelicza od nowa liczby wpisów w miesiącach (tabela archive_months)."""
+    cur.execute("DELETE FROM archive_months;")
+    for table in DATE_COLUMNS:
+        cur.execute(f"INSERT INTO archive_months (kind, year, month, count) {_archive_months_select(table)}")
+
+
+def check_archive_months(cur, repair: bool = False):
+    """Porównuje liczniki archive_months z faktyczną liczbą wpisów w miesiącach.
+
+    Zwraca listę krotek ('archive_months', 'rodzaj rok-miesiąc'). Przy repair=True
+    liczniki są przeliczane od nowa.
+    """
+    expected = set()
+    for table in DATE_COLUMNS:
+        expected.update(cur.execute(_archive_months_select(table)).fetchall())
+    stored = set(cur.execute("SELECT kind, year, month, count FROM archive_months WHERE count > 0").fetchall())
+    drift = [
+        ("archive_months", f"{kind} {year}-{month:02d}")
+        for kind, year, month in sorted({row[:3] for row in expected ^ stored})
+    ]
+    if drift and repair:
+        rebuild_archive_months(cur)
+    return drift
+
+
+def _migration_12_day_numbers(cur, static_dir):
+    """Dodaje numer dnia (kolumna day) do aktualności, osiągnięć i publikacji oraz liczniki miesięcy.
+
+    Daty są zapisywane jako dowolny tekst, więc nie da się ich filtrować
+    zakresem. Kolumna day (dni od 1970-01-01) jest wyliczana z daty przez
+    wyzwalacze przy każdym zapisie – także przez sync.py i archive.py,
+    które przesyłają ją razem z wierszem – i ma indeks (day, id) dla widoków
+    archiwum. Tabela archive_months przechowuje liczbę wpisów w każdym
+    miesiącu, aktualizowaną przez wyzwalacze, więc lista miesięcy archiwum
+    nie wymaga GROUP BY po całych tabelach.
+    """
+    cur.execute(
+        """
+        CREATE TABLE archive_months (
+            kind TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (kind, year, month)
+        ) WITHOUT ROWID;
+        """
+    )
+    for table, column in DATE_COLUMNS.items():
+        day = day_number_sql(f"NEW.{column}")
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN day INTEGER;")
+        cur.execute(f"UPDATE {table} SET day = {day_number_sql(column)};")
+        cur.execute(f"CREATE INDEX idx_{table}_day ON {table} (day, id);")
+        # Wiersze z już wyliczoną kolumną day (repliki, import archiwum) nie są ponownie zapisywane
+        cur.execute(
+            f"""
+            CREATE TRIGGER trg_{table}_day_insert AFTER INSERT ON {table}
+            WHEN NEW.day IS NOT {day} BEGIN
+                UPDATE {table} SET day = {day} WHERE id = NEW.id;
+            END;
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER trg_{table}_day_update AFTER UPDATE OF {column}, day ON {table}
+            WHEN NEW.day IS NOT {day} BEGIN
+                UPDATE {table} SET day = {day} WHERE id = NEW.id;
+            END;
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER trg_{table}_months_insert AFTER INSERT ON {table}
+            WHEN NEW.day IS NOT NULL BEGIN{_month_delta_sql(table, "NEW", 1)}
+            END;
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER trg_{table}_months_update AFTER UPDATE OF day ON {table}
+            WHEN OLD.day IS NOT NEW.day BEGIN{_month_delta_sql(table, "OLD", -1)}{_month_delta_sql(table, "NEW", 1)}
+            END;
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER trg_{table}_months_delete AFTER DELETE ON {table}
+            WHEN OLD.day IS NOT NULL BEGIN{_month_delta_sql(table, "OLD", -1)}
+            END;
+            """
+        )
+    rebuild_archive_months(cur)
+
+
+def _migration_13_admin_indexes(cur, static_dir):
+    """Indeksy list panelu administracyjnego: sortowanie po tytule, imieniu i kategorii.
+
+    Tytuły i imiona indeksowane są bez rozróżniania wielkości liter (NOCASE),
+    więc ten sam indeks obsługuje sortowanie i wyszukiwanie po początku tytułu.
+    """
+    for table in DATE_COLUMNS:
+        cur.execute(f"CREATE INDEX idx_{table}_title ON {table} (title COLLATE NOCASE, id);")
+    cur.execute("CREATE INDEX idx_members_name ON members (name COLLATE NOCASE, id);")
+    cur.execute("CREATE INDEX idx_members_category ON members (category, name COLLATE NOCASE, id);")
+
+
+def _migration_14_displayed_dimensions(cur, static_dir):
+    """Zapisuje wymiary zdjęć JPEG obróconych w EXIF w postaci wyświetlanej.
+
+    Wcześniej wymiary czytane były tylko z nagłówka, więc zdjęcie zapisane
+    bokiem miało zamienioną szerokość z wysokością. Bez Pillow migracja
+    niczego nie zmienia.
+    """
+    rows = cur.execute(
+        "SELECT id, filename FROM media WHERE width IS NOT NULL "
+        "AND (lower(filename) LIKE '%.jpg' OR lower(filename) LIKE '%.jpeg')"
+    ).fetchall()
+    for media_id, filename in rows:
+        path = media_file(static_dir, filename)
+        if path.is_file():
+            width, height = probe_image(path)
+            cur.execute("UPDATE media SET width = ?, height = ? WHERE id = ?", (width, height, media_id))
+
+
+# Kolejne migracje schematu; numer migracji zapisywany jest w PRAGMA user_version
+MIGRATIONS = [
+    _migration_1_denormalized_images,
+    _migration_2_unified_media,
+    _migration_3_gallery,
+    _migration_4_table_versions,
+    _migration_5_wal,
+    _migration_6_rendered_content,
+    _migration_7_cache_generation,
+    _migration_8_changelog,
+    _migration_9_maintenance,
+    _migration_10_placeholders,
+    _migration_11_contact_messages,
+    _migration_12_day_numbers,
+    _migration_13_admin_indexes,
+    _migration_14_displayed_dimensions,
+]
+# Migracje, których nie można wykonać w transakcji (PRAGMA journal_mode, VACUUM).
+# Ponowne wykonanie po przerwaniu nie zmienia już niczego.
+NON_TRANSACTIONAL_MIGRATIONS = {_migration_5_wal, _migration_9_maintenance}
+
+
+def migrate_db(conn, static_dir=None):
+    """Doprowadza istniejącą bazę do aktualnego schematu, wykonując brakujące migracje.
+
+    `static_dir` – katalog plików serwisu, z którego migracje czytają przesłane
+    zdjęcia; domyślnie katalog static obok pliku bazy (tak są ułożone katalog
+    aplikacji i katalogi dzierżawców, zob. tenants.py).
+
+    Procesy startujące razem (np. procesy robocze gunicorn bez wczytania przed
+    fork()) czekają na siebie na blokadzie pliku <baza>.migrate.lock, a numer
+    wersji czytany jest dopiero po jej uzyskaniu. Każda migracja wykonywana
+    jest w jednej transakcji razem z zapisem PRAGMA user_version, więc
+    przerwana migracja nie zostawia części zmian – kolejny start wykona ją
+    od początku.
+    """
+    cur = conn.cursor()
+    if not cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'news'").fetchone():
+        # Baza nie została jeszcze zainicjalizowana – init_db() utworzy schemat od zera
+        return
+    if cur.execute("PRAGMA user_version;").fetchone()[0] >= len(MIGRATIONS):
+        return
+    conn.commit()
+    database = cur.execute("PRAGMA database_list;").fetchone()[2]
+    if not database:
+        # Baza w pamięci – nie ma innych procesów, z którymi trzeba się zsynchronizować
+        _run_migrations(conn, Path(static_dir or STATIC_DIR))
+        return
+    static_dir = Path(static_dir or Path(database).parent / "static")
+    with open(Path(database).with_name(Path(database).name + ".migrate.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _run_migrations(conn, static_dir)
+
+
+def _run_migrations(conn, static_dir: Path):
+    """Wykonuje brakujące migracje; wywoływana po uzyskaniu blokady migracji."""
+    cur = conn.cursor()
+    version = cur.execute("PRAGMA user_version;").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        if number <= version:
+            continue
+        if migration in NON_TRANSACTIONAL_MIGRATIONS:
+            migration(cur, static_dir)
+            cur.execute(f"PRAGMA user_version = {number};")
+            conn.commit()
+            continue
+        cur.execute("BEGIN IMMEDIATE;")
+        try:
+            migration(cur, static_dir)
+            cur.execute(f"PRAGMA user_version = {number};")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def media_file(static_dir: Path, filename: str) -> Path:
+    """Ścieżka pliku zdjęcia z tabeli media.
+
+    Przesłane pliki (uploads/) leżą w katalogu static serwisu, pozostałe
+    (przykładowe zdjęcia z images/) – we wspólnym katalogu static aplikacji,
+    tak jak podaje je app.media_url.
+    """
+    return (Path(static_dir) if filename.startswith("uploads/") else STATIC_DIR) / filename
+
+
+def backfill_media_metadata(cur, static_dir: Path):
+    """Uzupełnia wymiary i rozmiar plików dla wierszy media, które ich jeszcze nie mają."""
+    rows = cur.execute("SELECT id, filename FROM media WHERE bytes IS NULL").fetchall()
+    for media_id, filename in rows:
+        path = media_file(static_dir, filename)
+        if not path.is_file():
+            continue
+        width, height = probe_image(path)
+        cur.execute(
+            "UPDATE media SET width = ?, height = ?, bytes = ? WHERE id = ?",
+            (width, height, path.stat().st_size, media_id),
+        )
+
+
+def backfill_thumbnails(cur, static_dir: Path):
+    """Tworzy brakujące miniatury przesłanych zdjęć. Zwraca liczbę utworzonych plików."""
+    created = 0
+    rows = cur.execute(
+        "SELECT id, filename FROM media WHERE thumb IS NULL AND filename LIKE 'uploads/%'"
+    ).fetchall()
+    for media_id, filename in rows:
+        thumb = make_thumbnail(Path(static_dir), filename)
+        if thumb:
+            cur.execute("UPDATE media SET thumb = ? WHERE id = ?", (thumb, media_id))
+            created += 1
+    return created
+
+
+def backfill_placeholders(cur, static_dir: Path):
+    """Uzupełnia kolor dominujący i obraz zastępczy zdjęć. Zwraca liczbę uzupełnionych wierszy.
+
+    Pomijane są zdjęcia, których plik nie jest dostępny lokalnie (np. w magazynie S3).
+    """
+    filled = 0
+    rows = cur.execute("SELECT id, filename FROM media WHERE placeholder IS NULL").fetchall()
+    for media_id, filename in rows:
+        path = media_file(static_dir, filename)
+        if not path.is_file():
+            continue
+        color, placeholder = image_placeholder(path)
+        if placeholder:
+            cur.execute("UPDATE media SET color = ?, placeholder = ? WHERE id = ?", (color, placeholder, media_id))
+            filled += 1
+    return filled
+
+
+def backfill_content(cur):
+    """Ponownie formatuje treść wszystkich wpisów. Zwraca liczbę zmienionych wierszy.
+
+    Przydatne po zmianie reguł w markup.py; wiersze z aktualnym HTML-em nie są
+    zapisywane, więc ich wersje w table_versions się nie zmieniają.
+    """
+    changed = 0
+    for table, column in CONTENT_COLUMNS.items():
+        rows = cur.execute(f"SELECT id, {column}, content_html, excerpt, word_count FROM {table}").fetchall()
+        for row_id, text, *stored in rows:
+            rendered = render_markup(text)
+            if tuple(stored) != rendered:
+                cur.execute(
+                    f"UPDATE {table} SET content_html = ?, excerpt = ?, word_count = ? WHERE id = ?",
+                    (*rendered, row_id),
+                )
+                changed += 1
+    return changed
+
+
+def check_image_counters(cur, repair: bool = False):
+    """Wyszukuje wiersze, w których zdenormalizowane kolumny zdjęć rozjechały się z tabelą media.
+
+    Zwraca listę krotek (tabela, id). Przy repair=True rozbieżne wiersze są przeliczane.
+    Sprawdzane są też zdjęcia osierocone (bez istniejącego właściciela) – te są usuwane.
+    """
+    drift = []
+    for owner_type in MEDIA_OWNERS:
+        where = f"m.owner_type = '{owner_type}' AND m.owner_id = p.id"
+        if owner_type == "members":
+            condition = f"""p.photo IS NOT COALESCE(
+                (SELECT filename FROM media m WHERE {where} ORDER BY position, id LIMIT 1), '')"""
+        else:
+            condition = f"""p.image_count != (SELECT COUNT(*) FROM media m WHERE {where})
+               OR p.cover_image IS NOT (SELECT filename FROM media m WHERE {where} ORDER BY position, id LIMIT 1)
+               OR p.image_list IS NOT (SELECT GROUP_CONCAT(filename) FROM
+                      (SELECT filename FROM media m WHERE {where} ORDER BY position, id))"""
+        rows = cur.execute(f"SELECT p.id FROM {owner_type} p WHERE {condition}").fetchall()
+        for (row_id,) in rows:
+            drift.append((owner_type, row_id))
+            if repair:
+                sql = _recompute_media_sql(owner_type, "?")
+                cur.execute(sql, (row_id,) * sql.count("?"))
+        orphans = cur.execute(
+            f"""
+            SELECT m.id FROM media m WHERE m.owner_type = '{owner_type}'
+              AND NOT EXISTS (SELECT 1 FROM {owner_type} p WHERE p.id = m.owner_id)
+            """
+        ).fetchall()
+        for (media_id,) in orphans:
+            drift.append(("media", media_id))
+            if repair:
+                cur.execute("DELETE FROM media WHERE id = ?", (media_id,))
+    return drift
+
 
-def init_db():
+def init_db(database=DB_PATH):
     """Tworzy bazę danych i wstawia przykładowe rekordy."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(database)
     cur = conn.cursor()
 
     # Włącz obsługę kluczy obcych
@@ -32,6 +754,16 @@ def init_db():
     # Tabela news_images może istnieć z poprzednich wersji – usuń ją, aby odtworzyć z nowym schematem
     cur.execute("DROP TABLE IF EXISTS news_images;")
     cur.execute("DROP TABLE IF EXISTS grants;")
+    cur.execute("DROP TABLE IF EXISTS media;")
+    cur.execute("DROP TABLE IF EXISTS table_versions;")
+    cur.execute("DROP TABLE IF EXISTS cache_generation;")
+    cur.execute("DROP TABLE IF EXISTS changelog;")
+    cur.execute("DROP TABLE IF EXISTS replica_state;")
+    cur.execute("DROP TABLE IF EXISTS maintenance_log;")
+    cur.execute("DROP TABLE IF EXISTS contact_messages;")
+    cur.execute("DROP TABLE IF EXISTS archive_months;")
+    # Schemat tworzony jest od początku, więc wszystkie migracje zostaną wykonane ponownie
+    cur.execute("PRAGMA user_version = 0;")
 
     # Tworzenie tabel
     cur.execute(
@@ -263,9 +995,59 @@ def init_db():
     )
 
     conn.commit()
+    migrate_db(conn)
     conn.close()
-    print(f"Baza danych zainicjalizowana: {DB_PATH}")
+    print(f"Baza danych zainicjalizowana: {database}")
 
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Inicjalizacja i konserwacja bazy MIKROBOT.")
+    parser.add_argument("--check", action="store_true",
+                        help="sprawdź spójność liczników zdjęć i archiwum zamiast tworzyć bazę od nowa")
+    parser.add_argument("--repair", action="store_true",
+                        help="razem z --check: napraw wykryte rozbieżności")
+    parser.add_argument("--backfill-media", action="store_true",
+                        help="uzupełnij wymiary, rozmiary, miniatury i obrazy zastępcze istniejących zdjęć")
+    parser.add_argument("--backfill-content", action="store_true",
+                        help="ponownie sformatuj treść wszystkich wpisów (content_html, excerpt, word_count)")
+    parser.add_argument("--root", default=os.environ.get("MIKROBOT_TENANTS_DIR"),
+                        help="katalog dzierżawców (domyślnie MIKROBOT_TENANTS_DIR), razem z --host")
+    parser.add_argument("--host", help="wykonaj polecenie na bazie i plikach dzierżawcy zamiast serwisu z katalogu aplikacji")
+    args = parser.parse_args()
+    database, static_dir = DB_PATH, STATIC_DIR
+    if args.host:
+        if not args.root:
+            parser.error("--host wymaga --root albo MIKROBOT_TENANTS_DIR")
+        database = Path(args.root) / args.host / "mikrobot.db"
+        static_dir = database.parent / "static"
+        if not database.is_file():
+            parser.error(f"Brak bazy dzierżawcy: {database}")
+    if args.backfill_content:
+        conn = sqlite3.connect(database)
+        migrate_db(conn, static_dir)
+        changed = backfill_content(conn.cursor())
+        conn.commit()
+        conn.close()
+        print(f"Zaktualizowano wpisów: {changed}")
+    elif args.backfill_media:
+        conn = sqlite3.connect(database)
+        migrate_db(conn, static_dir)
+        cur = conn.cursor()
+        backfill_media_metadata(cur, static_dir)
+        created = backfill_thumbnails(cur, static_dir)
+        filled = backfill_placeholders(cur, static_dir)
+        conn.commit()
+        conn.close()
+        print(f"Utworzono miniatur: {created}, obrazów zastępczych: {filled}")
+    elif args.check:
+        conn = sqlite3.connect(database)
+        migrate_db(conn, static_dir)
+        cur = conn.cursor()
+        drift = check_image_counters(cur, repair=args.repair) + check_archive_months(cur, repair=args.repair)
+        conn.commit()
+        conn.close()
+        for table, row_id in drift:
+            print(f"Rozbieżność: {table} id={row_id}" + (" (naprawiono)" if args.repair else ""))
+        print(f"Znaleziono rozbieżności: {len(drift)}")
+    else:
+        init_db(database)
\ No newline at end of file
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Trwała kolejka wiadomości z formularza kontaktowego i ich wysyłka przez SMTP w tle.
+
+Formularz zapisuje wiadomość w tabeli contact_messages i od razu odpowiada –
+żądanie nie czeka na serwer poczty. Wątek MailWorker (albo ręcznie
+`python mailqueue.py`) wysyła zaległe wiadomości paczkami po BATCH_SIZE
+przez jedno połączenie SMTP. Nieudane próby są ponawiane z rosnącym
+odstępem (RETRY_DELAYS); po ostatniej wiadomość dostaje status failed
+i czeka w skrzynce panelu na ręczne ponowienie. Tylko jeden proces na
+hoście wysyła pocztę z danej bazy naraz (blokada pliku).
+
+Konfiguracja: MIKROBOT_SMTP_HOST (bez niej wiadomości tylko czekają
+w kolejce), MIKROBOT_SMTP_PORT, MIKROBOT_SMTP_USER, MIKROBOT_SMTP_PASSWORD,
+MIKROBOT_SMTP_STARTTLS=1, MIKROBOT_MAIL_FROM i MIKROBOT_MAIL_TO. Do testów
+służy lokalny serwer SMTP zapisujący wiadomości do plików (smtp_standin.py).
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate
+from pathlib import Path
+
+from init_db import DB_PATH, UNIX_NOW_SQL, migrate_db
+
+# Najwyżej RATE_LIMIT wiadomości z jednego adresu IP w ciągu RATE_WINDOW sekund
+RATE_LIMIT = 5
+RATE_WINDOW = 3600
+# Liczba wiadomości wysyłanych jednym połączeniem SMTP
+BATCH_SIZE = 20
+# Odstępy kolejnych ponowień w sekundach; po wyczerpaniu wiadomość dostaje status failed
+RETRY_DELAYS = (60, 5 * 60, 30 * 60, 2 * 3600, 12 * 3600)
+SMTP_TIMEOUT = 30
+
+log = logging.getLogger("mikrobot.mail")
+
+
+def smtp_settings_from_env():
+    """Ustawienia serwera poczty ze zmiennych MIKROBOT_SMTP_* albo None, jeśli wysyłka jest wyłączona."""
+    host = os.environ.get("MIKROBOT_SMTP_HOST")
+    if not host:
+        return None
+    return {
+        "host": host,
+        "port": int(os.environ.get("MIKROBOT_SMTP_PORT", "25")),
+        "user": os.environ.get("MIKROBOT_SMTP_USER"),
+        "password": os.environ.get("MIKROBOT_SMTP_PASSWORD"),
+        "starttls": os.environ.get("MIKROBOT_SMTP_STARTTLS") == "1",
+        "sender": os.environ.get("MIKROBOT_MAIL_FROM", "strona@mikrobot.edu.pl"),
+        "recipient": os.environ.get("MIKROBOT_MAIL_TO", "kontakt@mikrobot.edu.pl"),
+    }
+
+
+def enqueue(conn, name: str, email: str, message: str, ip: str) -> bool:
+    """Zapisuje wiadomość w kolejce. Zwraca False, jeśli adres IP przekroczył limit wiadomości.
+
+    Sprawdzenie limitu i zapis odbywają się w jednej transakcji zapisu, więc
+    limit obowiązuje także przy równoczesnych żądaniach w wielu procesach.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        recent = conn.execute(
+            f"SELECT COUNT(*) FROM contact_messages WHERE ip = ? AND created_at > {UNIX_NOW_SQL} - ?",
+            (ip, RATE_WINDOW),
+        ).fetchone()[0]
+        if recent >= RATE_LIMIT:
+            conn.rollback()
+            return False
+        conn.execute(
+            f"""
+            INSERT INTO contact_messages (name, email, message, ip, created_at, next_attempt_at)
+            VALUES (?, ?, ?, ?, {UNIX_NOW_SQL}, {UNIX_NOW_SQL})
+            """,
+            (name, email, message, ip),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def build_message(row, settings: dict) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings["sender"]
+    message["To"] = settings["recipient"]
+    message["Reply-To"] = formataddr((row["name"], row["email"]))
+    message["Subject"] = f"Formularz kontaktowy: {row['name']}"
+    message["Date"] = formatdate(row["created_at"], localtime=True)
+    # Stały identyfikator pozwala serwerowi poczty odrzucić duplikat po ponowieniu
+    domain = settings["sender"].rpartition("@")[2] or "localhost"
+    message["Message-ID"] = f"<contact-{row['id']}-{int(row['created_at'])}@{domain}>"
+    message.set_content(f"{row['message']}\n\n-- \n{row['name']} <{row['email']}>, IP {row['ip']}\n")
+    return message
+
+
+def _connect_smtp(settings: dict):
+    import smtplib
+
+    smtp = smtplib.SMTP(settings["host"], settings["port"], timeout=SMTP_TIMEOUT)
+    try:
+        if settings["starttls"]:
+            smtp.starttls()
+        if settings["user"]:
+            smtp.login(settings["user"], settings["password"] or "")
+    except Exception:
+        smtp.close()
+        raise
+    return smtp
+
+
+def _schedule_retry(conn, row, error) -> str:
+    """Zapisuje nieudaną próbę; zwraca nowy status wiadomości (queued albo failed)."""
+    attempts = row["attempts"] + 1
+    status = "failed" if attempts > len(RETRY_DELAYS) else "queued"
+    delay = RETRY_DELAYS[min(attempts, len(RETRY_DELAYS)) - 1]
+    conn.execute(
+        f"""
+        UPDATE contact_messages
+        SET status = ?, attempts = ?, next_attempt_at = {UNIX_NOW_SQL} + ?, last_error = ?
+        WHERE id = ?
+        """,
+        (status, attempts, delay, str(error)[:500], row["id"]),
+    )
+    return status
+
+
+def deliver(database, settings: dict, batch_size: int = BATCH_SIZE) -> dict:
+    """Wysyła wiadomości, na które przyszła pora. Zwraca liczniki: sent, queued (ponowienia), failed.
+
+    Pusty wynik oznacza brak zaległych wiadomości albo wysyłkę w innym procesie.
+    """
+    # smtplib wczytywany dopiero przy wysyłce – nie wydłuża uruchamiania procesów serwera
+    import smtplib
+
+    report = Counter()
+    with open(Path(database).with_name(Path(database).name + ".mail.lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return {}
+        conn = sqlite3.connect(database, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            while True:
+                rows = conn.execute(
+                    f"""
+                    SELECT * FROM contact_messages
+                    WHERE status = 'queued' AND next_attempt_at <= {UNIX_NOW_SQL}
+                    ORDER BY next_attempt_at, id LIMIT ?
+                    """,
+                    (batch_size,),
+                ).fetchall()
+                if not rows:
+                    break
+                try:
+                    smtp = _connect_smtp(settings)
+                except (OSError, smtplib.SMTPException) as exc:
+                    for row in rows:
+                        report[_schedule_retry(conn, row, exc)] += 1
+                    log.warning("Serwer poczty niedostępny: %s", exc)
+                    break
+                disconnected = False
+                with smtp:
+                    for row in rows:
+                        if disconnected:
+                            report[_schedule_retry(conn, row, "połączenie przerwane")] += 1
+                            continue
+                        try:
+                            smtp.send_message(build_message(row, settings))
+                        except (smtplib.SMTPServerDisconnected, OSError) as exc:
+                            disconnected = True
+                            report[_schedule_retry(conn, row, exc)] += 1
+                        except smtplib.SMTPException as exc:
+                            # Odrzucenie jednej wiadomości nie przerywa paczki
+                            report[_schedule_retry(conn, row, exc)] += 1
+                        else:
+                            conn.execute(
+                                f"UPDATE contact_messages SET status = 'sent', attempts = attempts + 1, "
+                                f"sent_at = {UNIX_NOW_SQL}, last_error = NULL WHERE id = ?",
+                                (row["id"],),
+                            )
+                            report["sent"] += 1
+                if disconnected or len(rows) < batch_size:
+                    break
+        finally:
+            conn.close()
+    if report:
+        log.info("Poczta z %s: %s", database, dict(report))
+    return dict(report)
+
+
+def queue_counts(conn) -> dict:
+    """Liczba wiadomości w każdym stanie: {status: liczba}."""
+    return dict(conn.execute("SELECT status, COUNT(*) FROM contact_messages GROUP BY status").fetchall())
+
+
+class MailWorker:
+    """Wątek w tle wysyłający wiadomości co `interval` sekund albo od razu po notify().
+
+    `databases` – funkcja zwracająca listę baz z kolejkami (baza serwisu albo
+    bazy wszystkich dzierżawców). Wątek uruchamiany jest leniwie (start() po
+    fork() tworzy nowy).
+    """
+
+    def __init__(self, databases, settings: dict, interval: float = 30):
+        self.databases = databases
+        self.settings = settings
+        self.interval = interval
+        self._wake = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="mail-queue", daemon=True).start()
+
+    def notify(self):
+        """Budzi wątek po przyjęciu nowej wiadomości."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            for database in self.databases():
+                try:
+                    deliver(database, self.settings)
+                except Exception:
+                    log.exception("Wysyłka poczty z %s nie powiodła się", database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wysyłka wiadomości z formularza kontaktowego MIKROBOT.")
+    parser.add_argument("--database", default=DB_PATH, help="baza z kolejką (domyślnie mikrobot.db)")
+    args = parser.parse_args()
+    settings = smtp_settings_from_env()
+    if settings is None:
+        parser.error("ustaw MIKROBOT_SMTP_HOST")
+    conn = sqlite3.connect(args.database)
+    migrate_db(conn)
+    conn.close()
+    print(json.dumps(deliver(args.database, settings), ensure_ascii=False))
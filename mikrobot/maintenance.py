@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Okresowa konserwacja bazy: kopie zapasowe, statystyki planisty i odzyskiwanie miejsca.
+
+Zadania (każde wykonywane nie częściej niż określa SCHEDULE):
+
+- backup – kopia bazy przez API kopii zapasowej SQLite, porcjami stron
+  z krótką przerwą między porcjami, więc zapisy w panelu nie są blokowane;
+  kopia zapisywana jest w katalogu backups/ (ostatnie KEEP_BACKUPS),
+- optimize – ANALYZE przy pierwszym uruchomieniu, później PRAGMA optimize
+  (SQLite sam ocenia, które statystyki trzeba odświeżyć),
+- vacuum – zwrot wolnych stron do systemu plików przez PRAGMA
+  incremental_vacuum, w krótkich krokach i tylko gdy serwer jest bezczynny.
+
+Każde wykonanie (czas, wynik, szczegóły kroków) zapisywane jest w tabeli
+maintenance_log; ostatnie wyniki są dostępne w /metrics. W aplikacji zadania
+uruchamia wątek MaintenanceScheduler; tylko jeden proces na hoście wykonuje
+je naraz (blokada pliku). Ręcznie:
+
+    python maintenance.py              # zadania, na które przyszła pora
+    python maintenance.py --force backup vacuum
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from init_db import DB_PATH, UNIX_NOW_SQL, migrate_db
+
+BACKUP_DIR = Path(os.environ.get("MIKROBOT_BACKUP_DIR", DB_PATH.parent / "backups"))
+KEEP_BACKUPS = 7
+# Liczba stron kopiowanych w jednym kroku kopii zapasowej i przerwa między krokami
+BACKUP_PAGES = 128
+BACKUP_PAUSE = 0.005
+# Liczba stron zwalnianych w jednym kroku incremental_vacuum i maksymalna liczba kroków
+VACUUM_PAGES = 256
+VACUUM_MAX_STEPS = 64
+# Odstępy między wykonaniami zadań w sekundach
+SCHEDULE = {
+    "backup": 24 * 3600,
+    "optimize": 6 * 3600,
+    "vacuum": 3600,
+}
+
+log = logging.getLogger("mikrobot.maintenance")
+
+
+def _timed(step) -> float:
+    started = time.perf_counter()
+    step()
+    return time.perf_counter() - started
+
+
+def backup(database=DB_PATH, backup_dir=None) -> dict:
+    """Tworzy kopię zapasową bazy porcjami stron; stare kopie są usuwane.
+
+    Kopie baz dzierżawców (zob. tenants.py) trafiają do katalogu backups/ obok ich bazy.
+    """
+    if backup_dir is None:
+        backup_dir = BACKUP_DIR if Path(database) == DB_PATH else Path(database).parent / "backups"
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    target = backup_dir / f"mikrobot-{time.strftime('%Y%m%d-%H%M%S')}.db"
+    partial = target.with_name(target.name + ".part")
+    steps = []
+    last = [time.perf_counter()]
+
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        steps.append(now - last[0])
+        # Przerwa między porcjami pozwala panelowi zatwierdzać zapisy
+        time.sleep(BACKUP_PAUSE)
+        last[0] = time.perf_counter()
+
+    src = sqlite3.connect(database, timeout=30)
+    dst = sqlite3.connect(partial)
+    try:
+        src.backup(dst, pages=BACKUP_PAGES, progress=progress)
+        pages = dst.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+    os.replace(partial, target)
+    for old in sorted(backup_dir.glob("mikrobot-*.db"))[:-KEEP_BACKUPS]:
+        old.unlink(missing_ok=True)
+    return {
+        "file": target.name,
+        "pages": pages,
+        "bytes": target.stat().st_size,
+        "steps": len(steps),
+        "max_step_ms": round(max(steps, default=0) * 1000, 2),
+    }
+
+
+def optimize(conn) -> dict:
+    """Odświeża statystyki planisty zapytań (pełne ANALYZE tylko przy pierwszym uruchomieniu)."""
+    has_stats = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    statement = "PRAGMA optimize" if has_stats else "ANALYZE"
+    duration = _timed(lambda: conn.execute(statement).fetchall())
+    return {"statement": statement, "ms": round(duration * 1000, 2)}
+
+
+def incremental_vacuum(conn, is_idle=lambda: True, max_steps: int = VACUUM_MAX_STEPS) -> dict:
+    """Zwalnia wolne strony krokami po VACUUM_PAGES, dopóki serwer jest bezczynny."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return {"skipped": "auto_vacuum != INCREMENTAL"}
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    steps = []
+    while len(steps) < max_steps and is_idle():
+        if not conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            break
+        # Każdy krok jest osobną, krótką transakcją zapisu; executescript wykonuje
+        # PRAGMA do końca (execute zwolniłby tylko jedną stronę na krok)
+        steps.append(_timed(lambda: conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES});")))
+    after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {
+        "freed_pages": before - after,
+        "free_pages": after,
+        "steps": len(steps),
+        "max_step_ms": round(max(steps, default=0) * 1000, 2),
+        "interrupted": bool(after) and len(steps) < max_steps,
+    }
+
+
+def _connect(database):
+    conn = sqlite3.connect(database, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def last_runs(conn) -> dict:
+    """Ostatnie wykonanie każdego zadania: {zadanie: wiersz maintenance_log}."""
+    rows = conn.execute(
+        """
+        SELECT task, started_at, duration, ok, detail FROM maintenance_log
+        WHERE id IN (SELECT MAX(id) FROM maintenance_log GROUP BY task)
+        """
+    ).fetchall()
+    return {row["task"]: row for row in rows}
+
+
+def run_task(conn, task: str, database=DB_PATH, is_idle=lambda: True) -> dict:
+    """Wykonuje zadanie, mierzy czas i zapisuje wynik w maintenance_log."""
+    started = time.time()
+    started_perf = time.perf_counter()
+    try:
+        if task == "backup":
+            detail = backup(database)
+        elif task == "optimize":
+            detail = optimize(conn)
+        elif task == "vacuum":
+            detail = incremental_vacuum(conn, is_idle)
+        else:
+            raise ValueError(f"Nieznane zadanie: {task}")
+        ok = True
+    except Exception as exc:  # błąd zadania jest raportowany, a nie przerywa harmonogramu
+        detail, ok = {"error": str(exc)}, False
+    duration = time.perf_counter() - started_perf
+    conn.execute(
+        "INSERT INTO maintenance_log (task, started_at, duration, ok, detail) VALUES (?, ?, ?, ?, ?)",
+        (task, started, duration, int(ok), json.dumps(detail)),
+    )
+    (log.info if ok else log.error)("Konserwacja %s: %.3f s %s", task, duration, detail)
+    return {"task": task, "ok": ok, "duration": duration, **detail}
+
+
+def run_due(database=DB_PATH, tasks=None, force: bool = False, is_idle=lambda: True) -> list:
+    """Wykonuje zadania, na które przyszła pora (lub wszystkie podane przy force).
+
+    Zwraca raporty wykonanych zadań; pusta lista oznacza, że nic nie było do
+    zrobienia albo zadania wykonuje właśnie inny proces.
+    """
+    with open(Path(database).with_name(Path(database).name + ".maintenance.lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return []
+        conn = _connect(database)
+        try:
+            runs = last_runs(conn)
+            now = conn.execute(f"SELECT {UNIX_NOW_SQL}").fetchone()[0]
+            reports = []
+            for task in tasks or SCHEDULE:
+                previous = runs.get(task)
+                if not force and previous is not None and now - previous["started_at"] < SCHEDULE[task]:
+                    continue
+                reports.append(run_task(conn, task, database, is_idle))
+            return reports
+        finally:
+            conn.close()
+
+
+class MaintenanceScheduler:
+    """Wątek w tle sprawdzający co `interval` sekund, czy przyszła pora na zadania.
+
+    `databases` – funkcja zwracająca listę baz do konserwacji (baza serwisu
+    albo bazy wszystkich dzierżawców); `is_idle` – funkcja zwracająca True,
+    gdy proces nie obsługuje żądań; odzyskiwanie miejsca działa tylko wtedy
+    i przerywa pracę, gdy przyjdzie żądanie. Wątek uruchamiany jest leniwie
+    (start() po fork() tworzy nowy).
+    """
+
+    def __init__(self, databases, is_idle, interval: float = 60):
+        self.databases = databases
+        self.is_idle = is_idle
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="maintenance", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            for database in self.databases():
+                try:
+                    run_due(database, is_idle=self.is_idle)
+                except Exception:
+                    log.exception("Konserwacja bazy %s nie powiodła się", database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Konserwacja bazy MIKROBOT.")
+    parser.add_argument("tasks", nargs="*", help=f"zadania: {', '.join(SCHEDULE)} (domyślnie wszystkie)")
+    parser.add_argument("--force", action="store_true", help="wykonaj zadania bez względu na harmonogram")
+    args = parser.parse_args()
+    unknown = set(args.tasks) - set(SCHEDULE)
+    if unknown:
+        parser.error(f"nieznane zadania: {', '.join(sorted(unknown))}")
+    conn = sqlite3.connect(DB_PATH)
+    migrate_db(conn)
+    conn.close()
+    reports = run_due(tasks=args.tasks or None, force=args.force)
+    if not reports:
+        print("Nic do zrobienia (albo konserwację wykonuje inny proces).")
+    for report in reports:
+        print(json.dumps(report, ensure_ascii=False))
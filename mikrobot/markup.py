@@ -0,0 +1,97 @@
+"""
+Lekki język formatowania treści aktualności, osiągnięć i publikacji.
+
+Treść jest zamieniana na HTML jednorazowo, przy zapisie w panelu
+administracyjnym, i przechowywana w bazie razem ze skrótem i liczbą słów.
+Obsługiwane są:
+
+- akapity oddzielone pustą linią (pojedyncze przejście do nowej linii to <br>),
+- listy – linie zaczynające się od "- " lub "* ",
+- **pogrubienie**, *kursywa*, `kod`,
+- odnośniki [tekst](https://adres).
+
+Cały tekst jest najpierw escapowany, a dopiero potem zamieniany na znaczniki,
+więc wynik zawiera wyłącznie znaczniki wygenerowane tutaj. Gotowe odnośniki
+i fragmenty kodu zastępowane są znacznikami miejsca, zanim zostanie
+rozpoznane pogrubienie i kursywa – gwiazdki w adresie lub kodzie nie
+zmieniają ich zawartości.
+"""
+
+import re
+from html import escape
+
+# Długość skrótu (w znakach) wyświetlanego na stronie głównej
+EXCERPT_LENGTH = 160
+
+# Dozwolone adresy odnośników: http(s), mailto oraz ścieżki w obrębie strony
+SAFE_URL = re.compile(r"^(https?://|mailto:|/|#)", re.IGNORECASE)
+
+LINK = re.compile(r"\[([^\]\n]+)\]\(([^)\s]+)\)")
+CODE = re.compile(r"`([^`\n]+)`")
+STRONG = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*")
+EMPHASIS = re.compile(r"(?<![\w*])\*(?=\S)(.+?)(?<=\S)\*(?![\w*])")
+LIST_ITEM = re.compile(r"^[-*]\s+")
+# Znacznik miejsca gotowego fragmentu HTML (\x00 jest usuwany z treści przed zamianą)
+SPAN = re.compile("\x00(\\d+)\x00")
+
+
+def _link(match) -> str:
+    text, url = _inline(match.group(1)), match.group(2)
+    if not SAFE_URL.match(url):
+        return text
+    return f'<a href="{url}" rel="nofollow">{text}</a>'
+
+
+def _inline(text: str) -> str:
+    """Zamienia znaczniki wewnątrz linii; `text` musi być już escapowany."""
+    spans = []
+
+    def keep(html: str) -> str:
+        spans.append(html)
+        return f"\x00{len(spans) - 1}\x00"
+
+    # Odnośniki i kod są gotowe, zanim gwiazdki zamienią się w pogrubienie i kursywę
+    text = LINK.sub(lambda match: keep(_link(match)), text)
+    text = CODE.sub(lambda match: keep(f"<code>{match.group(1)}</code>"), text)
+    text = STRONG.sub(r"<strong>\1</strong>", text)
+    text = EMPHASIS.sub(r"<em>\1</em>", text)
+    return SPAN.sub(lambda match: spans[int(match.group(1))], text)
+
+
+def _plain(text: str) -> str:
+    """Usuwa znaczniki formatowania, zostawiając sam tekst."""
+    text = LINK.sub(r"\1", text)
+    text = CODE.sub(r"\1", text)
+    text = STRONG.sub(r"\1", text)
+    text = EMPHASIS.sub(r"\1", text)
+    return " ".join(LIST_ITEM.sub("", line) for line in text.splitlines())
+
+
+def to_html(text: str) -> str:
+    """Zamienia treść w lekkim formatowaniu na bezpieczny HTML."""
+    blocks = []
+    text = text.replace("\r\n", "\n").replace("\x00", "")
+    for block in re.split(r"\n\s*\n", text.strip()):
+        lines = [escape(line.strip()) for line in block.splitlines() if line.strip()]
+        if not lines:
+            continue
+        if all(LIST_ITEM.match(line) for line in lines):
+            items = "".join(f"<li>{_inline(LIST_ITEM.sub('', line))}</li>" for line in lines)
+            blocks.append(f"<ul>{items}</ul>")
+        else:
+            blocks.append(f"<p>{'<br>'.join(_inline(line) for line in lines)}</p>")
+    return "\n".join(blocks)
+
+
+def excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    """Zwraca początek treści bez formatowania, ucięty na granicy słowa."""
+    plain = " ".join(_plain(text).split())
+    if len(plain) <= length:
+        return plain
+    cut = plain[:length].rsplit(" ", 1)[0] or plain[:length]
+    return cut.rstrip(" ,.;:–-") + "…"
+
+
+def render_markup(text: str):
+    """Zwraca krotkę (content_html, excerpt, word_count) zapisywaną razem z treścią."""
+    return to_html(text), excerpt(text), len(_plain(text).split())
@@ -0,0 +1,77 @@
+"""
+Pamięć podręczna gotowych stron publicznych, wspólna dla wszystkich procesów.
+
+Strony zapisywane są w osobnym pliku SQLite (klucz -> HTML i ETag), więc
+wszystkie procesy serwera na jednym hoście korzystają z jednej kopii, a nowo
+uruchomiony proces od razu trafia w strony wygenerowane przez pozostałe.
+
+Każdy wpis ma numer generacji treści. Generację zwiększa panel
+administracyjny po każdej zmianie (tabela cache_generation w bazie
+aplikacji), a proces szuka stron z generacją swojej migawki treści – wpis
+z innej generacji nigdy nie zostanie zwrócony. Starsze generacje są
+usuwane przy zapisie nowej strony, więc plik nie rośnie.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class SharedPageCache:
+    """Klucz-wartość w pliku SQLite współdzielonym przez procesy jednego hosta."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        # Osobne połączenie na wątek; po fork() proces potomny otwiera własne
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL;")
+        # Utrata wpisów po awarii zasilania nie szkodzi – strony zostaną wygenerowane ponownie
+        conn.execute("PRAGMA synchronous = OFF;")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT NOT NULL,
+                generation INTEGER NOT NULL,
+                etag TEXT NOT NULL,
+                body BLOB NOT NULL,
+                PRIMARY KEY (key, generation)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str, generation: int):
+        """Zwraca krotkę (body, etag) zapisaną dla danej generacji lub None."""
+        try:
+            return self._connect().execute(
+                "SELECT body, etag FROM pages WHERE key = ? AND generation = ?", (key, generation)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+
+    def set(self, key: str, generation: int, body: bytes, etag: str):
+        """Zapisuje stronę i usuwa wpisy tego klucza ze starszych generacji."""
+        conn = None
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (key, generation, etag, body) VALUES (?, ?, ?, ?)",
+                (key, generation, etag, body),
+            )
+            conn.execute("DELETE FROM pages WHERE key = ? AND generation < ?", (key, generation))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            # Pamięć podręczna jest tylko optymalizacją – błąd zapisu nie może zepsuć odpowiedzi
+            if conn is not None and conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+    def clear(self):
+        self._connect().execute("DELETE FROM pages")
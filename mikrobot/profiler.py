@@ -0,0 +1,222 @@
+"""
+Próbkujący profiler żądań: pojedyncze żądania na życzenie administratora
+oraz stałe próbkowanie z niską częstotliwością.
+
+Profiler nie instrumentuje kodu – osobny wątek co kilka milisekund odczytuje
+stos wątku obsługującego żądanie (sys._current_frames()) i zlicza
+powtarzające się stosy. Wynik zapisywany jest w formacie „collapsed stacks”
+(jedna linia na stos: ramki od korzenia rozdzielone średnikami i liczba
+próbek), który rozumieją m.in. flamegraph.pl i speedscope.
+
+- RequestProfile – profil jednego żądania (zob. parametr ?_profile=1 w app.py),
+  zapisywany w katalogu profili i dostępny w panelu administracyjnym.
+- RouteSampler – próbkowanie wszystkich trwających żądań, domyślnie 10 razy
+  na sekundę; stosy sumowane są osobno dla każdej ścieżki (endpointu Flask).
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+# Odstęp próbek profilu pojedynczego żądania i maksymalny czas profilowania
+PROFILE_INTERVAL = 0.002
+PROFILE_MAX_SECONDS = 60
+# Liczba przechowywanych profili i różnych stosów na ścieżkę w próbkowaniu stałym
+KEEP_PROFILES = 50
+MAX_ROUTE_STACKS = 1000
+OTHER_STACKS = "[pozostałe]"
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame) -> str:
+    """Zwraca stos ramki w postaci „korzeń;…;ramka” (średniki w nazwach są zastępowane)."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame).replace(";", ","))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class RequestProfile:
+    """Próbkuje stos jednego wątku, od start() do stop()."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        deadline = self.started + PROFILE_MAX_SECONDS
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.stacks[collapse(frame)] += 1
+            self.samples += 1
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.monotonic() - self.started
+        return self.stacks
+
+
+class RouteSampler:
+    """Stałe próbkowanie trwających żądań z sumowaniem stosów według ścieżki.
+
+    Wątek obsługujący żądanie rejestruje się przez enter(route) i wyrejestrowuje
+    przez leave(); próbkowane są tylko zarejestrowane wątki. Wątek próbkujący
+    uruchamiany jest leniwie przy pierwszym żądaniu (także po fork()).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.active = {}
+        self.routes = {}
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Po fork() wątek rodzica nie istnieje, a zebrane stosy należą do rodzica
+            self.active, self.routes, self.samples = {}, {}, 0
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="route-sampler", daemon=True).start()
+
+    def enter(self, route: str):
+        if not self.interval:
+            return
+        self._ensure_started()
+        self.active[threading.get_ident()] = route
+
+    def leave(self, thread_id=None):
+        self.active.pop(thread_id or threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, route in list(self.active.items()):
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    stacks = self.routes.setdefault(route, Counter())
+                    stack = collapse(frame)
+                    if stack not in stacks and len(stacks) >= MAX_ROUTE_STACKS:
+                        stack = OTHER_STACKS
+                    stacks[stack] += 1
+                    self.samples += 1
+
+    def snapshot(self) -> dict:
+        """Zwraca kopię zebranych stosów: {ścieżka: Counter}."""
+        with self._lock:
+            return {route: Counter(stacks) for route, stacks in self.routes.items()}
+
+    def reset(self):
+        with self._lock:
+            self.routes, self.samples = {}, 0
+
+
+def format_collapsed(stacks: Counter, prefix: str = "") -> str:
+    return "".join(f"{prefix}{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def profile_name(endpoint: str) -> str:
+    """Nazwa pliku profilu; sortowanie nazw odpowiada kolejności zapisu."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000_000:09d}-{endpoint}.collapsed"
+
+
+def save_profile(directory, name: str, profile: RequestProfile, meta: str):
+    """Zapisuje profil w katalogu profili i usuwa najstarsze."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    header = f"# {meta}\n# {profile.duration * 1000:.1f} ms, próbek: {profile.samples}\n"
+    partial = directory / f".{name}.part"
+    partial.write_text(header + format_collapsed(profile.stacks), encoding="utf-8")
+    os.replace(partial, directory / name)
+    for old in list_profiles(directory)[KEEP_PROFILES:]:
+        (directory / old["name"]).unlink(missing_ok=True)
+
+
+def list_profiles(directory) -> list:
+    """Zapisane profile od najnowszego: nazwa, opis i liczba próbek."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob("*.collapsed"), reverse=True):
+        meta, summary = profile_header(path)
+        profiles.append({"name": path.name, "meta": meta, "summary": summary})
+    return profiles
+
+
+def profile_header(path) -> tuple:
+    """Zwraca dwie linie nagłówka profilu: żądanie i podsumowanie próbkowania."""
+    with open(path, encoding="utf-8") as fh:
+        return fh.readline()[2:].strip(), fh.readline()[2:].strip()
+
+
+def load_profile(path) -> Counter:
+    stacks = Counter()
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.startswith("#") or not line.strip():
+                continue
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            stacks[stack] += int(count)
+    return stacks
+
+
+def flame_rows(stacks: Counter, min_share: float = 0.005) -> list:
+    """Zamienia stosy na wiersze wykresu płomieniowego (od korzenia w dół).
+
+    Każdy wiersz to lista prostokątów {label, start, width, count}, gdzie start
+    i width są ułamkami wszystkich próbek; pomijane są ramki węższe niż min_share.
+    """
+    total = sum(stacks.values())
+    if not total:
+        return []
+    tree = {}
+    for stack, count in stacks.items():
+        node = tree
+        for label in stack.split(";"):
+            entry = node.setdefault(label, [0, {}])
+            entry[0] += count
+            node = entry[1]
+    rows = []
+
+    def walk(node, depth, start):
+        for label, (count, children) in sorted(node.items(), key=lambda item: -item[1][0]):
+            width = count / total
+            if width >= min_share:
+                if len(rows) <= depth:
+                    rows.append([])
+                rows[depth].append({"label": label, "start": start, "width": width, "count": count})
+                walk(children, depth + 1, start)
+            start += width
+
+    walk(tree, 0, 0.0)
+    return rows
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Publikuje niezmienną kopię bazy dla procesów obsługujących stronę publiczną.
+
+W trybie MIKROBOT_MODE=public procesy serwera nie otwierają bazy głównej,
+tylko jej opublikowaną kopię (`published/current.db`) w trybie
+`mode=ro&immutable=1` z PRAGMA query_only – SQLite nie zakłada wtedy żadnych
+blokad, więc zapisy w panelu nie mogą wstrzymać odczytów.
+
+Publikacja kopiuje bazę główną przez API kopii zapasowej SQLite (porcjami
+stron, bez blokowania zapisów), zapisuje ją pod nową nazwą i atomowo
+przestawia dowiązanie `current.db`. Procesy publiczne wykrywają zmianę
+dowiązania i przebudowują migawkę treści (zob. snapshot.py).
+
+Przykład:
+
+    python publish.py
+"""
+
+import fcntl
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from init_db import DB_PATH, migrate_db
+from snapshot import SnapshotStore
+
+PUBLISH_DIR = Path(os.environ.get("MIKROBOT_PUBLISH_DIR", DB_PATH.parent / "published"))
+CURRENT = "current.db"
+# Liczba stron kopiowanych w jednym kroku kopii zapasowej i liczba zachowanych kopii
+BACKUP_PAGES = 256
+KEEP_COPIES = 3
+
+
+def publish(source=DB_PATH, publish_dir=PUBLISH_DIR) -> Path:
+    """Tworzy nową opublikowaną kopię bazy i atomowo przestawia na nią current.db."""
+    publish_dir = Path(publish_dir)
+    publish_dir.mkdir(parents=True, exist_ok=True)
+    # Blokada pliku szereguje publikacje z kilku procesów panelu
+    with open(publish_dir / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        target = publish_dir / f"mikrobot-{time.time_ns()}.db"
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(target)
+        try:
+            # Procesy publiczne nie wykonują migracji, więc kopia musi mieć aktualny schemat
+            migrate_db(src)
+            src.backup(dst, pages=BACKUP_PAGES)
+            # Kopia tylko do odczytu nie może być w trybie WAL (immutable=1 nie czyta pliku -wal)
+            dst.execute("PRAGMA journal_mode = DELETE;")
+        finally:
+            dst.close()
+            src.close()
+        link = publish_dir / CURRENT
+        tmp_link = publish_dir / f".{CURRENT}.{os.getpid()}"
+        tmp_link.unlink(missing_ok=True)
+        tmp_link.symlink_to(target.name)
+        os.replace(tmp_link, link)
+        # Starsze kopie można usunąć – procesy, które je jeszcze czytają, mają otwarty deskryptor
+        copies = sorted(publish_dir.glob("mikrobot-*.db"))
+        for old in copies[:-KEEP_COPIES]:
+            old.unlink(missing_ok=True)
+    return target
+
+
+def connect_published(link):
+    """Otwiera opublikowaną kopię bazy tylko do odczytu, bez blokad."""
+    path = os.path.realpath(link)
+    conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = ON;")
+    return conn
+
+
+class PublishedSnapshotStore(SnapshotStore):
+    """Migawka treści budowana z opublikowanej kopii bazy.
+
+    Kopia nigdy się nie zmienia, więc zamiast PRAGMA data_version zmianę
+    wskazuje nowy cel dowiązania current.db.
+    """
+
+    def _connect(self):
+        conn = connect_published(self.database)
+        conn.isolation_level = None
+        return conn
+
+    def _read_data_version(self):
+        self._pid = os.getpid()
+        return os.path.realpath(self.database)
+
+
+if __name__ == "__main__":
+    started = time.monotonic()
+    path = publish()
+    print(f"Opublikowano {path} ({time.monotonic() - started:.2f} s)")
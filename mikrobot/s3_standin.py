@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Lokalny zamiennik serwera S3 do testowania magazynu S3Storage.
+
+Obsługuje to, czego używa aplikacja: PUT/GET/HEAD/DELETE obiektu, wysyłanie
+w częściach (CreateMultipartUpload, UploadPart, CompleteMultipartUpload,
+AbortMultipartUpload) i podpisane adresy GET. Każde żądanie musi mieć
+poprawny podpis AWS Signature V4 dla podanych kluczy. Obiekty zapisywane są
+w katalogu `--root` (<root>/<bucket>/<klucz>).
+
+Przykład:
+
+    python s3_standin.py --port 9000 --root /tmp/s3
+    MIKROBOT_STORAGE=s3 MIKROBOT_S3_ENDPOINT=http://127.0.0.1:9000 \\
+    MIKROBOT_S3_BUCKET=mikrobot MIKROBOT_S3_ACCESS_KEY=dev MIKROBOT_S3_SECRET_KEY=dev-secret \\
+    python app.py
+"""
+
+import argparse
+import hashlib
+import hmac
+import re
+import shutil
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from storage import S3Storage, content_type
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    root: Path
+    signer: S3Storage
+
+    def _fail(self, code: int, message: str):
+        body = f"<Error><Code>{code}</Code><Message>{message}</Message></Error>".encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _reply(self, code: int = 200, body: bytes = b"", headers=None):
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return bucket, key, query, body
+
+    def _verify(self, key: str, query: dict, body: bytes) -> bool:
+        """Sprawdza podpis z nagłówka Authorization albo z parametrów podpisanego adresu."""
+        if "X-Amz-Signature" in query:
+            when = datetime.strptime(query["X-Amz-Date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+            if (datetime.now(timezone.utc) - when).total_seconds() > int(query["X-Amz-Expires"]):
+                return False
+            unsigned = {k: v for k, v in query.items() if k != "X-Amz-Signature"}
+            expected = self.signer.signature(
+                self.command, key, unsigned, {"host": self.headers["Host"]}, "UNSIGNED-PAYLOAD", when
+            )
+            return hmac.compare_digest(expected, query["X-Amz-Signature"])
+        match = re.match(
+            r"AWS4-HMAC-SHA256 Credential=([^/]+)/[^,]+, SignedHeaders=([^,]+), Signature=(\w+)",
+            self.headers.get("Authorization", ""),
+        )
+        if not match or match.group(1) != self.signer.access_key:
+            return False
+        payload_hash = self.headers.get("x-amz-content-sha256", "")
+        if payload_hash != hashlib.sha256(body).hexdigest():
+            return False
+        when = datetime.strptime(self.headers["x-amz-date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        headers = {name: self.headers[name] for name in match.group(2).split(";")}
+        expected = self.signer.signature(self.command, key, query, headers, payload_hash, when)
+        return hmac.compare_digest(expected, match.group(3))
+
+    def _handle(self):
+        bucket, key, query, body = self._parse()
+        if bucket != self.signer.bucket or not key:
+            return self._fail(404, "NoSuchBucket")
+        if not self._verify(key, query, body):
+            return self._fail(403, "SignatureDoesNotMatch")
+        path = (self.root / bucket / key).resolve()
+        if self.root.resolve() not in path.parents:
+            return self._fail(400, "InvalidKey")
+        parts_dir = self.root / ".multipart"
+        if self.command == "POST" and "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            (parts_dir / upload_id).mkdir(parents=True)
+            xml = f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+            return self._reply(200, xml.encode(), {"Content-Type": "application/xml"})
+        if "uploadId" in query:
+            upload = parts_dir / Path(query["uploadId"]).name
+            if not upload.is_dir():
+                return self._fail(404, "NoSuchUpload")
+            if self.command == "PUT":
+                (upload / f"{int(query['partNumber']):05d}").write_bytes(body)
+                return self._reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+            if self.command == "POST":
+                numbers = [int(n) for n in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body)]
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "wb") as out:
+                    for number in numbers:
+                        out.write((upload / f"{number:05d}").read_bytes())
+                shutil.rmtree(upload)
+                return self._reply(200, b"<CompleteMultipartUploadResult/>", {"Content-Type": "application/xml"})
+            if self.command == "DELETE":
+                shutil.rmtree(upload)
+                return self._reply(204)
+        if self.command == "PUT":
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(body)
+            return self._reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if self.command == "DELETE":
+            path.unlink(missing_ok=True)
+            return self._reply(204)
+        if not path.is_file():
+            return self._fail(404, "NoSuchKey")
+        data = path.read_bytes()
+        self._reply(200, data, {"Content-Type": content_type(key), "ETag": f'"{hashlib.md5(data).hexdigest()}"'})
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _handle
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokalny zamiennik serwera S3 dla MIKROBOT.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--root", default="s3-data", help="katalog na obiekty")
+    parser.add_argument("--bucket", default="mikrobot")
+    parser.add_argument("--access-key", default="dev")
+    parser.add_argument("--secret-key", default="dev-secret")
+    parser.add_argument("--region", default="us-east-1")
+    args = parser.parse_args()
+    StandInHandler.root = Path(args.root)
+    StandInHandler.signer = S3Storage(
+        f"http://{args.host}:{args.port}", args.bucket, args.access_key, args.secret_key, args.region
+    )
+    print(f"Zamiennik S3 na http://{args.host}:{args.port}/{args.bucket}/ (katalog {args.root})")
+    ThreadingHTTPServer((args.host, args.port), StandInHandler).serve_forever()
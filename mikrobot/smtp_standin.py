@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Lokalny zamiennik serwera SMTP do testowania wysyłki poczty (mailqueue.py).
+
+Obsługuje polecenia, których używa smtplib przy zwykłej wysyłce bez
+szyfrowania i logowania: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP i QUIT.
+Każda przyjęta wiadomość zapisywana jest jako plik .eml w katalogu `--root`.
+Opcja --reject sprawia, że serwer odrzuca wiadomości błędem tymczasowym
+(451) – do sprawdzania ponowień.
+
+Przykład:
+
+    python smtp_standin.py --port 2525 --root /tmp/mail
+    MIKROBOT_SMTP_HOST=127.0.0.1 MIKROBOT_SMTP_PORT=2525 python app.py
+"""
+
+import argparse
+import socketserver
+import time
+from pathlib import Path
+
+
+class StandInHandler(socketserver.StreamRequestHandler):
+    root: Path
+    reject: bool
+
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 mikrobot-standin ESMTP")
+        sender, recipients = None, []
+        while line := self.rfile.readline():
+            command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                self.reply("250-mikrobot-standin")
+                self.reply("250 8BITMIME")
+            elif command == "HELO":
+                self.reply("250 mikrobot-standin")
+            elif command == "MAIL":
+                sender, recipients = argument, []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipients.append(argument)
+                self.reply("250 OK")
+            elif command == "DATA":
+                if not sender or not recipients:
+                    self.reply("503 Brak nadawcy lub odbiorcy")
+                    continue
+                self.reply("354 Zakończ kropką w osobnej linii")
+                lines = []
+                while (data := self.rfile.readline()) not in (b".\r\n", b".\n", b""):
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                if self.reject:
+                    self.reply("451 4.3.0 Tymczasowy błąd serwera")
+                else:
+                    self.root.mkdir(parents=True, exist_ok=True)
+                    (self.root / f"{time.time_ns()}.eml").write_bytes(b"".join(lines))
+                    self.reply("250 OK")
+                sender, recipients = None, []
+            elif command == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Do widzenia")
+                return
+            else:
+                self.reply("502 Nieobsługiwane polecenie")
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokalny zamiennik serwera SMTP.")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--root", default="/tmp/mikrobot-mail", help="katalog na odebrane wiadomości")
+    parser.add_argument("--reject", action="store_true", help="odrzucaj wiadomości błędem tymczasowym 451")
+    args = parser.parse_args()
+    StandInHandler.root = Path(args.root)
+    StandInHandler.reject = args.reject
+    with StandInServer(("127.0.0.1", args.port), StandInHandler) as server:
+        print(f"Zamiennik SMTP na 127.0.0.1:{args.port}, wiadomości w {args.root}")
+        server.serve_forever()
@@ -0,0 +1,323 @@
+"""
+Niezmienna migawka publicznych treści trzymana w pamięci procesu.
+
+Wszystkie treści wyświetlane na stronach publicznych (aktualności,
+osiągnięcia, publikacje, członkowie i zdjęcia) mieszczą się w pamięci z
+dużym zapasem, więc zamiast pytać SQLite przy każdym żądaniu każdy proces
+buduje ich kopię: rekordy ze __slots__, uporządkowane tak jak na stronach,
+z gotowymi indeksami po id i po dacie.
+
+Zmiany wykrywa PRAGMA data_version na osobnym połączeniu – wartość rośnie,
+gdy dowolne inne połączenie (także z innego procesu) zatwierdzi zapis.
+Zapisy poza treścią (formularz kontaktowy, kolejka poczty, dziennik
+konserwacji) też ją zwiększają, więc po zmianie data_version porównywane są
+jeszcze wersje tabel treści (table_versions) i generacja pamięci stron –
+migawka przebudowywana jest tylko wtedy, gdy któraś z nich się zmieniła.
+Nowa migawka budowana jest w tle, w jednej transakcji odczytu, i podmieniana
+jednym przypisaniem; do tego czasu żądania korzystają z poprzedniej.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from init_db import GALLERY_OWNERS
+
+
+class Record:
+    """Niezmienny rekord ze __slots__, dostępny także jak wiersz bazy (record['pole'])."""
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} jest tylko do odczytu")
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def keys(self):
+        return self.__slots__
+
+
+class MediaRecord(Record):
+    __slots__ = ("id", "owner_type", "owner_id", "filename", "thumb", "width", "height", "color", "placeholder",
+                 "title")
+
+
+class NewsRecord(Record):
+    __slots__ = ("id", "title", "content", "content_html", "excerpt", "word_count", "date_posted", "day",
+                 "cover_image", "image_list", "image_count", "images")
+
+
+class EntryRecord(Record):
+    """Osiągnięcie lub publikacja."""
+
+    __slots__ = ("id", "title", "description", "content_html", "excerpt", "word_count", "date", "day",
+                 "cover_image", "image_list", "image_count", "images")
+
+
+class MemberRecord(Record):
+    __slots__ = ("id", "name", "role", "description", "category", "photo")
+
+
+class Collection:
+    """Uporządkowana krotka rekordów z indeksem po id i po kluczu sortowania.
+
+    `order` to pola klucza sortowania (np. data i id), `descending` – kierunek,
+    w jakim rekordy są wyświetlane. Klucze przechowywane są rosnąco, co
+    pozwala wyszukiwać zakresy dat i strony kursora przez bisekcję.
+    """
+
+    __slots__ = ("items", "by_id", "order", "descending", "_keys")
+
+    def __init__(self, items, order, descending):
+        self.items = tuple(items)
+        self.by_id = {item.id: item for item in self.items}
+        self.order = order
+        self.descending = descending
+        keys = [tuple(item[field] for field in order) for item in self.items]
+        self._keys = keys[::-1] if descending else keys
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, item_id):
+        return self.by_id.get(item_id)
+
+    def page(self, after, limit: int):
+        """Zwraca do `limit` rekordów następujących po kluczu `after` (lub od początku)."""
+        if after is None:
+            return self.items[:limit]
+        after = tuple(after)
+        if self.descending:
+            start = len(self._keys) - bisect_left(self._keys, after)
+        else:
+            start = bisect_right(self._keys, after)
+        return self.items[start:start + limit]
+
+    def between(self, start, end):
+        """Rekordy, których pierwsze pole klucza (data) leży w przedziale [start, end)."""
+        lo = bisect_left(self._keys, (start,))
+        hi = bisect_left(self._keys, (end,))
+        if self.descending:
+            n = len(self._keys)
+            return self.items[n - hi:n - lo]
+        return self.items[lo:hi]
+
+
+def content_version(conn):
+    """Zwraca parę (wersje tabel treści, generacja pamięci stron) – zmienia się razem z treścią migawki."""
+    versions = {
+        name: (version, updated_at)
+        for name, version, updated_at in conn.execute("SELECT name, version, updated_at FROM table_versions")
+    }
+    (generation,) = conn.execute("SELECT generation FROM cache_generation").fetchone()
+    return versions, generation
+
+
+class Snapshot:
+    """Komplet publicznych treści z jednej chwili; po zbudowaniu nie jest modyfikowany."""
+
+    __slots__ = ("news", "achievements", "publications", "members", "gallery", "by_day", "months", "versions",
+                 "generation", "built_at")
+
+    def __init__(self, conn):
+        conn.execute("BEGIN")
+        try:
+            media = [MediaRecord(*row) for row in conn.execute(
+                f"""
+                SELECT m.id, m.owner_type, m.owner_id, m.filename, m.thumb, m.width, m.height,
+                       m.color, m.placeholder,
+                       CASE m.owner_type
+                           WHEN 'news' THEN (SELECT title FROM news WHERE id = m.owner_id)
+                           WHEN 'achievements' THEN (SELECT title FROM achievements WHERE id = m.owner_id)
+                           ELSE (SELECT title FROM publications WHERE id = m.owner_id)
+                       END
+                FROM media m INDEXED BY idx_media_gallery
+                WHERE m.owner_type IN {GALLERY_OWNERS!r}
+                ORDER BY m.owner_type, m.owner_id, m.position, m.id
+                """
+            )]
+            images = {}
+            for item in media:
+                images.setdefault((item.owner_type, item.owner_id), []).append(item)
+            self.news = Collection(
+                (NewsRecord(*row, tuple(images.get(("news", row[0]), ()))) for row in conn.execute(
+                    """
+                    SELECT id, title, content, content_html, excerpt, word_count, date_posted, day,
+                           cover_image, image_list, image_count
+                    FROM news ORDER BY date_posted DESC, id DESC
+                    """
+                )),
+                ("date_posted", "id"), descending=True,
+            )
+            self.achievements, self.publications = (
+                Collection(
+                    (EntryRecord(*row, tuple(images.get((table, row[0]), ()))) for row in conn.execute(
+                        f"""
+                        SELECT id, title, description, content_html, excerpt, word_count, date, day,
+                               cover_image, image_list, image_count
+                        FROM {table} ORDER BY date DESC, id DESC
+                        """
+                    )),
+                    ("date", "id"), descending=True,
+                )
+                for table in ("achievements", "publications")
+            )
+            self.members = Collection(
+                (MemberRecord(*row) for row in conn.execute(
+                    "SELECT id, name, role, description, category, photo FROM members ORDER BY id"
+                )),
+                ("id",), descending=False,
+            )
+            # Wpisy z rozpoznaną datą w kolejności numeru dnia (indeks idx_<tabela>_day);
+            # widoki archiwum wybierają z nich zakres dni przez bisekcję (Collection.between)
+            self.by_day = {
+                table: Collection(
+                    (collection.by_id[row_id] for (row_id,) in conn.execute(
+                        f"SELECT id FROM {table} INDEXED BY idx_{table}_day WHERE day IS NOT NULL "
+                        "ORDER BY day DESC, id DESC"
+                    )),
+                    ("day", "id"), descending=True,
+                )
+                for table, collection in (
+                    ("news", self.news), ("achievements", self.achievements), ("publications", self.publications),
+                )
+            }
+            # Liczby wpisów w miesiącach, utrzymywane przez wyzwalacze: {tabela: ((rok, miesiąc, liczba), ...)}
+            months = {}
+            for kind, year, month, count in conn.execute(
+                "SELECT kind, year, month, count FROM archive_months ORDER BY kind, year DESC, month DESC"
+            ):
+                months.setdefault(kind, []).append((year, month, count))
+            self.months = {kind: tuple(rows) for kind, rows in months.items()}
+            self.gallery = Collection(sorted(media, key=lambda item: item.id, reverse=True), ("id",), descending=True)
+            # Generacja treści dla wspólnej pamięci stron (zob. pagecache.py)
+            self.versions, self.generation = content_version(conn)
+        finally:
+            conn.execute("COMMIT")
+        self.built_at = time.time()
+
+    def version(self, table: str):
+        """Zwraca krotkę (wersja, czas ostatniej zmiany) tabeli z chwili budowy migawki."""
+        return self.versions.get(table, (0, None))
+
+
+class SnapshotStore:
+    """Przechowuje bieżącą migawkę i przebudowuje ją po wykryciu zmian w bazie.
+
+    data_version sprawdzane jest najwyżej raz na `check_interval` sekund.
+    Pierwsza migawka budowana jest synchronicznie, kolejne w wątku w tle.
+    refresh() przebudowuje migawkę od razu – panel administracyjny wywołuje
+    ją po zapisie, aby administrator widział swoje zmiany w następnym żądaniu.
+    """
+
+    def __init__(self, database, check_interval: float = 0.5):
+        self.database = database
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._data_version = None
+        self._checked_at = 0.0
+        self._watch = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        # Numer ostatnio rozpoczętej i ostatnio zainstalowanej budowy – starsza
+        # budowa kończąca się później nie nadpisze nowszej migawki
+        self._started = 0
+        self._installed = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON;")
+        return conn
+
+    def _read_data_version(self):
+        # Po fork() połączenie rodzica nie może być używane w procesie potomnym
+        if self._pid != os.getpid():
+            self._watch = self._connect()
+            self._pid = os.getpid()
+        return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def _build(self):
+        with self._lock:
+            data_version = self._read_data_version()
+            self._started += 1
+            number = self._started
+        conn = self._connect()
+        try:
+            snapshot = Snapshot(conn)
+        finally:
+            conn.close()
+        with self._lock:
+            if number > self._installed:
+                self._snapshot = snapshot
+                self._data_version = data_version
+                self._installed = number
+            return self._snapshot
+
+    def _rebuild_in_background(self):
+        try:
+            self._build()
+        finally:
+            self._rebuilding = False
+
+    def _adopt_inherited(self, snapshot):
+        """Po fork() używa migawki procesu nadrzędnego, jeśli treść w bazie od tej pory się nie zmieniła.
+
+        Procesy robocze uruchomione z wczytanej wcześniej aplikacji (zob.
+        gunicorn.conf.py) dzielą wtedy strony pamięci migawki z procesem
+        nadrzędnym, zamiast od razu budować własną kopię.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._snapshot
+            data_version = self._read_data_version()
+            if self._unchanged(snapshot):
+                self._data_version = data_version
+                self._checked_at = time.monotonic()
+                return snapshot
+        return self.refresh()
+
+    def _unchanged(self, snapshot) -> bool:
+        """Czy treść w bazie jest ta sama co w migawce (wywoływane pod blokadą, po _read_data_version)."""
+        # Odczyt w jednej transakcji – wersje i generacja z tej samej chwili
+        self._watch.execute("BEGIN")
+        try:
+            return content_version(self._watch) == (snapshot.versions, snapshot.generation)
+        finally:
+            self._watch.execute("COMMIT")
+
+    def get(self) -> Snapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.refresh()
+        if self._pid != os.getpid():
+            return self._adopt_inherited(snapshot)
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval or self._rebuilding:
+            return snapshot
+        with self._lock:
+            self._checked_at = now
+            data_version = self._read_data_version()
+            if data_version == self._data_version or self._rebuilding:
+                return snapshot
+            if self._unchanged(snapshot):
+                # Zapis poza treścią – migawka jest aktualna dla nowego data_version
+                self._data_version = data_version
+                return snapshot
+            self._rebuilding = True
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+        return snapshot
+
+    def refresh(self) -> Snapshot:
+        return self._build()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Czas uruchamiania procesu serwera: raport etapów i pomiar procesów roboczych.
+
+Raport (`report`) uruchamia --runs razy świeży interpreter, który kolejno
+importuje Flask, Jinja i Werkzeug, importuje aplikację (moduły serwisu,
+migracja schematu, rejestracja tras), kompiluje szablony i mapę adresów,
+buduje migawkę treści (warm_up() w app.py) oraz obsługuje dwa pierwsze
+żądania. Dla każdego etapu wypisywana jest mediana czasu i pamięć procesu
+po nim, a także moduły serwisu najdłużej importowane przez app.py
+(z `python -X importtime`).
+
+Pomiar (`bench`) uruchamia --workers procesów serwera HTTP w trzech trybach:
+
+- cold – każdy proces sam importuje i przygotowuje aplikację,
+- preload – proces nadrzędny wczytuje aplikację, wywołuje warm_up()
+  i tworzy procesy robocze przez fork() (jak gunicorn z preload_app),
+- preload+freeze – jak preload, z gc.freeze() przed fork() (gunicorn.conf.py).
+
+Dla każdego procesu mierzony jest czas od uruchomienia (fork) do pierwszej
+odpowiedzi oraz – po --requests żądaniach do stron publicznych – pamięć:
+RSS, PSS (strony wspólne podzielone między procesy) i USS (strony tylko
+tego procesu). Wspólna pamięć stron i konserwacja są wyłączone, aby każdy
+proces renderował strony sam i nie zapisywał do bazy.
+
+    python startup.py report
+    python startup.py bench --workers 4 --json
+"""
+
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+# Strony odczytywane przez procesy robocze przed pomiarem pamięci
+WARM_PATHS = ("/", "/news", "/achievements", "/members", "/gallery", "/api/v1/news")
+BENCH_MODES = ("cold", "preload", "preload+freeze")
+# Etapy raportu w kolejności wykonania
+PHASE_NAMES = {
+    "interpreter": "start interpretera",
+    "dependencies": "import Flask/Jinja/Werkzeug",
+    "app": "import aplikacji",
+    "templates": "kompilacja szablonów",
+    "routing": "mapa adresów",
+    "database": "migawka treści",
+    "first_request": "pierwsze żądanie",
+    "next_request": "drugie żądanie",
+}
+WORKER_ENV = {"MIKROBOT_MAINTENANCE": "0"}
+
+
+def memory(pid="self") -> dict:
+    """Pamięć procesu w kB z /proc/<pid>/smaps_rollup: rss, pss i uss (strony prywatne)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def measure_phases(spawned_at: float):
+    """Wykonywane w świeżym interpreterze: wypisuje JSON z czasami etapów (s) i RSS po każdym (kB)."""
+    phases = {"interpreter": (time.time() - spawned_at, memory()["rss"])}
+
+    def phase(name, started):
+        phases[name] = (time.perf_counter() - started, memory()["rss"])
+
+    started = time.perf_counter()
+    import flask  # noqa: F401
+    import jinja2  # noqa: F401
+    import werkzeug  # noqa: F401
+    phase("dependencies", started)
+
+    started = time.perf_counter()
+    import app as site
+    phase("app", started)
+
+    timings = site.warm_up()
+    rss = memory()["rss"]
+    for name, seconds in timings.items():
+        phases[name] = (seconds, rss)
+
+    site.app.config["SHARED_PAGE_CACHE"] = False
+    client = site.app.test_client()
+    for name in ("first_request", "next_request"):
+        started = time.perf_counter()
+        client.get("/").close()
+        phase(name, started)
+    print(json.dumps(phases))
+
+
+def import_breakdown(limit: int = 8) -> list:
+    """Moduły importowane bezpośrednio przez app.py, od najdłużej importowanych: [(moduł, ms)]."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import flask, jinja2, werkzeug; import app"],
+        cwd=BASE_DIR, env=os.environ | WORKER_ENV, capture_output=True, text=True, check=True,
+    )
+    children, found = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[13:]:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == "app":
+                found = children
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), int(cumulative) / 1000))
+    return sorted(found, key=lambda item: item[1], reverse=True)[:limit]
+
+
+def report(runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        spawned_at = time.time()
+        result = subprocess.run(
+            [sys.executable, "-c", f"import startup; startup.measure_phases({spawned_at!r})"],
+            cwd=BASE_DIR, env=os.environ | WORKER_ENV, capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    phases = {
+        name: {
+            "ms": statistics.median(sample[name][0] for sample in samples) * 1000,
+            "rss_kb": statistics.median(sample[name][1] for sample in samples),
+        }
+        for name in PHASE_NAMES
+    }
+    return {"runs": runs, "phases": phases, "imports": import_breakdown()}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(site, port: int):
+    """Obsługuje żądania aplikacji na porcie (serwer wielowątkowy Werkzeug) do zakończenia procesu."""
+    from werkzeug.serving import make_server
+
+    site.app.config["SHARED_PAGE_CACHE"] = False
+    make_server("127.0.0.1", port, site.app, threaded=True).serve_forever()
+
+
+def cold_worker(port: int):
+    """Proces roboczy trybu cold: przygotowuje aplikację sam, jak nowy proces bez wczytania przed fork()."""
+    import app as site
+
+    serve(site, port)
+
+
+def preload_master(freeze: bool):
+    """Proces nadrzędny trybów preload: wczytuje aplikację i tworzy proces roboczy przez fork() na żądanie.
+
+    Każda linia na wejściu to numer portu nowego procesu; w odpowiedzi
+    wypisywana jest linia JSON {"pid", "forked_at"}.
+    """
+    if freeze:
+        # Zalecenie z dokumentacji gc: bez zbierania przed fork(), gc.freeze() tuż przed nim
+        gc.disable()
+    import app as site
+
+    site.warm_up()
+    if freeze:
+        gc.freeze()
+    for line in sys.stdin:
+        forked_at = time.time()
+        pid = os.fork()
+        if pid == 0:
+            if freeze:
+                gc.enable()
+            try:
+                serve(site, int(line))
+            finally:
+                os._exit(0)
+        print(json.dumps({"pid": pid, "forked_at": forked_at}), flush=True)
+
+
+def wait_for_response(port: int, timeout: float = 30) -> float:
+    """Odpytuje proces, aż odpowie na GET /; zwraca chwilę (time.time()) pierwszej odpowiedzi."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=timeout) as response:
+                response.read()
+            return time.time()
+        except (ConnectionError, urllib.error.URLError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.005)
+
+
+def run_mode(mode: str, workers: int, requests: int) -> list:
+    """Uruchamia kolejno procesy robocze w danym trybie; zwraca pomiary każdego procesu.
+
+    Każdy proces startuje dopiero po pierwszej odpowiedzi poprzedniego – tak
+    jak proces dodawany pod obciążeniem, który nie konkuruje z innymi o procesor.
+    """
+    env = os.environ | WORKER_ENV
+    master = None
+    if mode != "cold":
+        master = subprocess.Popen(
+            [sys.executable, "-c", f"import startup; startup.preload_master({mode == 'preload+freeze'})"],
+            cwd=BASE_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    processes, results = [], []
+    try:
+        for _ in range(workers):
+            port = free_port()
+            if master is None:
+                began = time.time()
+                process = subprocess.Popen(
+                    [sys.executable, "-c", f"import startup; startup.cold_worker({port})"],
+                    cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                processes.append(process)
+                pid = process.pid
+            else:
+                master.stdin.write(f"{port}\n")
+                master.stdin.flush()
+                forked = json.loads(master.stdout.readline())
+                began, pid = forked["forked_at"], forked["pid"]
+            first = wait_for_response(port) - began
+            results.append({"pid": pid, "port": port, "first_response_ms": first * 1000})
+        for worker in results:
+            for index in range(requests):
+                path = WARM_PATHS[index % len(WARM_PATHS)]
+                with urllib.request.urlopen(f"http://127.0.0.1:{worker['port']}{path}") as response:
+                    response.read()
+        # Pamięć mierzona, gdy działają wszystkie procesy – PSS zależy od liczby procesów dzielących strony
+        for worker in results:
+            worker.update(memory(worker["pid"]))
+    finally:
+        for worker in results:
+            try:
+                os.kill(worker["pid"], signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for process in processes:
+            process.wait()
+        if master is not None:
+            master.stdin.close()
+            master.wait()
+    return results
+
+
+def bench(workers: int, requests: int) -> dict:
+    return {mode: run_mode(mode, workers, requests) for mode in BENCH_MODES}
+
+
+def print_report(data: dict):
+    print(f"Uruchomienie procesu (mediana z {data['runs']}):")
+    print(f"{'etap':<30}{'ms':>9}{'RSS po':>12}")
+    total = 0
+    for name, label in PHASE_NAMES.items():
+        phase = data["phases"][name]
+        if name != "next_request":
+            total += phase["ms"]
+        print(f"{label:<30}{phase['ms']:>9.1f}{phase['rss_kb'] / 1024:>9.1f} MB")
+    print(f"{'razem do pierwszej odpowiedzi':<30}{total:>9.1f}")
+    print("Najdłużej importowane moduły app.py:")
+    for name, ms in data["imports"]:
+        print(f"  {name:<28}{ms:>9.1f}")
+
+
+def print_bench(data: dict):
+    print(f"{'tryb':<16}{'1. odp. med':>12}{'maks.':>9}{'RSS':>10}{'PSS':>10}{'USS':>10}")
+    for mode, workers in data.items():
+        times = [worker["first_response_ms"] for worker in workers]
+        mean = {key: statistics.mean(worker[key] for worker in workers) / 1024 for key in ("rss", "pss", "uss")}
+        print(
+            f"{mode:<16}{statistics.median(times):>9.1f} ms{max(times):>6.1f} ms"
+            f"{mean['rss']:>7.1f} MB{mean['pss']:>7.1f} MB{mean['uss']:>7.1f} MB"
+        )
+    print("Pamięć – średnia na proces roboczy; PSS dzieli strony wspólne między procesy, USS to strony tylko procesu.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Czas uruchamiania i pamięć procesów serwera MIKROBOT.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_cmd = commands.add_parser("report", help="czas i pamięć kolejnych etapów uruchomienia procesu")
+    report_cmd.add_argument("--runs", type=int, default=5, help="liczba uruchomień (wynik to mediana)")
+    report_cmd.add_argument("--json", action="store_true", help="wypisz wyniki jako JSON")
+    bench_cmd = commands.add_parser("bench", help="czas do pierwszej odpowiedzi i pamięć procesów roboczych")
+    bench_cmd.add_argument("--workers", type=int, default=4, help="procesów roboczych w każdym trybie")
+    bench_cmd.add_argument("--requests", type=int, default=30, help="żądań do każdego procesu przed pomiarem pamięci")
+    bench_cmd.add_argument("--json", action="store_true", help="wypisz wyniki jako JSON")
+    args = parser.parse_args()
+    if args.command == "report":
+        data = report(args.runs)
+        printer = print_report
+    else:
+        data = bench(args.workers, args.requests)
+        printer = print_bench
+    if args.json:
+        print(json.dumps(data, ensure_ascii=False, indent=2))
+    else:
+        printer(data)
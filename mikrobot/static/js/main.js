@@ -10,9 +10,24 @@ document.addEventListener('DOMContentLoaded', function() {
     });
   }
 
+  // Zdjęcia z tłem zastępczym (kolor dominujący i rozmyta miniaturka, zob.
+  // image_attrs w app.py): po wczytaniu zdjęcia tło jest usuwane, aby nie
+  // prześwitywało w pustych pasach wokół zdjęć skalowanych z object-fit: contain.
+  document.querySelectorAll('img[data-placeholder]').forEach(function(img) {
+    function clearPlaceholder() {
+      img.style.backgroundImage = 'none';
+      img.style.backgroundColor = 'transparent';
+    }
+    if (img.complete) {
+      clearPlaceholder();
+    } else {
+      img.addEventListener('load', clearPlaceholder, { once: true });
+    }
+  });
+
   // Prosty pokaz slajdów dla kart osiągnięć i publikacji. Każdy element
   // posiada klasę .slideshow-img oraz atrybut data-images zawierający
-  // nazwy plików oddzielone przecinkami. Skrypt zmienia atrybut src co 5
+  // adresy zdjęć oddzielone przecinkami (z magazynu zdjęć, zob. media_urls). Skrypt zmienia atrybut src co 5
   // sekund, jeśli w danej karcie znajduje się więcej niż jeden obraz.
   const slides = document.querySelectorAll('.slideshow-img');
   slides.forEach(function(img) {
@@ -27,10 +42,113 @@ document.addEventListener('DOMContentLoaded', function() {
         // Po krótkim czasie (0.5 s) zmień obraz na następny i usuń efekt zanikania
         setTimeout(function() {
           index = (index + 1) % files.length;
-          img.src = '/static/' + files[index];
+          img.src = files[index];
           img.classList.remove('fade-out');
         }, 500);
       }, 5000);
     }
   });
-});
\ No newline at end of file
+
+  // Galeria: kolejne strony zdjęć są pobierane jako JSON, gdy użytkownik
+  // przewinie stronę do końca listy. Adres następnej strony przechowuje
+  // atrybut data-next; po ostatniej stronie odnośnik „Pokaż starsze” znika.
+  const gallery = document.getElementById('gallery');
+  const sentinel = document.querySelector('.gallery-sentinel');
+  if (gallery && sentinel && 'IntersectionObserver' in window) {
+    let loading = false;
+    const observer = new IntersectionObserver(function(entries) {
+      if (!entries[0].isIntersecting || loading) return;
+      const next = gallery.getAttribute('data-next');
+      if (!next) return;
+      loading = true;
+      fetch(next)
+        .then(function(response) { return response.json(); })
+        .then(function(page) {
+          page.items.forEach(function(item) {
+            const link = document.createElement('a');
+            link.className = 'gallery-item';
+            link.href = item.link;
+            link.title = item.title || '';
+            const img = document.createElement('img');
+            img.src = item.thumb;
+            img.alt = item.title || 'Zdjęcie';
+            img.loading = 'lazy';
+            if (item.width && item.height) {
+              img.width = item.width;
+              img.height = item.height;
+            }
+            if (item.color) {
+              img.style.backgroundColor = item.color;
+            }
+            link.appendChild(img);
+            gallery.appendChild(link);
+          });
+          if (page.next) {
+            gallery.setAttribute('data-next', page.next);
+          } else {
+            gallery.removeAttribute('data-next');
+            observer.disconnect();
+            sentinel.remove();
+          }
+        })
+        .finally(function() { loading = false; });
+    });
+    observer.observe(sentinel);
+  }
+
+  // Listy w panelu administracyjnym (admin_table.html): filtry, sortowanie
+  // i stronicowanie pobierają z serwera samą tabelę (nagłówek X-Fragment)
+  // i podmieniają ją w miejscu; adres w pasku przeglądarki jest aktualizowany,
+  // więc odświeżenie strony pokazuje ten sam widok.
+  const filters = document.querySelector('form[data-fragment-form]');
+  if (filters && window.fetch) {
+    let pending = null;
+    function loadTable(url) {
+      if (pending) pending.abort();
+      pending = new AbortController();
+      fetch(url, { headers: { 'X-Fragment': '1' }, signal: pending.signal })
+        .then(function(response) {
+          if (!response.ok) throw new Error(response.status);
+          return response.text();
+        })
+        .then(function(html) {
+          const table = document.getElementById(filters.getAttribute('data-fragment-form'));
+          table.outerHTML = html;
+          history.replaceState(null, '', url);
+          // Ukryte pola formularza przechowują bieżące sortowanie
+          const params = new URL(url, location.href).searchParams;
+          ['sort', 'dir'].forEach(function(name) {
+            if (params.get(name)) filters.elements[name].value = params.get(name);
+          });
+        })
+        .catch(function(error) {
+          if (error.name !== 'AbortError') location.href = url;
+        });
+    }
+    function submitFilters() {
+      const params = new URLSearchParams(new FormData(filters));
+      Array.from(params.keys()).forEach(function(name) {
+        if (!params.get(name)) params.delete(name);
+      });
+      loadTable(location.pathname + '?' + params.toString());
+    }
+    filters.addEventListener('submit', function(event) {
+      event.preventDefault();
+      submitFilters();
+    });
+    filters.querySelectorAll('select').forEach(function(select) {
+      select.addEventListener('change', submitFilters);
+    });
+    let typing = null;
+    filters.elements.q.addEventListener('input', function() {
+      clearTimeout(typing);
+      typing = setTimeout(submitFilters, 300);
+    });
+    document.addEventListener('click', function(event) {
+      const link = event.target.closest('a[data-fragment-link]');
+      if (!link || event.ctrlKey || event.metaKey || event.shiftKey) return;
+      event.preventDefault();
+      loadTable(link.href);
+    });
+  }
+});
@@ -0,0 +1,280 @@
+"""
+Magazyn przesłanych plików: lokalny katalog albo zgodny z S3 serwer obiektów.
+
+Oba magazyny mają ten sam interfejs – put, get, delete, url i stat – i
+posługują się kluczami takimi jak ścieżki zapisywane w bazie
+("uploads/news_...png"). Magazyn lokalny trzyma pliki w katalogu static,
+tak jak dotąd. Magazyn S3 wysyła pliki na serwer obiektów (podpis AWS
+Signature V4, duże pliki w częściach wysyłanych równolegle), a strony
+wskazują je bezpośrednio (adres publiczny albo podpisany), więc serwer
+aplikacji nie pośredniczy w pobieraniu zdjęć.
+
+Wybór magazynu: zmienna MIKROBOT_STORAGE=local (domyślnie) lub s3, zob.
+storage_from_env(). Do testów służy lokalny zamiennik serwera S3
+(s3_standin.py).
+"""
+
+import hashlib
+import hmac
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+# Pliki większe niż próg wysyłane są w częściach tej wielkości (S3 wymaga co najmniej 5 MiB)
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNK = 8 * 1024 * 1024
+UPLOAD_WORKERS = 4
+# Najdłuższa ważność podpisanego adresu dopuszczana przez S3 (7 dni)
+MAX_PRESIGN_EXPIRES = 7 * 24 * 3600
+
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg", "gif": "image/gif"}
+
+
+def content_type(key: str) -> str:
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1].lower(), "application/octet-stream")
+
+
+class LocalStorage:
+    """Pliki w lokalnym katalogu (domyślnie static), serwowane przez /static."""
+
+    is_local = True
+
+    def __init__(self, root, base_url: str = "/static"):
+        self.root = Path(root)
+        self.base_url = base_url
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Klucz poza katalogiem magazynu: {key}")
+        return path
+
+    def put(self, key: str, source):
+        """Zapisuje plik `source` pod kluczem `key` (atomowo; ten sam plik jest pomijany)."""
+        target = self.path(key)
+        if Path(source).resolve() == target:
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + ".part")
+        shutil.copyfile(source, partial)
+        os.replace(partial, target)
+
+    def get(self, key: str) -> bytes:
+        return self.path(key).read_bytes()
+
+    def delete(self, key: str):
+        self.path(key).unlink(missing_ok=True)
+
+    def stat(self, key: str):
+        """Zwraca słownik z rozmiarem pliku lub None, jeśli plik nie istnieje."""
+        try:
+            return {"size": self.path(key).stat().st_size}
+        except FileNotFoundError:
+            return None
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{quote(key)}"
+
+    def cache_tag(self) -> str:
+        return ""
+
+
+class S3Storage:
+    """Serwer obiektów zgodny z S3 (adresowanie ścieżką: <endpoint>/<bucket>/<klucz>).
+
+    `prefix` – przedrostek kluczy obiektów (osobna przestrzeń nazw każdego
+    dzierżawcy, zob. tenants.py); `public_url` – adres, pod którym obiekty są
+    dostępne publicznie (np. CDN);
+    `presign_expires` – zamiast adresów publicznych generuj podpisane adresy
+    ważne tyle sekund (S3 dopuszcza najwyżej 7 dni). Czas podpisu zaokrąglany
+    jest w dół do połowy tego okresu, więc adres obiektu nie zmienia się przez
+    pół okresu i pozostaje ważny jeszcze co najmniej przez drugie pół – strony
+    z takimi adresami mogą być przechowywane w pamięci podręcznej (zob. cache_tag()).
+    """
+
+    is_local = False
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", public_url=None, presign_expires=None, prefix: str = ""):
+        self.endpoint = endpoint.rstrip("/")
+        self.host = urlsplit(self.endpoint).netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.presign_expires = presign_expires
+        self.prefix = prefix
+
+    # --- podpis AWS Signature V4 ---
+
+    def _canonical_uri(self, key: str) -> str:
+        return "/" + quote(self.bucket, safe="") + ("/" + quote(self.prefix + key, safe="/~") if key else "")
+
+    @staticmethod
+    def _canonical_query(query: dict) -> str:
+        return "&".join(
+            f"{quote(str(k), safe='~')}={quote(str(v), safe='~')}" for k, v in sorted(query.items())
+        )
+
+    def _signing_key(self, day: str) -> bytes:
+        key = ("AWS4" + self.secret_key).encode()
+        for part in (day, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        return key
+
+    def signature(self, method: str, key: str, query: dict, headers: dict, payload_hash: str, when: datetime) -> str:
+        """Zwraca podpis żądania; `headers` to nagłówki objęte podpisem (małymi literami)."""
+        signed = ";".join(sorted(headers))
+        canonical = "\n".join([
+            method,
+            self._canonical_uri(key),
+            self._canonical_query(query),
+            "".join(f"{name}:{str(headers[name]).strip()}\n" for name in sorted(headers)),
+            signed,
+            payload_hash,
+        ])
+        day = when.strftime("%Y%m%d")
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256",
+            when.strftime("%Y%m%dT%H%M%SZ"),
+            f"{day}/{self.region}/s3/aws4_request",
+            hashlib.sha256(canonical.encode()).hexdigest(),
+        ])
+        return hmac.new(self._signing_key(day), string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    def _request(self, method: str, key: str, query=None, body: bytes = b"", headers=None):
+        query = query or {}
+        when = datetime.now(timezone.utc)
+        payload_hash = hashlib.sha256(body).hexdigest()
+        signed = {
+            "host": self.host,
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": when.strftime("%Y%m%dT%H%M%SZ"),
+            **{name.lower(): value for name, value in (headers or {}).items()},
+        }
+        signature = self.signature(method, key, query, signed, payload_hash, when)
+        signed["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{when:%Y%m%d}/{self.region}/s3/aws4_request, "
+            f"SignedHeaders={';'.join(sorted(name for name in signed if name != 'authorization'))}, "
+            f"Signature={signature}"
+        )
+        url = self.endpoint + self._canonical_uri(key)
+        if query:
+            url += "?" + self._canonical_query(query)
+        # Klient HTTP wczytywany przy pierwszym użyciu magazynu S3 – nie wydłuża uruchamiania serwera
+        import urllib.request
+
+        request = urllib.request.Request(url, data=body if method in ("PUT", "POST") else None, method=method)
+        for name, value in signed.items():
+            if name != "host":
+                request.add_header(name, value)
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.headers, response.read()
+
+    # --- interfejs magazynu ---
+
+    def put(self, key: str, source):
+        """Wysyła plik; duże pliki w częściach wysyłanych równolegle (multipart upload)."""
+        size = os.path.getsize(source)
+        if size <= MULTIPART_THRESHOLD:
+            with open(source, "rb") as fh:
+                self._request("PUT", key, body=fh.read(), headers={"content-type": content_type(key)})
+            return
+        _, body = self._request("POST", key, {"uploads": ""}, headers={"content-type": content_type(key)})
+        upload_id = re.search(rb"<UploadId>(.+?)</UploadId>", body).group(1).decode()
+
+        def send_part(number: int):
+            with open(source, "rb") as fh:
+                fh.seek((number - 1) * MULTIPART_CHUNK)
+                chunk = fh.read(MULTIPART_CHUNK)
+            headers, _ = self._request("PUT", key, {"partNumber": number, "uploadId": upload_id}, body=chunk)
+            return number, headers["ETag"]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        parts_count = (size + MULTIPART_CHUNK - 1) // MULTIPART_CHUNK
+        try:
+            with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+                parts = list(pool.map(send_part, range(1, parts_count + 1)))
+            manifest = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in parts
+            )
+            self._request(
+                "POST", key, {"uploadId": upload_id},
+                body=f"<CompleteMultipartUpload>{manifest}</CompleteMultipartUpload>".encode(),
+            )
+        except Exception:
+            self._request("DELETE", key, {"uploadId": upload_id})
+            raise
+
+    def get(self, key: str) -> bytes:
+        return self._request("GET", key)[1]
+
+    def delete(self, key: str):
+        self._request("DELETE", key)
+
+    def stat(self, key: str):
+        import urllib.error
+
+        try:
+            headers, _ = self._request("HEAD", key)
+        except urllib.error.HTTPError as exc:
+            if exc.code == 404:
+                return None
+            raise
+        return {"size": int(headers["Content-Length"]), "etag": headers.get("ETag")}
+
+    def url(self, key: str) -> str:
+        if not self.presign_expires:
+            return f"{self.public_url or self.endpoint + '/' + quote(self.bucket, safe='')}/{quote(self.prefix + key, safe='/~')}"
+        when = datetime.fromtimestamp(self._presign_window() * (self.presign_expires // 2), timezone.utc)
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{when:%Y%m%d}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": when.strftime("%Y%m%dT%H%M%SZ"),
+            "X-Amz-Expires": self.presign_expires,
+            "X-Amz-SignedHeaders": "host",
+        }
+        query["X-Amz-Signature"] = self.signature("GET", key, query, {"host": self.host}, "UNSIGNED-PAYLOAD", when)
+        return f"{self.endpoint}{self._canonical_uri(key)}?{self._canonical_query(query)}"
+
+    def _presign_window(self) -> int:
+        return int(datetime.now(timezone.utc).timestamp()) // (self.presign_expires // 2)
+
+    def cache_tag(self) -> str:
+        """Zmienia się razem z podpisanymi adresami – dołączany do kluczy pamięci stron."""
+        return str(self._presign_window()) if self.presign_expires else ""
+
+
+def storage_from_env(static_dir, prefix: str = ""):
+    """Tworzy magazyn na podstawie zmiennych środowiskowych MIKROBOT_STORAGE i MIKROBOT_S3_*.
+
+    `prefix` – przedrostek kluczy w magazynie S3; magazyn lokalny rozdziela
+    dzierżawców samym katalogiem `static_dir`.
+    """
+    kind = os.environ.get("MIKROBOT_STORAGE", "local")
+    if kind == "local":
+        return LocalStorage(static_dir)
+    if kind == "s3":
+        presign = os.environ.get("MIKROBOT_S3_PRESIGN") or "0"
+        if not presign.isdigit() or int(presign) != 0 and not 2 <= int(presign) <= MAX_PRESIGN_EXPIRES:
+            # Okres dzielony jest na połowy (zob. S3Storage), więc najkrótszy to 2 s
+            raise RuntimeError(
+                f"Nieprawidłowe MIKROBOT_S3_PRESIGN={presign!r}: 0 (adresy publiczne) "
+                f"albo liczba sekund od 2 do {MAX_PRESIGN_EXPIRES}."
+            )
+        return S3Storage(
+            endpoint=os.environ["MIKROBOT_S3_ENDPOINT"],
+            bucket=os.environ["MIKROBOT_S3_BUCKET"],
+            access_key=os.environ["MIKROBOT_S3_ACCESS_KEY"],
+            secret_key=os.environ["MIKROBOT_S3_SECRET_KEY"],
+            region=os.environ.get("MIKROBOT_S3_REGION", "us-east-1"),
+            public_url=os.environ.get("MIKROBOT_S3_PUBLIC_URL"),
+            presign_expires=int(presign) or None,
+            prefix=prefix,
+        )
+    raise RuntimeError(f"Nieznany magazyn MIKROBOT_STORAGE={kind!r} (dozwolone: local, s3).")
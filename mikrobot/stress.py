@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Test obciążeniowy: równoczesne zapisy w panelu i odczyty stron publicznych.
+
+Skrypt zakłada w katalogu tymczasowym osobny serwis (dzierżawca stress.local,
+zob. tenants.py) z przykładową treścią i aktualnościami ze zdjęciami, po czym
+uruchamia --processes procesów po --threads wątków. Każdy wątek ma własnego
+klienta testowego Flask i przez --duration sekund wysyła losowe żądania:
+odczyty stron publicznych i API oraz (z udziałem --admin-share) zapisy
+w panelu – dodawanie, edycję i usuwanie aktualności i osiągnięć oraz ich
+zdjęć, także dla wpisów usuwanych w tej samej chwili przez inne wątki.
+
+Po zakończeniu sprawdzane są niezmienniki bazy i magazynu plików:
+
+- miniatury, liczniki i listy zdjęć zgodne z tabelą media (init_db.py --check),
+- brak wierszy media bez właściciela i bez pliku na dysku,
+- brak plików w uploads bez wiersza w media,
+- PRAGMA integrity_check i foreign_key_check.
+
+Raport zawiera dla każdej operacji liczbę żądań, przepustowość, opóźnienia
+(mediana, p95, maksimum), odrzucenia przez kontrolę przyjmowania (503),
+błędy oraz czas zdobywania blokady zapisu – mierzony jako czas pierwszej
+instrukcji zapisu transakcji i jej COMMIT, który przy małych zapisach to
+głównie oczekiwanie na inne procesy. Kod wyjścia 1 oznacza błędy albo
+naruszone niezmienniki.
+
+    python stress.py
+    python stress.py --processes 8 --threads 8 --duration 60 --admin-share 0.5
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from init_db import check_image_counters
+
+HOST = "stress.local"
+BASE_URL = f"http://{HOST}"
+# Strony i zasoby publiczne odczytywane w teście
+PUBLIC_PATHS = (
+    "/", "/news", "/achievements", "/gallery", "/gallery.json", "/members",
+    "/api/v1/news", "/api/v1/achievements", "/feeds/news.atom",
+)
+# Operacje panelu i ich względne wagi
+ADMIN_OPERATIONS = {
+    "add_news": 3,
+    "edit_news": 4,
+    "delete_news_image": 3,
+    "delete_news": 1,
+    "add_achievement": 2,
+    "edit_achievement": 3,
+    "delete_achievement_image": 2,
+    "delete_achievement": 1,
+}
+# Instrukcje, od których może zacząć się transakcja zapisu
+WRITE_STATEMENTS = ("BEGIN", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def png_bytes(rng: random.Random) -> bytes:
+    """Mały obraz PNG w losowym kolorze."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), tuple(rng.randrange(256) for _ in range(3))).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class LockTimer(threading.local):
+    """Czas zdobywania blokady zapisu w bieżącym żądaniu wątku."""
+
+    seconds = 0.0
+
+    def measure(self, conn, method, sql, *args):
+        if conn.in_transaction or not sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+            return method(sql, *args)
+        start = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+class TimedCursor:
+    def __init__(self, cursor, conn, timer: LockTimer):
+        self._cursor, self._conn, self._timer = cursor, conn, timer
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, sql, *args):
+        self._timer.measure(self._conn, self._cursor.execute, sql, *args)
+        return self
+
+
+class TimedConnection:
+    """Połączenie aplikacji mierzące czas instrukcji, które muszą zdobyć blokadę zapisu."""
+
+    def __init__(self, conn, timer: LockTimer):
+        self._conn, self._timer = conn, timer
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def execute(self, sql, *args):
+        return self._timer.measure(self._conn, self._conn.execute, sql, *args)
+
+    def cursor(self):
+        return TimedCursor(self._conn.cursor(), self._conn, self._timer)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            self._conn.commit()
+        finally:
+            self._timer.seconds += time.perf_counter() - start
+
+
+class Client:
+    """Zalogowany klient testowy jednego wątku wraz z losowaniem operacji."""
+
+    def __init__(self, site, database: Path, rng: random.Random):
+        self.client = site.app.test_client()
+        self.rng = rng
+        self.ids = sqlite3.connect(f"file:{database}?mode=ro", uri=True, timeout=30)
+        self.request("post", "/skrwaw", data={"password": site.ADMIN_PASSWORD})
+
+    def request(self, method: str, path: str, **kwargs):
+        response = getattr(self.client, method)(path, base_url=BASE_URL, **kwargs)
+        response.get_data()
+        response.close()
+        return response
+
+    def random_id(self, sql: str) -> int:
+        """Losowy istniejący identyfikator (lub 0) – wiersz może zniknąć, zanim żądanie dotrze."""
+        row = self.ids.execute(f"{sql} ORDER BY RANDOM() LIMIT 1").fetchone()
+        return row[0] if row else 0
+
+    def images(self, count: int) -> list:
+        return [(io.BytesIO(png_bytes(self.rng)), f"stress{n}.png") for n in range(count)]
+
+    def text(self) -> str:
+        return " ".join(self.rng.choice(("robot", "czujnik", "**silnik**", "koło", "zawody")) for _ in range(30))
+
+    def run(self, operation: str):
+        if operation == "public":
+            return self.request("get", self.rng.choice(PUBLIC_PATHS))
+        if operation == "add_news":
+            return self.request("post", "/skrwaw/news", data={
+                "title": "Obciążenie", "content": self.text(), "images": self.images(self.rng.randint(0, 2)),
+            })
+        if operation == "edit_news":
+            news_id = self.random_id("SELECT id FROM news")
+            return self.request("post", f"/skrwaw/news/edit/{news_id}", data={
+                "title": "Edycja", "content": self.text(), "images": self.images(self.rng.randint(0, 2)),
+            })
+        if operation == "delete_news_image":
+            image_id = self.random_id("SELECT id FROM media WHERE owner_type = 'news'")
+            return self.request("post", f"/skrwaw/news/delete_image/{image_id}")
+        if operation == "delete_news":
+            return self.request("post", f"/skrwaw/news/delete/{self.random_id('SELECT id FROM news')}")
+        if operation == "add_achievement":
+            return self.request("post", "/skrwaw/achievements", data={
+                "title": "Obciążenie", "description": self.text(), "date": "2024",
+                "images": self.images(self.rng.randint(0, 2)),
+            })
+        if operation == "edit_achievement":
+            achievement_id = self.random_id("SELECT id FROM achievements")
+            return self.request("post", f"/skrwaw/achievements/edit/{achievement_id}", data={
+                "title": "Edycja", "description": self.text(), "date": "2025",
+                "images": self.images(self.rng.randint(0, 2)),
+            })
+        if operation == "delete_achievement_image":
+            image_id = self.random_id("SELECT id FROM media WHERE owner_type = 'achievements'")
+            return self.request("post", f"/skrwaw/achievements/delete_image/{image_id}")
+        if operation == "delete_achievement":
+            achievement_id = self.random_id("SELECT id FROM achievements")
+            return self.request("post", f"/skrwaw/achievements/delete/{achievement_id}")
+        raise ValueError(operation)
+
+
+def import_site():
+    """Importuje aplikację w procesie roboczym (zmienne środowiskowe są już ustawione)."""
+    import app as site
+
+    # Wyjątki z widoków trafiają do raportu zamiast kończyć się stroną błędu 500
+    site.app.config["PROPAGATE_EXCEPTIONS"] = True
+    return site
+
+
+def seed(database: Path, news: int, seed_value: int):
+    """Dodaje aktualności i osiągnięcia ze zdjęciami przez panel."""
+    site = import_site()
+    client = Client(site, database, random.Random(seed_value))
+    for _ in range(news):
+        client.run("add_news")
+        client.run("add_achievement")
+
+
+def worker(database: Path, threads: int, duration: float, admin_share: float, seed_value: int, results):
+    """Proces roboczy: `threads` wątków wysyłających losowe żądania do końca czasu testu."""
+    site = import_site()
+    timer = LockTimer()
+    connect = site.get_db_connection
+    site.get_db_connection = lambda: TimedConnection(connect(), timer)
+    stats = defaultdict(lambda: {"latency": [], "lock_wait": 0.0, "rejected": 0, "errors": Counter()})
+    stats_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    operations, weights = zip(*ADMIN_OPERATIONS.items())
+
+    def loop(rng: random.Random):
+        client = Client(site, database, rng)
+        while time.monotonic() < deadline:
+            operation = "public"
+            if rng.random() < admin_share:
+                operation = rng.choices(operations, weights)[0]
+            timer.seconds = 0.0
+            start = time.perf_counter()
+            error = None
+            try:
+                response = client.run(operation)
+                if response.status_code == 503:
+                    error = "rejected"
+                elif response.status_code >= 500:
+                    error = f"HTTP {response.status_code}"
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                if not isinstance(exc, sqlite3.OperationalError):
+                    error += "\n" + "".join(traceback.format_exception(exc)[-3:])
+            elapsed = time.perf_counter() - start
+            with stats_lock:
+                entry = stats[operation]
+                entry["latency"].append(elapsed)
+                entry["lock_wait"] += timer.seconds
+                if error == "rejected":
+                    entry["rejected"] += 1
+                elif error:
+                    entry["errors"][error] += 1
+
+    pool = [
+        threading.Thread(target=loop, args=(random.Random(seed_value * 1000 + n),)) for n in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put({name: dict(entry) for name, entry in stats.items()})
+
+
+def check_invariants(directory: Path) -> list:
+    """Zwraca listę naruszeń niezmienników bazy i plików serwisu."""
+    problems = []
+    conn = sqlite3.connect(directory / "mikrobot.db")
+    try:
+        problems += [f"rozbieżne kolumny zdjęć: {table} {row_id}" for table, row_id in check_image_counters(conn)]
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if integrity != "ok":
+            problems.append(f"integrity_check: {integrity}")
+        problems += [f"foreign_key_check: {row}" for row in conn.execute("PRAGMA foreign_key_check")]
+        referenced = set()
+        for media_id, *keys in conn.execute("SELECT id, filename, thumb FROM media"):
+            for key in filter(None, keys):
+                referenced.add(key)
+                if key.startswith("uploads/") and not (directory / "static" / key).is_file():
+                    problems.append(f"brak pliku zdjęcia {media_id}: {key}")
+    finally:
+        conn.close()
+    static_dir = directory / "static"
+    for path in sorted((static_dir / "uploads").rglob("*")):
+        key = path.relative_to(static_dir).as_posix()
+        if path.is_file() and key not in referenced:
+            problems.append(f"plik bez wiersza w media: {key}")
+    return problems
+
+
+def percentile(values: list, fraction: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def merge(reports: list) -> dict:
+    merged = defaultdict(lambda: {"latency": [], "lock_wait": 0.0, "rejected": 0, "errors": Counter()})
+    for report in reports:
+        for operation, entry in report.items():
+            target = merged[operation]
+            target["latency"] += entry["latency"]
+            target["lock_wait"] += entry["lock_wait"]
+            target["rejected"] += entry["rejected"]
+            target["errors"].update(entry["errors"])
+    return merged
+
+
+def print_report(stats: dict, duration: float):
+    print(f"{'operacja':<26}{'żądań':>7}{'/s':>8}{'med ms':>8}{'p95 ms':>8}{'max ms':>8}"
+          f"{'blok. ms':>10}{'503':>6}{'błędy':>7}")
+    total = Counter()
+    for operation in sorted(stats, key=lambda name: (name != "public", name)):
+        entry = stats[operation]
+        latency, errors = entry["latency"], sum(entry["errors"].values())
+        total.update(requests=len(latency), rejected=entry["rejected"], errors=errors)
+        print(f"{operation:<26}{len(latency):>7}{len(latency) / duration:>8.1f}"
+              f"{percentile(latency, 0.5) * 1000:>8.1f}{percentile(latency, 0.95) * 1000:>8.1f}"
+              f"{max(latency, default=0) * 1000:>8.1f}{entry['lock_wait'] * 1000:>10.1f}"
+              f"{entry['rejected']:>6}{errors:>7}")
+    requests = max(total["requests"], 1)
+    print(f"razem: {total['requests']} żądań, {total['requests'] / duration:.1f}/s, "
+          f"odrzucone {total['rejected'] / requests:.1%}, błędy {total['errors'] / requests:.1%}")
+    errors = Counter()
+    for entry in stats.values():
+        errors.update(entry["errors"])
+    for message, count in errors.most_common(10):
+        print(f"  {count} × {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test obciążeniowy panelu i stron publicznych MIKROBOT.")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="wątków w każdym procesie")
+    parser.add_argument("--duration", type=float, default=15, help="czas testu w sekundach")
+    parser.add_argument("--admin-share", type=float, default=0.25, help="udział zapisów w panelu (0–1)")
+    parser.add_argument("--seed-news", type=int, default=20, help="aktualności i osiągnięć dodanych przed testem")
+    parser.add_argument("--seed", type=int, default=1, help="ziarno losowania operacji")
+    parser.add_argument("--root", help="katalog testu (domyślnie tymczasowy, usuwany po teście)")
+    parser.add_argument("--json", action="store_true", help="wypisz wyniki jako JSON")
+    args = parser.parse_args()
+
+    root = Path(args.root or tempfile.mkdtemp(prefix="mikrobot-stress-"))
+    # Ustawienia dziedziczone przez procesy robocze; zapisy w panelu nie są ograniczane
+    # przez kontrolę przyjmowania bardziej niż liczbą wątków
+    os.environ["MIKROBOT_TENANTS_DIR"] = str(root)
+    os.environ["MIKROBOT_MAINTENANCE"] = "0"
+    os.environ["MIKROBOT_PROFILE_INTERVAL"] = "0"
+    os.environ.setdefault("MIKROBOT_ADMIN_CONCURRENCY", str(args.threads))
+    os.environ.pop("MIKROBOT_SMTP_HOST", None)
+    from tenants import create_tenant
+
+    directory = create_tenant(root, HOST)
+    database = directory / "mikrobot.db"
+    # Procesy startują od zera (spawn) – bez połączeń i wątków odziedziczonych po rodzicu
+    context = multiprocessing.get_context("spawn")
+    try:
+        seeding = context.Process(target=seed, args=(database, args.seed_news, args.seed))
+        seeding.start()
+        seeding.join()
+        if seeding.exitcode:
+            raise SystemExit("Nie udało się przygotować bazy testowej.")
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(
+                database, args.threads, args.duration, args.admin_share, args.seed * 100 + n, results,
+            ))
+            for n in range(args.processes)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        stats = merge(reports)
+        problems = check_invariants(directory)
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+    if args.json:
+        print(json.dumps({
+            operation: {
+                "requests": len(entry["latency"]),
+                "p50": percentile(entry["latency"], 0.5),
+                "p95": percentile(entry["latency"], 0.95),
+                "lock_wait": entry["lock_wait"],
+                "rejected": entry["rejected"],
+                "errors": dict(entry["errors"]),
+            }
+            for operation, entry in stats.items()
+        } | {"invariants": problems}, ensure_ascii=False, indent=2))
+    else:
+        print(f"{args.processes} proc. × {args.threads} wątków, {elapsed:.1f} s, zapisy {args.admin_share:.0%}")
+        print_report(stats, elapsed)
+        print("niezmienniki: " + ("OK" if not problems else f"{len(problems)} naruszeń"))
+        for problem in problems[:20]:
+            print(f"  {problem}")
+    failed = problems or any(entry["errors"] for entry in stats.values())
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
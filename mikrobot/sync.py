@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Synchronizuje replikę tylko do odczytu z serwerem głównym.
+
+Pobiera z serwera głównego dziennik zmian (/changes?since=<seq>), nanosi
+bieżący stan zmienionych wierszy na lokalną bazę, dociąga do katalogu
+static/uploads brakujące pliki spod adresów podanych w dzienniku (serwer
+główny, /uploads dzierżawcy albo magazyn zdalny) i usuwa pliki zdjęć
+usuniętych na serwerze głównym. Numer ostatniej naniesionej zmiany zapisywany
+jest w tabeli replica_state w tej samej transakcji co dane, więc przerwaną
+synchronizację można po prostu uruchomić ponownie.
+
+Przykład:
+
+    python sync.py --source http://primary:5000 --interval 5
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote, urljoin
+
+from init_db import DB_PATH, STATIC_DIR, UNIX_NOW_SQL, VERSIONED_TABLES, migrate_db
+
+# Liczba zmian pobieranych jednym zapytaniem i równoległych pobrań plików
+PAGE_SIZE = 500
+DOWNLOAD_WORKERS = 4
+# Jedyny katalog, do którego replika zapisuje pliki z serwera głównego
+UPLOADS_DIR = STATIC_DIR / "uploads"
+
+
+def fetch_json(url: str, token=None):
+    request = urllib.request.Request(url)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.load(response)
+
+
+def local_path(rel_path: str) -> Path:
+    """Ścieżka lokalnego pliku dla ścieżki z dziennika zmian.
+
+    Ścieżki pochodzą z serwera głównego, więc – jak w LocalStorage.path –
+    odrzucane są wszystkie, które po rozwinięciu wychodzą poza static/uploads.
+    """
+    path = (STATIC_DIR / rel_path).resolve()
+    if UPLOADS_DIR.resolve() not in path.parents:
+        raise ValueError(f"Ścieżka pliku poza katalogiem uploads: {rel_path}")
+    return path
+
+
+def download_file(source: str, rel_path: str, url=None, token=None) -> bool:
+    """Pobiera plik static/<rel_path> spod adresu z dziennika zmian; zapis jest atomowy.
+
+    Bez adresu (serwer główny starszej wersji) plik pobierany jest z jego
+    katalogu static. Token wysyłany jest tylko do serwera głównego, nigdy do
+    magazynu zdalnego.
+    """
+    target = local_path(rel_path)
+    if target.exists():
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    url = urljoin(f"{source}/", url) if url else f"{source}/static/{quote(rel_path)}"
+    request = urllib.request.Request(url)
+    if token and url.startswith(f"{source}/"):
+        request.add_header("Authorization", f"Bearer {token}")
+    partial = target.with_name(target.name + ".part")
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response, open(partial, "wb") as fh:
+            while chunk := response.read(64 * 1024):
+                fh.write(chunk)
+    except urllib.error.HTTPError as exc:
+        # Plik usunięty na serwerze głównym po zapisaniu zmiany – kolejna zmiana usunie też wiersz
+        partial.unlink(missing_ok=True)
+        if exc.code == 404:
+            return False
+        raise
+    os.replace(partial, target)
+    return True
+
+
+def media_files(conn, table: str, row_id: int) -> set:
+    """Przesłane pliki (zdjęcia i miniatury) wiersza media albo wszystkich zdjęć właściciela."""
+    where = "id = ?" if table == "media" else f"owner_type = '{table}' AND owner_id = ?"
+    rows = conn.execute(f"SELECT filename, thumb FROM media WHERE {where}", (row_id,)).fetchall()
+    return {path for row in rows for path in row if path and path.startswith("uploads/")}
+
+
+def apply_changes(conn, changes):
+    """Nanosi zmiany na bazę (bez zatwierdzania).
+
+    Zwraca krotkę (pliki do pobrania: ścieżka -> adres, pliki zdjęć, które
+    przestały być używane przez usunięte lub zmienione wiersze). Ścieżka
+    spoza static/uploads przerywa nanoszenie (ValueError).
+    """
+    columns = {
+        table: {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for table in VERSIONED_TABLES
+    }
+    downloads, released = {}, set()
+    for change in changes:
+        table, row = change["table"], change["row"]
+        if table not in columns:
+            raise ValueError(f"Nieznana tabela w dzienniku zmian: {table}")
+        if table == "media" or row is None:
+            # Usunięcie właściciela usuwa też jego zdjęcia (wyzwalacze), więc pliki zbieramy przed zmianą
+            released |= media_files(conn, table, change["id"])
+        if row is None:
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (change["id"],))
+            continue
+        names = [name for name in row if name in columns[table]]
+        conn.execute(
+            f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {', '.join(f'{name} = excluded.{name}' for name in names if name != 'id')}",
+            [row[name] for name in names],
+        )
+        if table == "media":
+            urls = change.get("files", {})
+            for path in (row.get("filename"), row.get("thumb")):
+                if path and path.startswith("uploads/"):
+                    local_path(path)
+                    downloads[path] = urls.get(path)
+    return downloads, released
+
+
+def remove_unused_files(conn, paths) -> int:
+    """Usuwa pliki, których nie wskazuje już żaden wiersz media. Zwraca liczbę usuniętych."""
+    removed = 0
+    for path in paths:
+        if conn.execute("SELECT 1 FROM media WHERE filename = ? OR thumb = ?", (path, path)).fetchone():
+            continue
+        try:
+            target = local_path(path)
+        except ValueError:
+            continue
+        if target.exists():
+            target.unlink()
+            removed += 1
+    return removed
+
+
+def sync_once(source: str, token=None, page_size: int = PAGE_SIZE) -> int:
+    """Pobiera i nanosi wszystkie nowe zmiany. Zwraca liczbę naniesionych zmian."""
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    migrate_db(conn)
+    conn.execute("INSERT OR IGNORE INTO replica_state (source) VALUES (?)", (source,))
+    conn.commit()
+    schema = conn.execute("PRAGMA user_version").fetchone()[0]
+    applied = 0
+    try:
+        while True:
+            since = conn.execute("SELECT applied_seq FROM replica_state WHERE source = ?", (source,)).fetchone()[0]
+            page = fetch_json(f"{source}/changes?since={since}&limit={page_size}", token)
+            if page["schema"] != schema:
+                raise RuntimeError(
+                    f"Różne wersje schematu: serwer główny {page['schema']}, replika {schema}. "
+                    "Zaktualizuj aplikację na obu węzłach."
+                )
+            changes = page["changes"]
+            downloads, released = apply_changes(conn, changes)
+            # Pliki pobieramy przed zatwierdzeniem, aby strony repliki nie wskazywały brakujących zdjęć
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+                list(pool.map(lambda path: download_file(source, path, downloads[path], token), sorted(downloads)))
+            last = changes[-1] if changes else None
+            conn.execute(
+                f"""
+                UPDATE replica_state
+                SET applied_seq = ?, applied_changed_at = COALESCE(?, applied_changed_at),
+                    source_seq = ?, source_changed_at = ?, synced_at = {UNIX_NOW_SQL}
+                WHERE source = ?
+                """,
+                (page["next"], last and last["changed_at"], page["latest"]["seq"],
+                 page["latest"]["changed_at"], source),
+            )
+            if changes:
+                # Nowa generacja unieważnia strony we wspólnej pamięci podręcznej repliki
+                conn.execute("UPDATE cache_generation SET generation = generation + 1")
+            conn.commit()
+            # Pliki usuniętych zdjęć kasujemy dopiero po zatwierdzeniu, tak jak panel serwera głównego
+            remove_unused_files(conn, released)
+            applied += len(changes)
+            if not changes or page["next"] >= page["latest"]["seq"]:
+                return applied
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synchronizacja repliki MIKROBOT z serwerem głównym.")
+    parser.add_argument("--source", required=True, help="adres serwera głównego, np. http://primary:5000")
+    parser.add_argument("--token", default=os.environ.get("MIKROBOT_REPLICATION_TOKEN"),
+                        help="token dostępu do /changes (domyślnie MIKROBOT_REPLICATION_TOKEN)")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="synchronizuj co podaną liczbę sekund zamiast jednorazowo")
+    args = parser.parse_args()
+    source = args.source.rstrip("/")
+    while True:
+        started = time.monotonic()
+        count = sync_once(source, args.token)
+        print(f"Naniesiono zmian: {count} ({time.monotonic() - started:.2f} s)")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
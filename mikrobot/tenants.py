@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Wiele serwisów (kół naukowych) w jednym procesie: dzierżawcy wybierani po nazwie hosta.
+
+Każdy dzierżawca ma własny katalog <MIKROBOT_TENANTS_DIR>/<host>/ z bazą
+mikrobot.db, pamięcią gotowych stron page_cache.db i przesłanymi plikami
+w static/uploads (w magazynie S3 – klucze z przedrostkiem <host>/).
+Szablony, arkusze i grafiki serwisu są wspólne.
+
+Dzierżawcy wczytywani są leniwie, przy pierwszym żądaniu do ich hosta
+(migracja schematu, migawka treści budowana przy pierwszym odczycie), a
+otwartych jest najwyżej MIKROBOT_TENANT_CACHE naraz – najdawniej używany
+jest zamykany, więc setki rzadko odwiedzanych serwisów dzielą jedną pulę
+wątków, a pamięć procesu zależy od liczby aktywnych serwisów.
+
+Zakładanie dzierżawcy (pusta baza z przykładowymi treściami albo treść
+z archiwum archive.py):
+
+    python tenants.py create robotyka.example.org
+    python tenants.py create robotyka.example.org --from robotyka.tar.gz
+    python tenants.py list
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from cache import LRUCache
+from init_db import init_db, migrate_db
+from pagecache import SharedPageCache
+from snapshot import SnapshotStore
+from storage import storage_from_env
+
+# Nazwa dzierżawcy to nazwa hosta: małe litery, cyfry, kropki i myślniki
+TENANT_NAME = re.compile(r"^[a-z0-9](?:[a-z0-9-]*[a-z0-9])?(?:\.[a-z0-9](?:[a-z0-9-]*[a-z0-9])?)*$")
+
+
+def tenant_name(host: str):
+    """Nazwa dzierżawcy dla nagłówka Host (bez portu) albo None, jeśli host jest niepoprawny."""
+    name = host.rsplit(":", 1)[0].lower().rstrip(".")
+    return name if TENANT_NAME.match(name) else None
+
+
+class Tenant:
+    """Baza, magazyn plików, migawka treści i pamięć stron jednego serwisu."""
+
+    def __init__(self, name: str, directory, snapshots=None, storage_prefix: str = ""):
+        self.name = name
+        self.directory = Path(directory)
+        self.database = self.directory / "mikrobot.db"
+        self.static_dir = self.directory / "static"
+        self.upload_folder = self.static_dir / "uploads"
+        self.storage = storage_from_env(self.static_dir, prefix=storage_prefix)
+        self.snapshots = snapshots or SnapshotStore(self.database, check_interval=0.5)
+        self.page_cache = SharedPageCache(self.directory / "page_cache.db")
+
+
+class TenantRegistry:
+    """Ograniczony zbiór otwartych dzierżawców, wczytywanych przy pierwszym żądaniu."""
+
+    def __init__(self, root, max_open: int = 64):
+        self.root = Path(root)
+        self._open = LRUCache(maxsize=max_open)
+        self._lock = threading.Lock()
+
+    def directory(self, name: str) -> Path:
+        return self.root / name
+
+    def get(self, host: str):
+        """Zwraca dzierżawcę dla hosta albo None, jeśli taki serwis nie istnieje."""
+        name = tenant_name(host)
+        if name is None:
+            return None
+        tenant = self._open.get(name)
+        if tenant is not None:
+            return tenant
+        with self._lock:
+            tenant = self._open.get(name)
+            if tenant is None:
+                tenant = self._load(name)
+                if tenant is not None:
+                    self._open.set(name, tenant)
+        return tenant
+
+    def _load(self, name: str):
+        directory = self.directory(name)
+        if not (directory / "mikrobot.db").is_file():
+            return None
+        conn = sqlite3.connect(directory / "mikrobot.db")
+        try:
+            migrate_db(conn, directory / "static")
+        finally:
+            conn.close()
+        return Tenant(name, directory, storage_prefix=f"{name}/")
+
+    def names(self) -> list:
+        """Nazwy wszystkich dzierżawców (także niewczytanych)."""
+        if not self.root.is_dir():
+            return []
+        return sorted(path.parent.name for path in self.root.glob("*/mikrobot.db"))
+
+    def databases(self) -> list:
+        return [self.directory(name) / "mikrobot.db" for name in self.names()]
+
+    def __len__(self):
+        return len(self._open)
+
+
+def create_tenant(root, host: str, archive=None) -> Path:
+    """Zakłada katalog dzierżawcy z nową bazą albo z treścią z archiwum (archive.py)."""
+    # Import dopiero tutaj – archive.py nie jest potrzebny aplikacji
+    from archive import import_archive
+
+    name = tenant_name(host)
+    if name is None:
+        raise ValueError(f"Niepoprawna nazwa hosta: {host}")
+    directory = Path(root) / name
+    if (directory / "mikrobot.db").exists():
+        raise FileExistsError(f"Dzierżawca {name} już istnieje: {directory}")
+    (directory / "static" / "uploads").mkdir(parents=True, exist_ok=True)
+    if archive:
+        import_archive(archive, database=directory / "mikrobot.db",
+                       storage=storage_from_env(directory / "static", prefix=f"{name}/"))
+    else:
+        init_db(directory / "mikrobot.db")
+    return directory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zarządzanie dzierżawcami MIKROBOT.")
+    parser.add_argument("--root", default=os.environ.get("MIKROBOT_TENANTS_DIR"),
+                        help="katalog dzierżawców (domyślnie MIKROBOT_TENANTS_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create_cmd = commands.add_parser("create", help="załóż nowego dzierżawcę")
+    create_cmd.add_argument("host", help="nazwa hosta serwisu, np. robotyka.example.org")
+    create_cmd.add_argument("--from", dest="archive", help="archiwum treści utworzone przez archive.py export")
+    commands.add_parser("list", help="wypisz dzierżawców")
+    args = parser.parse_args()
+    if not args.root:
+        parser.error("podaj --root albo ustaw MIKROBOT_TENANTS_DIR")
+    if args.command == "create":
+        print(f"Utworzono dzierżawcę: {create_tenant(args.root, args.host, args.archive)}")
+    else:
+        for name in TenantRegistry(args.root).names():
+            print(name)
@@ -0,0 +1,68 @@
+"""
+Wspólne przygotowanie testów.
+
+app.py i init_db.py zapisują pliki w katalogu aplikacji (baza, pamięć stron,
+blokady), więc testy importują moduły z kopii katalogu w katalogu
+tymczasowym – drzewo repozytorium zostaje nietknięte. Uruchomienie:
+
+    pip install pytest
+    python -m pytest mikrobot/tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+SOURCE_DIR = Path(__file__).resolve().parent.parent
+APP_DIR = Path(tempfile.mkdtemp(prefix="mikrobot-tests-")) / "mikrobot"
+shutil.copytree(
+    SOURCE_DIR,
+    APP_DIR,
+    ignore=shutil.ignore_patterns(
+        "tests", "__pycache__", "mikrobot.db*", "page_cache.db*", "published", "profiles", "backups",
+    ),
+)
+sys.path.insert(0, str(APP_DIR))
+# Bez wątku konserwacji w tle – testy wywołują zadania same
+os.environ["MIKROBOT_MAINTENANCE"] = "0"
+# Jak w zalecanym wdrożeniu: jeden serwer pośredniczący przed aplikacją
+os.environ["MIKROBOT_PROXY_HOPS"] = "1"
+
+import init_db  # noqa: E402
+
+# Baza aplikacji w kopii oraz wzorce baz kopiowane przez fikstury
+init_db.init_db()
+CURRENT_TEMPLATE = APP_DIR.parent / "current.db"
+LEGACY_TEMPLATE = APP_DIR.parent / "legacy.db"
+init_db.init_db(CURRENT_TEMPLATE)
+_migrate_db, init_db.migrate_db = init_db.migrate_db, lambda conn: None
+init_db.init_db(LEGACY_TEMPLATE)
+init_db.migrate_db = _migrate_db
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(APP_DIR.parent, ignore_errors=True)
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """Baza z przykładowymi treściami w schemacie sprzed pierwszej migracji (user_version 0)."""
+    return Path(shutil.copy(LEGACY_TEMPLATE, tmp_path / "mikrobot.db"))
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Baza w bieżącym schemacie z przykładowymi treściami."""
+    return Path(shutil.copy(CURRENT_TEMPLATE, tmp_path / "mikrobot.db"))
+
+
+@pytest.fixture
+def client():
+    """Klient testowy aplikacji (baza aplikacji w kopii katalogu)."""
+    import app
+
+    return app.app.test_client()
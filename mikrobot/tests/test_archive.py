@@ -0,0 +1,75 @@
+"""Eksport i import treści serwisu (archive.py)."""
+
+import sqlite3
+
+import pytest
+
+import archive
+from init_db import VERSIONED_TABLES
+from storage import LocalStorage
+
+
+def content(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall() for table in VERSIONED_TABLES}
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def exported(db, tmp_path, monkeypatch):
+    """Archiwum bazy z dwoma zdjęciami: małym (zapis z pamięci) i dużym (zapis od razu)."""
+    monkeypatch.setattr(archive, "LOCAL_BUFFER_LIMIT", 1000)
+    uploads = tmp_path / "static" / "uploads"
+    uploads.mkdir(parents=True)
+    (uploads / "male.png").write_bytes(b"m" * 100)
+    (uploads / "duze.png").write_bytes(b"d" * 5000)
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.executemany(
+            "INSERT INTO media (owner_type, owner_id, position, filename) VALUES ('news', 1, ?, ?)",
+            [(10, "uploads/male.png"), (11, "uploads/duze.png")],
+        )
+    conn.close()
+    path = tmp_path / "mikrobot.tar.gz"
+    summary = archive.export_archive(str(path), database=db, storage=LocalStorage(tmp_path / "static"))
+    assert summary["files"] == 2
+    return path
+
+
+def test_round_trip_to_new_database(db, exported, tmp_path):
+    target = tmp_path / "klon"
+    target.mkdir()
+    summary = archive.import_archive(str(exported), database=target / "mikrobot.db",
+                                     storage=LocalStorage(target / "static"))
+    assert summary["complete"] and summary["written"] == 2
+    assert content(target / "mikrobot.db") == content(db)
+    assert (target / "static" / "uploads" / "male.png").read_bytes() == b"m" * 100
+    assert (target / "static" / "uploads" / "duze.png").read_bytes() == b"d" * 5000
+    assert not list((target / "static" / "uploads").glob("*.part"))
+
+    # Pliki już obecne w magazynie są pomijane
+    summary = archive.import_archive(str(exported), database=target / "mikrobot.db",
+                                     storage=LocalStorage(target / "static"), replace=True)
+    assert summary["written"] == 0 and summary["skipped"] == 2
+
+
+def test_import_into_database_with_content_needs_replace(db, exported, tmp_path):
+    target = tmp_path / "inna"
+    target.mkdir()
+    archive.init_db(target / "mikrobot.db")
+    conn = sqlite3.connect(target / "mikrobot.db")
+    with conn:
+        conn.execute("UPDATE news SET title = 'Własny wpis' WHERE id = 1")
+    conn.close()
+    before = content(target / "mikrobot.db")
+
+    with pytest.raises(RuntimeError, match="--replace"):
+        archive.import_archive(str(exported), database=target / "mikrobot.db", storage=LocalStorage(target / "static"))
+    assert content(target / "mikrobot.db") == before
+    assert not (target / "mikrobot.db.import").exists()
+
+    archive.import_archive(str(exported), database=target / "mikrobot.db",
+                           storage=LocalStorage(target / "static"), replace=True)
+    assert content(target / "mikrobot.db") == content(db)
@@ -0,0 +1,53 @@
+"""Budżet wagi stron (budget.py): zbieranie zasobów strony."""
+
+from werkzeug.wrappers import Response
+
+import budget
+
+
+class StubClient:
+    """Odpowiada z ustalonego słownika ścieżka -> Response i zapisuje pobrane ścieżki."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.fetched = []
+
+    def get(self, path):
+        self.fetched.append(path)
+        return self.responses.get(path) or Response(status=404)
+
+
+def test_link_header_preloads_are_collected():
+    header = '</static/css/main.css>; rel=preload; as=style, </static/images/hero.jpg>; rel="preload"; as=image, </x>; rel=canonical'
+    assert budget.link_header_assets([header]) == [("/static/css/main.css", False), ("/static/images/hero.jpg", True)]
+
+
+def test_css_urls_inline_styles_and_link_headers_are_counted():
+    html = """<html><head><link rel="stylesheet" href="/static/css/main.css">
+    <style>.hero { background: url('/static/images/inline.png') }</style></head>
+    <body><img src="/static/images/logo.png"></body></html>"""
+    client = StubClient({
+        "/": Response(html, mimetype="text/html", headers={"Link": "</static/images/hero.jpg>; rel=preload; as=image"}),
+        "/static/css/main.css": Response(
+            ".a { background: url(../images/bg.jpg) } .b { background: url(data:image/png;base64,AA==) }"
+            " .c { background: url('/static/images/logo.png') }",
+            mimetype="text/css",
+        ),
+        "/static/images/bg.jpg": Response(b"x" * 5000, mimetype="image/jpeg"),
+        "/static/images/inline.png": Response(b"x" * 300, mimetype="image/png"),
+        "/static/images/logo.png": Response(b"x" * 100, mimetype="image/png"),
+        "/static/images/hero.jpg": Response(b"x" * 2000, mimetype="image/jpeg"),
+    })
+    page = budget.measure_page(client, "/")
+    # Strona, arkusz, cztery zdjęcia; logo wskazane dwa razy liczone jest raz
+    assert page["requests"] == 6
+    assert page["missing"] == []
+    assert page["largest"] == "/static/images/bg.jpg"
+    assert page["bytes"] == len(html) + len(client.responses["/static/css/main.css"].get_data()) + 7400
+    assert client.fetched.count("/static/images/logo.png") == 1
+
+
+def test_missing_asset_is_reported():
+    client = StubClient({"/": Response('<img src="/static/images/brak.png">', mimetype="text/html")})
+    page = budget.measure_page(client, "/")
+    assert page["missing"] == ["/static/images/brak.png"]
@@ -0,0 +1,47 @@
+"""Formularz kontaktowy: kolejka wiadomości i limit na adres klienta."""
+
+import sqlite3
+
+import pytest
+
+import mailqueue
+
+
+def send(client, forwarded_for, remote_addr="127.0.0.1"):
+    return client.post(
+        "/contact",
+        data={"name": "Jan Kowalski", "email": "jan@example.org", "message": "Dzień dobry"},
+        headers={"X-Forwarded-For": forwarded_for},
+        environ_base={"REMOTE_ADDR": remote_addr},
+    )
+
+
+def test_limit_applies_per_client_behind_proxy(client):
+    for _ in range(mailqueue.RATE_LIMIT):
+        assert send(client, "203.0.113.10").status_code == 302
+    refused = send(client, "203.0.113.10")
+    assert refused.status_code == 429
+    assert refused.headers["Retry-After"] == str(mailqueue.RATE_WINDOW)
+    # Inny odwiedzający za tym samym serwerem pośredniczącym ma własny limit
+    assert send(client, "203.0.113.11").status_code == 302
+
+
+def test_client_cannot_reset_limit_with_forged_header(client):
+    # Serwer pośredniczący dopisuje prawdziwy adres na końcu – liczy się tylko on
+    for number in range(mailqueue.RATE_LIMIT):
+        assert send(client, f"198.51.100.{number}, 203.0.113.20").status_code == 302
+    assert send(client, "198.51.100.99, 203.0.113.20").status_code == 429
+
+
+def test_invalid_form_is_not_queued(client):
+    response = client.post("/contact", data={"name": "", "email": "zly-adres", "message": ""})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("limit_reached", [False, True])
+def test_enqueue_checks_limit_in_write_transaction(db, limit_reached):
+    conn = sqlite3.connect(db)
+    for _ in range(mailqueue.RATE_LIMIT - (0 if limit_reached else 1)):
+        assert mailqueue.enqueue(conn, "A", "a@example.org", "x", "192.0.2.1")
+    assert mailqueue.enqueue(conn, "A", "a@example.org", "x", "192.0.2.1") is not limit_reached
+    assert mailqueue.enqueue(conn, "A", "a@example.org", "x", "192.0.2.2")
@@ -0,0 +1,42 @@
+"""Przetwarzanie przesłanych zdjęć (images.py) i odrzucanie „bomb dekompresji”."""
+
+import io
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import images
+
+
+@pytest.fixture(scope="module")
+def bomb():
+    """Kilkukilobajtowy PNG o rozdzielczości 15000 × 15000 (225 Mpx)."""
+    buffer = io.BytesIO()
+    Image.new("1", (15000, 15000)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_bomb_is_not_decoded(bomb, tmp_path):
+    (tmp_path / "uploads").mkdir()
+    path = tmp_path / "uploads" / "bomba.png"
+    path.write_bytes(bomb)
+    assert images.probe_image(path) == (15000, 15000)
+    assert images.too_large(15000, 15000)
+    assert images.make_thumbnail(tmp_path, "uploads/bomba.png") is None
+    assert images.image_placeholder(path) == (None, None)
+
+
+def test_bomb_upload_is_rejected(client, bomb):
+    import app
+
+    with client.session_transaction() as session:
+        session["admin_logged_in"] = True
+    uploads = Path(app.__file__).parent / "static" / "uploads"
+    before = set(uploads.iterdir()) if uploads.exists() else set()
+    response = client.post("/skrwaw/news", data={
+        "title": "Bomba", "content": "Treść", "images": (io.BytesIO(bomb), "bomba.png"),
+    }, follow_redirects=True)
+    assert response.status_code == 200
+    assert "zbyt dużą rozdzielczość" in response.get_data(as_text=True)
+    assert set(uploads.iterdir()) == before
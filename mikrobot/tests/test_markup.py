@@ -0,0 +1,50 @@
+"""Lekki język formatowania treści (markup.py) – w tym odporność na wstrzyknięcie HTML."""
+
+import pytest
+
+from markup import excerpt, render_markup, to_html
+
+
+def test_formatting():
+    assert to_html("**Mocno** i *lekko*, `kod` oraz [strona](https://example.org)") == (
+        '<p><strong>Mocno</strong> i <em>lekko</em>, <code>kod</code> oraz '
+        '<a href="https://example.org" rel="nofollow">strona</a></p>'
+    )
+    assert to_html("- jeden\n- dwa\n\nakapit\nlinia") == "<ul><li>jeden</li><li>dwa</li></ul>\n<p>akapit<br>linia</p>"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("[a](https://x.org/**b**)", '<a href="https://x.org/**b**" rel="nofollow">a</a>'),
+    ("[a](https://x.org/*b*c)", '<a href="https://x.org/*b*c" rel="nofollow">a</a>'),
+    ("*[a](/x*y)", '*<a href="/x*y" rel="nofollow">a</a>'),
+    ("[**a**](/x)", '<a href="/x" rel="nofollow"><strong>a</strong></a>'),
+    ("*zob. [a](/x)*", '<em>zob. <a href="/x" rel="nofollow">a</a></em>'),
+    ("`**a**`", "<code>**a**</code>"),
+])
+def test_emphasis_does_not_reach_into_links_and_code(text, expected):
+    assert to_html(text) == f"<p>{expected}</p>"
+
+
+@pytest.mark.parametrize("text", [
+    "<script>alert(1)</script>",
+    '[a](https://x.org/"onmouseover="alert(1))',
+    "[a](javascript:alert(1))",
+    "[a](JaVaScRiPt:alert(1))",
+    "[a](data:text/html,<script>alert(1)</script>)",
+    '**<img src=x onerror=alert(1)>**',
+    "`<b>`",
+    "\x000\x00[a](/x)",
+])
+def test_no_markup_from_content(text):
+    html = to_html(text)
+    assert "<script" not in html and "<img" not in html and "<b>" not in html
+    assert '"onmouseover' not in html and "javascript:" not in html.lower() and "data:" not in html
+    assert "\x00" not in html
+
+
+def test_excerpt_and_word_count():
+    content_html, short, words = render_markup("**Koło** naukowe " + "robotyki " * 40)
+    assert content_html.startswith("<p><strong>Koło</strong>")
+    assert short.startswith("Koło naukowe robotyki") and short.endswith("…") and len(short) <= 161
+    assert words == 42
+    assert excerpt("[tekst](/x) i `kod`") == "tekst i kod"
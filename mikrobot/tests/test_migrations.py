@@ -0,0 +1,95 @@
+"""Migracje schematu (init_db.migrate_db)."""
+
+import multiprocessing
+import sqlite3
+
+import pytest
+
+import init_db
+
+
+def schema(conn):
+    return conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+
+def user_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def migrate(path):
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        init_db.migrate_db(conn)
+        return user_version(conn)
+    finally:
+        conn.close()
+
+
+def test_migrates_legacy_database(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    init_db.migrate_db(conn)
+    assert user_version(conn) == len(init_db.MIGRATIONS)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert init_db.check_image_counters(conn.cursor()) == []
+    assert init_db.check_archive_months(conn.cursor()) == []
+
+
+def test_second_run_changes_nothing(legacy_db):
+    conn = sqlite3.connect(legacy_db)
+    init_db.migrate_db(conn)
+    before = schema(conn)
+    init_db.migrate_db(conn)
+    assert schema(conn) == before
+    assert user_version(conn) == len(init_db.MIGRATIONS)
+
+
+def test_failed_migration_leaves_no_partial_changes(legacy_db, monkeypatch):
+    def interrupted(cur, static_dir):
+        cur.execute("ALTER TABLE media ADD COLUMN color TEXT;")
+        raise RuntimeError("przerwana migracja")
+
+    number = init_db.MIGRATIONS.index(init_db._migration_10_placeholders) + 1
+    conn = sqlite3.connect(legacy_db)
+    migrations = list(init_db.MIGRATIONS)
+    migrations[number - 1] = interrupted
+    with monkeypatch.context() as patch:
+        patch.setattr(init_db, "MIGRATIONS", migrations)
+        with pytest.raises(RuntimeError):
+            init_db.migrate_db(conn)
+    assert user_version(conn) == number - 1
+    assert "color" not in columns(conn, "media")
+
+    # Kolejny start dokańcza migrację od przerwanego miejsca
+    init_db.migrate_db(conn)
+    assert user_version(conn) == len(init_db.MIGRATIONS)
+    assert {"color", "placeholder"} <= columns(conn, "media")
+
+
+def test_concurrent_processes_migrate_once(legacy_db):
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        versions = pool.map(migrate, [legacy_db] * 4)
+    assert versions == [len(init_db.MIGRATIONS)] * 4
+    conn = sqlite3.connect(legacy_db)
+    assert init_db.check_image_counters(conn.cursor()) == []
+
+
+def test_migrations_read_uploads_of_their_own_site(legacy_db):
+    # Układ katalogu dzierżawcy: <katalog>/mikrobot.db i <katalog>/static/uploads
+    from PIL import Image
+
+    upload = legacy_db.parent / "static" / "uploads" / "wlasne.png"
+    upload.parent.mkdir(parents=True)
+    Image.new("RGB", (40, 30), "navy").save(upload)
+    conn = sqlite3.connect(legacy_db)
+    conn.execute("INSERT INTO news_images (news_id, filename) VALUES (1, 'uploads/wlasne.png')")
+    conn.commit()
+    init_db.migrate_db(conn)
+    row = conn.execute(
+        "SELECT width, height, bytes, color, placeholder FROM media WHERE filename = 'uploads/wlasne.png'"
+    ).fetchone()
+    assert row[:3] == (40, 30, upload.stat().st_size)
+    assert row[3] == "#000080" and row[4].startswith("data:image/jpeg")
@@ -0,0 +1,56 @@
+"""Przebudowa migawki treści po zmianach w bazie (snapshot.py)."""
+
+import sqlite3
+import time
+
+import pytest
+
+from snapshot import SnapshotStore
+
+
+@pytest.fixture
+def store(db):
+    store = SnapshotStore(db, check_interval=0)
+    store.get()
+    return store
+
+
+def write(db, sql):
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.execute(sql)
+    conn.close()
+
+
+def wait_for_rebuild(store):
+    deadline = time.monotonic() + 5
+    while store._rebuilding and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_write_outside_content_keeps_snapshot(db, store):
+    before = store.get()
+    write(db, "INSERT INTO contact_messages (name, email, message, ip, created_at, next_attempt_at) "
+              "VALUES ('Ala', 'ala@example.com', 'Dzień dobry', '10.0.0.1', 0, 0)")
+    assert store.get() is before
+    assert not store._rebuilding
+    # Ten sam data_version nie jest sprawdzany ponownie
+    assert store.get() is before
+
+
+def test_content_change_rebuilds_snapshot(db, store):
+    before = store.get()
+    write(db, "UPDATE news SET title = 'Nowy tytuł' WHERE id = 1")
+    store.get()
+    wait_for_rebuild(store)
+    after = store.get()
+    assert after is not before
+    assert after.news.get(1).title == "Nowy tytuł"
+
+
+def test_cache_generation_change_rebuilds_snapshot(db, store):
+    before = store.get()
+    write(db, "UPDATE cache_generation SET generation = generation + 1")
+    store.get()
+    wait_for_rebuild(store)
+    assert store.get().generation == before.generation + 1
@@ -0,0 +1,30 @@
+"""Wybór magazynu plików ze zmiennych środowiskowych (storage.py)."""
+
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def s3_env(monkeypatch):
+    monkeypatch.setenv("MIKROBOT_STORAGE", "s3")
+    monkeypatch.setenv("MIKROBOT_S3_ENDPOINT", "http://s3.example.com")
+    monkeypatch.setenv("MIKROBOT_S3_BUCKET", "mikrobot")
+    monkeypatch.setenv("MIKROBOT_S3_ACCESS_KEY", "klucz")
+    monkeypatch.setenv("MIKROBOT_S3_SECRET_KEY", "sekret")
+    return monkeypatch
+
+
+@pytest.mark.parametrize("value, expires", [("", None), ("0", None), ("2", 2), ("604800", 604800)])
+def test_presign_expires(s3_env, tmp_path, value, expires):
+    s3_env.setenv("MIKROBOT_S3_PRESIGN", value)
+    s3 = storage.storage_from_env(tmp_path)
+    assert s3.presign_expires == expires
+    assert s3.url("uploads/a.png")
+
+
+@pytest.mark.parametrize("value", ["1", "604801", "-5", "dzień"])
+def test_invalid_presign_expires_is_rejected(s3_env, tmp_path, value):
+    s3_env.setenv("MIKROBOT_S3_PRESIGN", value)
+    with pytest.raises(RuntimeError, match="MIKROBOT_S3_PRESIGN"):
+        storage.storage_from_env(tmp_path)
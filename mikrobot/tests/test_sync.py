@@ -0,0 +1,70 @@
+"""Nanoszenie dziennika zmian na replikę (sync.py)."""
+
+import sqlite3
+
+import pytest
+
+import sync
+
+
+@pytest.fixture
+def replica(db, tmp_path, monkeypatch):
+    static_dir = tmp_path / "static"
+    (static_dir / "uploads").mkdir(parents=True)
+    monkeypatch.setattr(sync, "STATIC_DIR", static_dir)
+    monkeypatch.setattr(sync, "UPLOADS_DIR", static_dir / "uploads")
+    conn = sqlite3.connect(db)
+    yield conn
+    conn.close()
+
+
+def media_change(media_id, filename, thumb=None, owner_id=1):
+    return {
+        "table": "media",
+        "id": media_id,
+        "row": {"id": media_id, "owner_type": "news", "owner_id": owner_id, "position": 0,
+                "filename": filename, "thumb": thumb},
+        "files": {filename: f"http://primary/uploads/{filename}"},
+    }
+
+
+def test_files_of_new_media_are_downloaded(replica):
+    downloads, released = sync.apply_changes(replica, [media_change(100, "uploads/a.png", "uploads/thumbs/a.png")])
+    assert downloads == {"uploads/a.png": "http://primary/uploads/uploads/a.png", "uploads/thumbs/a.png": None}
+    assert released == set()
+    assert replica.execute("SELECT cover_image FROM news WHERE id = 1").fetchone()[0] == "uploads/a.png"
+
+
+@pytest.mark.parametrize("path", ["uploads/../../app.py", "uploads/../mikrobot.db", "uploads/thumbs/../../../x.png"])
+def test_paths_outside_uploads_are_rejected(replica, path):
+    with pytest.raises(ValueError):
+        sync.apply_changes(replica, [media_change(100, path)])
+    with pytest.raises(ValueError):
+        sync.download_file("http://primary", path)
+
+
+def test_files_of_deleted_media_are_removed(replica):
+    sync.apply_changes(replica, [media_change(100, "uploads/a.png"), media_change(101, "uploads/b.png", owner_id=2)])
+    replica.commit()
+    for name in ("a.png", "b.png"):
+        (sync.UPLOADS_DIR / name).write_bytes(b"x")
+
+    # Usunięcie samego zdjęcia oraz usunięcie właściciela razem z jego zdjęciami
+    _, released = sync.apply_changes(replica, [
+        {"table": "media", "id": 100, "row": None},
+        {"table": "news", "id": 2, "row": None},
+    ])
+    replica.commit()
+    assert released == {"uploads/a.png", "uploads/b.png"}
+    assert sync.remove_unused_files(replica, released) == 2
+    assert list(sync.UPLOADS_DIR.iterdir()) == []
+
+
+def test_file_still_used_by_another_row_is_kept(replica):
+    sync.apply_changes(replica, [media_change(100, "uploads/a.png"), media_change(101, "uploads/a.png", owner_id=2)])
+    replica.commit()
+    (sync.UPLOADS_DIR / "a.png").write_bytes(b"x")
+    _, released = sync.apply_changes(replica, [{"table": "media", "id": 100, "row": None}])
+    replica.commit()
+    assert sync.remove_unused_files(replica, released) == 0
+    assert (sync.UPLOADS_DIR / "a.png").exists()
@@ -0,0 +1,78 @@
+"""Zdenormalizowane kolumny zdjęć utrzymywane przez wyzwalacze (init_db.check_image_counters)."""
+
+import sqlite3
+
+import pytest
+
+import init_db
+
+
+@pytest.fixture
+def conn(db):
+    conn = sqlite3.connect(db, isolation_level=None)
+    conn.execute("DELETE FROM media")
+    yield conn
+    conn.close()
+
+
+def add_media(conn, owner_type, owner_id, position, filename):
+    return conn.execute(
+        "INSERT INTO media (owner_type, owner_id, position, filename) VALUES (?, ?, ?, ?)",
+        (owner_type, owner_id, position, filename),
+    ).lastrowid
+
+
+def images(conn, table="news", row_id=1):
+    return conn.execute(f"SELECT image_count, cover_image, image_list FROM {table} WHERE id = ?", (row_id,)).fetchone()
+
+
+@pytest.mark.parametrize("table", init_db.GALLERY_OWNERS)
+def test_counters_follow_media(conn, table):
+    assert images(conn, table) == (0, None, None)
+    first = add_media(conn, table, 1, 1, "uploads/b.png")
+    add_media(conn, table, 1, 0, "uploads/a.png")
+    assert images(conn, table) == (2, "uploads/a.png", "uploads/a.png,uploads/b.png")
+
+    conn.execute("UPDATE media SET position = -1 WHERE id = ?", (first,))
+    assert images(conn, table) == (2, "uploads/b.png", "uploads/b.png,uploads/a.png")
+
+    # Przeniesienie zdjęcia do innego właściciela przelicza obu
+    conn.execute("UPDATE media SET owner_id = 2 WHERE id = ?", (first,))
+    assert images(conn, table) == (1, "uploads/a.png", "uploads/a.png")
+    assert images(conn, table, 2) == (1, "uploads/b.png", "uploads/b.png")
+
+    conn.execute("DELETE FROM media WHERE owner_id = 1")
+    assert images(conn, table) == (0, None, None)
+    assert init_db.check_image_counters(conn.cursor()) == []
+
+
+def test_member_photo_follows_media(conn):
+    assert conn.execute("SELECT photo FROM members WHERE id = 1").fetchone() == ("",)
+    media_id = add_media(conn, "members", 1, 0, "uploads/ala.png")
+    assert conn.execute("SELECT photo FROM members WHERE id = 1").fetchone() == ("uploads/ala.png",)
+    conn.execute("DELETE FROM media WHERE id = ?", (media_id,))
+    assert conn.execute("SELECT photo FROM members WHERE id = 1").fetchone() == ("",)
+
+
+def test_deleting_owner_deletes_its_media(conn):
+    add_media(conn, "news", 1, 0, "uploads/a.png")
+    add_media(conn, "achievements", 1, 0, "uploads/b.png")
+    conn.execute("DELETE FROM news WHERE id = 1")
+    assert conn.execute("SELECT owner_type, owner_id FROM media").fetchall() == [("achievements", 1)]
+
+
+def test_check_image_counters_reports_and_repairs_drift(conn):
+    add_media(conn, "news", 1, 0, "uploads/a.png")
+    # Zmiany z pominięciem wyzwalaczy: ręczna edycja licznika i zdjęcie bez właściciela
+    conn.execute("UPDATE news SET image_count = 5 WHERE id = 1")
+    conn.execute("UPDATE members SET photo = 'uploads/stare.png' WHERE id = 2")
+    orphan = add_media(conn, "publications", 999, 0, "uploads/sierota.png")
+
+    drift = init_db.check_image_counters(conn.cursor())
+    assert set(drift) == {("news", 1), ("members", 2), ("media", orphan)}
+
+    assert set(init_db.check_image_counters(conn.cursor(), repair=True)) == set(drift)
+    assert images(conn) == (1, "uploads/a.png", "uploads/a.png")
+    assert conn.execute("SELECT photo FROM members WHERE id = 2").fetchone() == ("",)
+    assert conn.execute("SELECT 1 FROM media WHERE id = ?", (orphan,)).fetchone() is None
+    assert init_db.check_image_counters(conn.cursor()) == []